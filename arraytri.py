@@ -0,0 +1,448 @@
+import functools, itertools, time
+from collections import deque
+import numpy as np
+import regina, snappy
+import geometricsearch as gs
+import budget as bg
+import profiler as prof
+import visitedset as vs
+
+#####################################################################################
+########################### Array Triangulations ####################################
+#####################################################################################
+# A triangulation with floating point shapes as three NumPy arrays, for float searches
+# where building Regina objects for every move dominates:
+#	- adj[t, f]:    the tetrahedron glued to face f of tetrahedron t
+#	- glu[t, f]:    code (index into PERMS) of the gluing permutation, sending the vertices of
+#	                t to the vertices of adj[t, f] (as Regina's adjacentGluing)
+#	- shapes[t]:    the shape of t, the edge parameter of its edges 01 and 23
+# The shapes of every 2-3 and 3-2 move of a triangulation, and the orientations of the
+# results, are computed at once on these arrays (see `moves`). Only the moves that are
+# wanted are then performed, and Regina is only used for isosigs.
+#
+# The moves give the same triangulations and shapes as `twoThreeMove`/`threeTwoMove` in
+# geometricmoves.py (up to rounding, which only matters for nearly flat or degenerate
+# tetrahedra), but label the new tetrahedra differently, and number faces and edges in
+# their own order (see `faces` and `edges`), not Regina's:
+#	- 2-3 move on face a of A (glued to B by g): the new tetrahedron T_x, for each vertex
+#	  x != a of A, is A with vertex x replaced by the apex of B. Its edge yz is the edge
+#	  yz of A and g(y)g(z) of B, so its edge parameter there is the product of theirs.
+#	- 3-2 move on edge uv of P (with other vertices p, q): U_u is P with vertex v replaced
+#	  by the third vertex r around uv, and U_v is P with u replaced by r. Their edges up
+#	  and vp are made of the edges up and vp of P and of the tetrahedron across face q.
+# The new tetrahedra are then relabelled (by even permutations, see TO_01) so that these
+# edges become their edges 01, and the products are their shapes, as in geometricmoves.py.
+# (Converting the products to another edge instead amplifies the rounding errors of
+# nearly degenerate shapes.)
+# Triangulations are assumed to be oriented (all gluings odd), which the moves preserve.
+
+PERMS = list(itertools.permutations(range(4))) # code -> images of 0, 1, 2, 3
+CODE = {p: k for k, p in enumerate(PERMS)}
+IDENTITY = CODE[(0, 1, 2, 3)]
+COMPOSE = np.array([[CODE[tuple(p[q[i]] for i in range(4))] for q in PERMS] for p in PERMS]) # [p, q] -> p∘q
+INVERSE = np.array([CODE[tuple(p.index(i) for i in range(4))] for p in PERMS])
+IMAGE = np.array(PERMS) # [p, i] -> p(i)
+PERM4 = [regina.Perm4(*p) for p in PERMS]
+
+def INVERSIONS(p):
+	return sum(1 for i, j in itertools.combinations(range(4), 2) if p[i] > p[j])
+
+def transposition(i, j):
+	p = list(range(4))
+	p[i], p[j] = j, i
+	return CODE[tuple(p)]
+
+SWAP = np.array([[transposition(i, j) for j in range(4)] for i in range(4)]) # [i, j] -> (i j)
+
+EDGES = list(itertools.combinations(range(4), 2)) # edge e of a tetrahedron, between vertices EDGES[e]
+EDGE = np.zeros((4, 4), dtype=int) # [i, j] -> e
+for e, (i, j) in enumerate(EDGES):
+	EDGE[i, j] = EDGE[j, i] = e
+EDGE_CLASS = np.array([0, 1, 2, 2, 1, 0]) # 01, 23 -> z; 02, 13 -> 1/(1-z); 03, 12 -> (z-1)/z (see `gm.edgeParameter`)
+EDGE_IMAGE = np.array([[EDGE[p[i], p[j]] for i, j in EDGES] for p in PERMS]) # [p, e] -> edge p(e)
+FACE_EDGES = np.array([[e for e, (i, j) in enumerate(EDGES) if f not in (i, j)] for f in range(4)]) # edges of face f
+OTHERS = np.array([[x for x in range(4) if x != a] for a in range(4)]) # vertices of face a
+TO_01 = np.array([[[CODE[p] for p in PERMS if p[i] == 0 and p[j] == 1 and INVERSIONS(p) % 2 == 0][0] if i != j else 0 for j in range(4)] for i in range(4)]) # [i, j] -> even permutation sending i, j to 0, 1
+OPPOSITE = np.array([[EDGE[tuple(v for v in range(4) if v not in (a, x))] if a != x else 0 for x in range(4)] for a in range(4)]) # [a, x] -> edge missing a and x
+
+def edgeParameters(shapes):
+	"""
+	(n, 6) array of the edge parameters of every edge of every tetrahedron.
+	"""
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return np.stack([shapes, 1 / (1 - shapes), (shapes - 1) / shapes], axis=1)[:, EDGE_CLASS]
+
+@functools.lru_cache
+def faceLayout(n):
+	"""
+	(tetrahedron, face) of every face of every tetrahedron of an n tetrahedron triangulation.
+	"""
+	return np.repeat(np.arange(n), 4), np.tile(np.arange(4), n)
+
+@functools.lru_cache
+def edgeLayout(n):
+	"""
+	(tetrahedron, face, edge) for every edge of every face of every tetrahedron.
+	"""
+	return np.repeat(np.arange(n), 12), np.tile(np.repeat(np.arange(4), 3), n), np.tile(FACE_EDGES.ravel(), n)
+
+def orientations(shapes):
+	"""
+	(negative, flat) boolean arrays for shapes, with the float tolerance of `gm.shapeOrientation`
+	(negative shapes are also counted as flat).
+	"""
+	return shapes.imag < 0, shapes.imag < 0.00000001
+
+class ArrayTriangulation:
+	"""
+	Triangulation with float shapes as arrays (see top of file). Use `fromRegina` or
+	`fromIsoSig` to make one.
+	"""
+	def __init__(self, adj, glu, shapes):
+		self.adj = adj
+		self.glu = glu
+		self.shapes = shapes
+		self.face_list = None
+		self.edge_list = None
+
+	@classmethod
+	def fromRegina(cls, T, shapes):
+		"""
+		From an oriented Regina triangulation without boundary and its shapes (exact or float).
+		"""
+		n = T.countTetrahedra()
+		adj = np.zeros((n, 4), dtype=int)
+		glu = np.zeros((n, 4), dtype=int)
+		for t in range(n):
+			tet = T.tetrahedron(t)
+			for f in range(4):
+				adj[t, f] = tet.adjacentTetrahedron(f).index()
+				g = tet.adjacentGluing(f)
+				glu[t, f] = CODE[tuple(g[i] for i in range(4))]
+		return cls(adj, glu, np.array([complex(z) for z in shapes]))
+
+	@classmethod
+	def fromIsoSig(cls, sig):
+		"""
+		From an isosig, with SnapPy's shapes.
+		"""
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		return cls.fromRegina(T, snappy.Manifold(T).tetrahedra_shapes(part='rect'))
+
+	def size(self):
+		return len(self.shapes)
+
+	def toRegina(self):
+		"""
+		The Regina triangulation, with the same tetrahedra and labelling.
+		"""
+		adj, glu = self.adj.tolist(), self.glu.tolist()
+		gluings = [(t, f, adj[t][f], PERM4[glu[t][f]]) for t, f in self.faces().tolist()]
+		return regina.Triangulation3.fromGluings(self.size(), gluings)
+
+	def isoSig(self):
+		return self.toRegina().isoSig()
+
+	def isoSigDetail(self):
+		return self.toRegina().isoSigDetail()
+
+	def canonicalIndices(self, iso):
+		"""
+		Indices of the faces and of the edges (see `faces`, `edges`) in the canonical
+		triangulation, where iso is from `isoSigDetail` (see `geometricsearch.Node`).
+		"""
+		C = iso.apply(self.toRegina())
+		faces = [gs.canonicalFace(C, iso, t, f) for t, f in self.faces().tolist()]
+		edges = [gs.canonicalEdge(C, iso, r // 6, *EDGES[r % 6]) for r in self.edges()[0].tolist()]
+		return faces, edges
+
+	def faces(self):
+		"""
+		(number of faces, 2) array of (tetrahedron, face), one for each face of the
+		triangulation: the side with the smaller 4 * tetrahedron + face. Face i is faces()[i].
+		"""
+		if self.face_list is None:
+			t, f = faceLayout(self.size())
+			keep = 4 * t + f < 4 * self.adj.ravel() + IMAGE[self.glu.ravel(), f]
+			self.face_list = np.stack([t[keep], f[keep]], axis=1)
+		return self.face_list
+
+	def edges(self):
+		"""
+		Returns (reps, degrees): for each edge of the triangulation, its first embedding as
+		6 * tetrahedron + edge (see EDGES), in increasing order, and its degree. Edge i is
+		reps[i]. Found by spreading the smallest embedding across the faces until nothing changes.
+		"""
+		if self.edge_list is None:
+			t, f, e = edgeLayout(self.size())
+			source = 6 * t + e
+			target = 6 * self.adj[t, f] + EDGE_IMAGE[self.glu[t, f], e]
+			labels = np.arange(6 * self.size())
+			while True:
+				new = labels.copy()
+				np.minimum.at(new, source, labels[target])
+				if np.array_equal(new, labels):
+					break
+				labels = new
+			self.edge_list = np.unique(labels, return_counts=True)
+		return self.edge_list
+
+	def twoThreeCandidates(self):
+		"""
+		For every face (see `faces`), returns (A, a, B, g, shapes): the face as face a of A,
+		glued to B by g, and the shapes (k, 3) of the new tetrahedra T_x, for x in OTHERS[a],
+		of a 2-3 move on it. Faces with A == B (where no 2-3 move is possible) are included.
+		"""
+		faces = self.faces()
+		A, a = faces[:, 0], faces[:, 1]
+		B, g = self.adj[A, a], self.glu[A, a]
+		P = edgeParameters(self.shapes)
+		E = OPPOSITE[a[:, None], OTHERS[a]]
+		return A, a, B, g, P[A[:, None], E] * P[B[:, None], EDGE_IMAGE[g[:, None], E]]
+
+	def threeTwoCandidates(self):
+		"""
+		For every edge (see `edges`), returns (P, u, v, Np, Nq, shapes): the edge as edge uv
+		of P (u < v; p < q the other vertices), the tetrahedra across faces p and q of P, and
+		the shapes (k, 2) of U_u and U_v of a 3-2 move on it. Edges where no 3-2 move is
+		possible (degree not 3, or not three distinct tetrahedra) have Np = Nq = -1.
+		"""
+		reps, degrees = self.edges()
+		P, e = reps // 6, reps % 6
+		vertices = np.array(EDGES)[e]
+		u, v = vertices[:, 0], vertices[:, 1]
+		pq = np.array([[x for x in range(4) if x not in edge] for edge in EDGES])[e]
+		p, q = pq[:, 0], pq[:, 1]
+		Np, Nq, gq = self.adj[P, p], self.adj[P, q], self.glu[P, q]
+		possible = (degrees == 3) & (P != Np) & (P != Nq) & (Np != Nq)
+		Np, Nq = np.where(possible, Np, -1), np.where(possible, Nq, -1)
+
+		Ps = edgeParameters(self.shapes)
+		E = np.stack([EDGE[u, p], EDGE[v, p]], axis=1)
+		return P, u, v, Np, Nq, Ps[P[:, None], E] * Ps[self.adj[P, q][:, None], EDGE_IMAGE[gq[:, None], E]]
+
+	def moves(self, up=True, down=True):
+		"""
+		Every possible move, as (d, i, oriented, (flat count, negative count), shapes of the
+		new tetrahedra), with d = 1 for a 3-2 move on edge i and d = 2 for a 2-3 move on face i
+		(as in the search queues), 3-2 moves first. oriented is as in `gm.shapeOrientation`,
+		or -2 for degenerate or inessential shapes (with counts (0, 0)), as the moves in
+		geometricmoves.py. 2-3 moves are left out if up is False, 3-2 moves if down is False.
+		"""
+		negative, flat = orientations(self.shapes)
+		base = (negative.sum(), flat.sum())
+		moves = []
+
+		if down:
+			P, u, v, Np, Nq, shapes = self.threeTwoCandidates()
+			ok = Np >= 0
+			removed = np.stack([P, Np, Nq], axis=1)[ok]
+			moves.extend(zip(itertools.repeat(1), np.flatnonzero(ok), *self.classify(base, negative, flat, removed, shapes[ok])))
+
+		if up:
+			A, a, B, g, shapes = self.twoThreeCandidates()
+			ok = A != B
+			removed = np.stack([A, B], axis=1)[ok]
+			moves.extend(zip(itertools.repeat(2), np.flatnonzero(ok), *self.classify(base, negative, flat, removed, shapes[ok])))
+		return moves
+
+	def classify(self, base, negative, flat, removed, shapes):
+		"""
+		Returns (oriented, counts, shapes) lists for moves removing the tetrahedra `removed`
+		(k, r) and adding tetrahedra with `shapes` (k, m).
+		"""
+		new_negative, new_flat = orientations(shapes)
+		negative_count = base[0] - negative[removed].sum(axis=1) + new_negative.sum(axis=1)
+		flat_count = base[1] - flat[removed].sum(axis=1) + new_flat.sum(axis=1)
+		oriented = np.where(negative_count > 0, -1, np.where(flat_count > 0, 0, 1))
+		degenerate = ((shapes == 0) | (shapes == 1) | ~np.isfinite(shapes)).any(axis=1)
+		oriented = np.where(degenerate, -2, oriented)
+		counts = [(0, 0) if o == -2 or o == 1 else (int(fc), int(nc)) for o, fc, nc in zip(oriented, flat_count, negative_count)]
+		return oriented.tolist(), counts, list(shapes)
+
+	def twoThreeMove(self, i, shapes=None):
+		"""
+		The triangulation after a 2-3 move on face i (see top of file), or None if it is
+		not possible. shapes: the new shapes, if already computed (see `moves`).
+		"""
+		A, a = self.faces()[i]
+		B, g = self.adj[A, a], self.glu[A, a]
+		if A == B:
+			return None
+		if shapes is None:
+			shapes = self.twoThreeCandidates()[4][i]
+		others = OTHERS[a]
+		external = {}
+		internal = []
+		labels = [TO_01[tuple(EDGES[OPPOSITE[a, x]])] for x in others]
+		for k, x in enumerate(others):
+			external[(A, x)] = (k, x, IDENTITY)
+			external[(B, IMAGE[g, x])] = (k, a, COMPOSE[SWAP[a, x], INVERSE[g]])
+			for l in range(k + 1, 3):
+				internal.append((k, others[l], l, x, SWAP[x, others[l]]))
+		return self.replace([A, B], external, internal, labels, shapes)
+
+	def threeTwoMove(self, i, shapes=None):
+		"""
+		The triangulation after a 3-2 move on edge i (see top of file), or None if it is
+		not possible. shapes: the new shapes, if already computed (see `moves`).
+		"""
+		reps, degrees = self.edges()
+		P, e = divmod(int(reps[i]), 6)
+		u, v = EDGES[e]
+		p, q = [x for x in range(4) if x not in (u, v)]
+		Np, Nq = self.adj[P, p], self.adj[P, q]
+		if degrees[i] != 3 or len({P, Np, Nq}) != 3:
+			return None
+		if shapes is None:
+			shapes = self.threeTwoCandidates()[5][i]
+		gp, gq = self.glu[P, p], self.glu[P, q]
+		external = {
+			(P, v): (0, v, IDENTITY),
+			(P, u): (1, u, IDENTITY),
+			(Np, IMAGE[gp, v]): (0, p, COMPOSE[SWAP[p, v], INVERSE[gp]]),
+			(Nq, IMAGE[gq, v]): (0, q, COMPOSE[SWAP[q, v], INVERSE[gq]]),
+			(Np, IMAGE[gp, u]): (1, p, COMPOSE[SWAP[p, u], INVERSE[gp]]),
+			(Nq, IMAGE[gq, u]): (1, q, COMPOSE[SWAP[q, u], INVERSE[gq]]),
+		}
+		return self.replace([P, Np, Nq], external, [(0, u, 1, v, SWAP[u, v])], [TO_01[u, p], TO_01[v, p]], shapes)
+
+	def replace(self, removed, external, internal, labels, shapes):
+		"""
+		New triangulation with the tetrahedra `removed` replaced by new ones with `shapes`,
+		added at the end (as in geometricmoves.py).
+		- external: {(old tetrahedron, face): (new tetrahedron, face, relabelling)}, for the
+			faces on the boundary of the removed tetrahedra, where relabelling is the code of
+			the permutation from the old tetrahedron's vertices to the new one's.
+		- internal: (new tetrahedron, face, new tetrahedron, face, gluing) between new tetrahedra.
+		- labels: a final relabelling of each new tetrahedron, applied on top of the above.
+		"""
+		external = {key: (k, IMAGE[labels[k], face], COMPOSE[labels[k], rho]) for key, (k, face, rho) in external.items()}
+		internal = [(k1, IMAGE[labels[k1], f1], k2, IMAGE[labels[k2], f2], COMPOSE[COMPOSE[labels[k2], gluing], INVERSE[labels[k1]]]) for k1, f1, k2, f2, gluing in internal]
+		n = self.size()
+		kept = np.ones(n, dtype=bool)
+		kept[removed] = False
+		keep = np.flatnonzero(kept)
+		index = np.full(n, -1)
+		index[keep] = np.arange(len(keep))
+		m = len(keep)
+		adj = np.zeros((m + len(shapes), 4), dtype=int)
+		glu = np.zeros((m + len(shapes), 4), dtype=int)
+		adj[:m] = index[self.adj[keep]]
+		glu[:m] = self.glu[keep]
+
+		for (t, f), (k, face, rho) in external.items():
+			h, neighbour = self.glu[t, f], self.adj[t, f]
+			back = IMAGE[h, f]
+			if index[neighbour] >= 0:
+				gluing = COMPOSE[h, INVERSE[rho]]
+				adj[index[neighbour], back] = m + k
+				glu[index[neighbour], back] = INVERSE[gluing]
+				adj[m + k, face] = index[neighbour]
+				glu[m + k, face] = gluing
+			else:
+				k2, face2, rho2 = external[(neighbour, back)]
+				adj[m + k, face] = m + k2
+				glu[m + k, face] = COMPOSE[COMPOSE[rho2, h], INVERSE[rho]]
+		for k1, f1, k2, f2, gluing in internal:
+			adj[m + k1, f1], glu[m + k1, f1] = m + k2, gluing
+			adj[m + k2, f2], glu[m + k2, f2] = m + k1, INVERSE[gluing]
+		return ArrayTriangulation(adj, glu, np.concatenate([self.shapes[keep], shapes]))
+
+def arrayPseudogeometricSearch(sig, max_tets, verbose=True, record_nons=True, directory='.', visited_dir=None, budget=None, profile=None, progress=0):
+	"""
+	`graphPseudogeometricSearch` (see geometricsearch.py) with float shapes on array
+	triangulations: each node's moves are classified at once, and only the moves to recorded
+	triangulations are performed. Writes the same nodes and edges files (with the same
+	canonical labels, see `geometricsearch.Node`), though the order of the search, and so
+	of the files, differs. budget: a `budget.Budget`, as in `graphPseudogeometricSearch`
+	(its time budget drops whole nodes, as the queue here is of nodes rather than moves).
+	"""
+
+	if verbose:
+		print(f"Searching {sig}...")
+	t0 = time.time()
+	with prof.profiling(profile, progress):
+		budget = bg.Budget() if budget is None else budget
+		budget.start()
+
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		M = snappy.Manifold(T)
+
+		name = gs.manifoldName(M)
+
+		A = ArrayTriangulation.fromRegina(T, M.tetrahedra_shapes(part='rect'))
+
+		# ids of the triangulations recorded, with the nodes they were found from (as in
+		# graphPseudogeometricSearch)
+		nodes = vs.SigTable(visited_dir, f'{name}-({sig})-visited', values=2)
+		FLAT, NOTFLAT = 0, 1
+		root = nodes.add(sig)[0]
+		nodes.setValue(sig, FLAT, vs.parentValue())
+		counts = [1, 0] # flat and non-flat triangulations
+
+		f = open(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', "w")
+		f.write(f'id,oriented,tetrahedra,flat count,negative count\n{sig},1,{A.size()},0,0\n')
+		f.close()
+		f = open(f'{directory}/{name}-({sig})-pseudogeometric-edges.csv', "w")
+		f.write('target,source,label\n')
+		f.close()
+
+		budget.count(A.size())
+		TODO = deque([(A, root, T.isoSigDetail()[1])]) # [ (ArrayTriangulation, id, isomorphism to canonical) ]
+
+		while TODO:
+			if budget.timeUp():
+				budget.drop(A.size() for A, tid, iso in TODO)
+				break
+			A, tid, iso = TODO.popleft()
+			labels = None
+			prof.ACTIVE.queue(len(TODO), A.size())
+			with prof.ACTIVE.phase('move'):
+				moves = A.moves(up=A.size() < max_tets or tid == root, down=budget.down(A.size())) # (as graphPseudogeometricSearch)
+			faces = 2 * A.size()
+
+			for d, i, oriented, (flat_count, negative_count), shapes in moves:
+				# negatively oriented or inessential triangulations are only recorded if record_nons
+				if not (oriented > -1 or record_nons):
+					continue
+				with prof.ACTIVE.phase('move'):
+					newA = A.threeTwoMove(i, shapes) if d == 1 else A.twoThreeMove(i, shapes)
+				with prof.ACTIVE.phase('isosig'):
+					newSig, newIso = newA.isoSigDetail()
+				with prof.ACTIVE.phase('dedupe'):
+					newId = nodes.add(newSig)[0]
+					values = nodes.values(newSig)
+					visited = FLAT if oriented > -1 else NOTFLAT
+					seen = values[visited] != 0
+				if not seen:
+					nodes.setValue(newSig, visited, vs.parentValue(tid))
+					counts[visited] += 1
+					prof.ACTIVE.node()
+					with prof.ACTIVE.phase('csv'):
+						f = open(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', "a")
+						f.write(f'{newSig},{oriented},{newA.size()},{flat_count},{negative_count}\n')
+						f.close()
+					if oriented > -1 and budget.expand(newA.size()): # if flat or geometric (and within budget)
+						TODO.append((newA, newId, newIso))
+				elif vs.treeEdge(nodes, tid, newId, values):
+					continue
+				if labels is None:
+					labels = A.canonicalIndices(iso)
+				label = 'Edge: ' if d == 1 else 'Face: '
+				with prof.ACTIVE.phase('csv'):
+					f = open(f'{directory}/{name}-({sig})-pseudogeometric-edges.csv', "a")
+					f.write(f'{newSig},{nodes.sig(tid)},{label}{faces - (labels[1][i] if d == 1 else labels[0][i])}\n')
+					f.close()
+
+		if verbose:
+			print(f'Number of pseudogeometric triangulations: {counts[FLAT]}')
+			print(f'Number of non-pseudogeometric triangulations: {counts[NOTFLAT]}')
+			print(f'Total: {sum(counts)} triangulations in {round(time.time() - t0, 2)} seconds.')
+			if not budget.complete():
+				print(budget.report())
+
+		vs.closeVisited(nodes)
+		return
@@ -0,0 +1,119 @@
+import time
+
+#####################################################################################
+########################### Search Budgets ##########################################
+#####################################################################################
+# Limits on the cost of a search, besides its `max_tets` ceiling. A search given a Budget
+# asks it before expanding (searching from) each new node:
+#
+#	budget = Budget(min_tets=4, level_nodes={9: 1000, 10: 500}, max_nodes=10**5, max_seconds=3600)
+#	graphPseudogeometricSearch(sig, 11, budget=budget)
+#	budget.summary()	# {'expanded': ..., 'truncated': {'level cap': {'9': 211}, ...}, ...}
+#
+# A node cut off by a budget is still recorded (in the nodes and edges files) like any
+# other, but none of its moves are made, so the part of the component beyond it is not
+# searched. The summary says where this happened, so a run that stopped early can be told
+# apart from a complete one, and rerun with larger budgets where it matters.
+
+class Budget:
+	"""
+	Limits on how much of a component a search expands:
+	- min_tets: no 3-2 moves from triangulations with min_tets tetrahedra or fewer (a floor,
+		as max_tets is a ceiling for 2-3 moves)
+	- level_nodes: the most nodes expanded with each number of tetrahedra: an integer for
+		every level, or a dictionary {tetrahedra: cap} (levels not in it have no cap)
+	- max_nodes: the most nodes expanded in total
+	- max_seconds: seconds after the search starts (see `start`) at which it stops, dropping
+		the nodes still queued
+	None means no limit. The root of a search is always expanded (and counted).
+	"""
+	def __init__(self, min_tets=None, level_nodes=None, max_nodes=None, max_seconds=None):
+		self.min_tets = min_tets
+		self.level_nodes = level_nodes
+		self.max_nodes = max_nodes
+		self.max_seconds = max_seconds
+		self.t0 = time.time()
+		self.nodes = 0
+		self.levels = {} # tetrahedra: nodes expanded
+		self.truncated = {} # reason: {tetrahedra: nodes not expanded}
+
+	def start(self):
+		"""
+		Starts the clock of max_seconds. Searches call this when they start, so a budget
+		made well before the search it is given to still gets its full time.
+		"""
+		self.t0 = time.time()
+
+	def levelCap(self, tets):
+		if isinstance(self.level_nodes, dict):
+			return self.level_nodes.get(tets)
+		return self.level_nodes
+
+	def count(self, tets):
+		self.nodes += 1
+		self.levels[tets] = self.levels.get(tets, 0) + 1
+
+	def cut(self, reason, tets, count=1):
+		levels = self.truncated.setdefault(reason, {})
+		levels[tets] = levels.get(tets, 0) + count
+
+	def expand(self, tets):
+		"""
+		Whether a new node with `tets` tetrahedra is expanded. Counts it if so, and records
+		which budget cut it off if not.
+		"""
+		cap = self.levelCap(tets)
+		if self.max_nodes is not None and self.nodes >= self.max_nodes:
+			self.cut('node budget', tets)
+		elif cap is not None and self.levels.get(tets, 0) >= cap:
+			self.cut('level cap', tets)
+		elif self.timeUp():
+			self.cut('time budget', tets)
+		else:
+			self.count(tets)
+			return True
+		return False
+
+	def down(self, tets):
+		"""
+		Whether 3-2 moves are made from a node with `tets` tetrahedra (see min_tets).
+		"""
+		return self.min_tets is None or tets > self.min_tets
+
+	def timeUp(self):
+		return self.max_seconds is not None and time.time() - self.t0 > self.max_seconds
+
+	def drop(self, levels):
+		"""
+		Records the nodes left in the queue when the time ran out, given by their numbers of
+		tetrahedra (nodes some of whose moves were already made included).
+		"""
+		for tets in levels:
+			self.cut('time budget', tets)
+
+	def complete(self):
+		"""
+		Whether no budget cut anything off (the floor and ceiling aside).
+		"""
+		return not self.truncated
+
+	def summary(self):
+		return {
+			'seconds': time.time() - self.t0,
+			'expanded': self.nodes,
+			'levels': {str(n): self.levels[n] for n in sorted(self.levels)},
+			'complete': self.complete(),
+			'truncated': {reason: {str(n): levels[n] for n in sorted(levels)} for reason, levels in self.truncated.items()},
+		}
+
+	def report(self):
+		"""
+		One line per budget that cut the search off, and the levels where it did.
+		"""
+		if self.complete():
+			return 'Search complete (no budget reached).'
+		lines = []
+		for reason, levels in self.truncated.items():
+			where = ', '.join(f'{levels[n]} at {n} tetrahedra' for n in sorted(levels))
+			lines.append(f'Truncated by {reason}: {sum(levels.values())} nodes not expanded ({where}).')
+		return '\n'.join(lines)
@@ -0,0 +1,422 @@
+import os, sys, json, time, signal, resource, argparse
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'recursion-gadget'), os.path.join(ROOT, 'testing-scripts')]
+
+#####################################################################################
+########################### Command Line ############################################
+#####################################################################################
+# Batch runs without editing scripts, e.g.
+#
+#	python cli.py search --graph pseudogeometric --max-tets 10 --manifest jobs.txt --processes 8
+#	python cli.py census --max-tets 10 0 500 --shard 3/16 --results results.jsonl --resume
+#	python cli.py search --max-tets 12 --level-nodes 11:5000,12:2000 --max-seconds 3600 cPcbbbiht	# budgets, see budget.py
+#	python cli.py dd-search --levels 2 --census knots --range 0 100
+#	python cli.py verify m004-nodes.csv --cache verified.csv
+#	python cli.py isolated --manifest sigs.txt
+#	python cli.py bench --baseline benchmark-baseline.json
+#	python cli.py queue census.db --range 0 1000 --max-tets 10	# sharded census, see sharding.py
+#	python cli.py worker census.db --directory shards --processes 8	# on each machine
+#	python cli.py merge census.db pseudogeometric-census-10-tets
+#	python cli.py index sigs.db examples large-examples	# isosig index, see sigindex.py
+#	python cli.py lookup sigs.db dLQbcccdxwb --manifest sigs.txt
+#
+# A manifest has one entry per line: an isosig, or a census range `<census> <start> <end>`
+# where census is `orientable` (OrientableCuspedCensus) or `knots` (CensusKnots). Blank lines
+# and lines starting with # are ignored.
+#
+# search, census and dd-search run one job per triangulation, each in a fresh worker process
+# (so --max-memory and --timeout apply per job). Every finished job is reported as a JSON
+# line on stdout (--format json) or a text line, appended to --results if given, and a
+# progress line `[done/total]` goes to stderr. Exit status: see EXIT_*.
+#
+# Heavy modules (Sage, SnapPy, Regina and the search code) are only imported by the
+# subcommands that need them, so `--help` and job bookkeeping are fast.
+
+EXIT_OK = 0 # every job succeeded
+EXIT_FAILED = 1 # some job raised an error
+EXIT_USAGE = 2 # bad arguments or manifest (also argparse's own exit status)
+EXIT_LIMIT = 3 # no job failed, but some job ran out of time or memory
+
+CENSUSES = {'orientable': 'OrientableCuspedCensus', 'knots': 'CensusKnots'}
+
+class ManifestError(Exception):
+	pass
+
+class JobTimeout(Exception):
+	pass
+
+def censusEntries(census, start, end):
+	"""
+	Jobs (label, isosig) for manifolds start, ..., end - 1 of a census (see CENSUSES).
+	"""
+	import snappy
+	if census not in CENSUSES:
+		raise ManifestError(f'unknown census {census} (expected one of {", ".join(CENSUSES)})')
+	C = getattr(snappy, CENSUSES[census])
+	return [(str(i), C[i].triangulation_isosig(decorated=False)) for i in range(start, min(end, len(C)))]
+
+def readManifest(file):
+	"""
+	Jobs (label, isosig) from a manifest file (see top of file). Isosigs are their own label.
+	"""
+	jobs = []
+	with open(file, 'r') as f:
+		for n, line in enumerate(f):
+			words = line.split()
+			if not words or words[0].startswith('#'):
+				continue
+			if len(words) == 1:
+				jobs.append((words[0], words[0]))
+			elif len(words) == 3 and words[1].isdigit() and words[2].isdigit():
+				jobs.extend(censusEntries(words[0], int(words[1]), int(words[2])))
+			else:
+				raise ManifestError(f'{file}, line {n + 1}: expected an isosig or `<census> <start> <end>`')
+	return jobs
+
+def selectJobs(args):
+	"""
+	The jobs of a run: its isosigs, manifest and census range, restricted to its shard.
+	"""
+	jobs = [(sig, sig) for sig in getattr(args, 'sigs', [])]
+	if getattr(args, 'manifest', None) is not None:
+		jobs += readManifest(args.manifest)
+	if getattr(args, 'range', None) is not None:
+		jobs += censusEntries(args.census, args.range[0], args.range[1])
+	if getattr(args, 'start', None) is not None:
+		jobs += censusEntries(args.census, args.start, args.end)
+	if args.shard is not None:
+		k, n = args.shard
+		jobs = jobs[k::n]
+	return jobs
+
+def shard(text):
+	k, n = text.split('/')
+	k, n = int(k), int(n)
+	if not 0 <= k < n:
+		raise argparse.ArgumentTypeError('shard must be k/n with 0 <= k < n')
+	return (k, n)
+
+def setLimits(max_memory, float_only):
+	"""
+	Pool initializer: memory limit (MB) and float-only mode for every job in the worker.
+	"""
+	if max_memory is not None:
+		limit = max_memory * 1024 * 1024
+		resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+	if float_only:
+		import geometricmoves as gm
+		gm.setFloatOnly()
+
+def alarm(signum, frame):
+	raise JobTimeout()
+
+def levelNodes(text):
+	"""
+	--level-nodes: one cap for every level, or `tetrahedra:cap` pairs separated by commas.
+	"""
+	if ':' not in text:
+		return int(text)
+	return {int(tets): int(cap) for tets, cap in (pair.split(':') for pair in text.split(','))}
+
+def searchJob(command, label, sig, options):
+	"""
+	Runs one search. Returns its result (or None), with where its budget cut it off if any
+	budget was given (see budget.py).
+	"""
+	profile = os.path.join(options['directory'], f'{label}-profile.json') if options['profile'] else None
+	import budget as bg
+	budget = bg.Budget(options['min_tets'], options['level_nodes'], options['max_nodes'], options['max_seconds'])
+	result = None
+	if command == 'dd-search':
+		import recursiongadget as rg
+		max_tets = options['levels'] if options['levels'] is not None else options['max_tets']
+		rg.pseudogeometricDDSearch(sig, max_tets, label, options['depth'], verbose=False, directory=options['directory'], levels=options['levels'] is not None, visited_dir=options['visited_dir'], budget=budget, profile=profile)
+	elif options['graph'] == 'pseudogeometric' and options['arrays']:
+		import arraytri as at
+		at.arrayPseudogeometricSearch(sig, options['max_tets'], verbose=False, record_nons=options['record_nons'], directory=options['directory'], visited_dir=options['visited_dir'], budget=budget, profile=profile)
+	else:
+		import geometricsearch as gs
+		store = None
+		if options['node_store'] is not None:
+			import nodestore
+			store = nodestore.NodeStore(options['node_store'])
+		if options['graph'] == 'pseudogeometric':
+			gs.graphPseudogeometricSearch(sig, options['max_tets'], verbose=False, record_nons=options['record_nons'], directory=options['directory'], visited_dir=options['visited_dir'], certify=options['certify'], budget=budget, store=store, profile=profile)
+		elif options['graph'] == 'geometric':
+			gs.graphGeometricSearch(sig, options['max_tets'], verbose=False, directory=options['directory'], budget=budget, store=store, profile=profile)
+		elif options['graph'] == 'essential':
+			gs.graphEssentialSearch(sig, options['max_tets'], verbose=False, directory=options['directory'], budget=budget, store=store, profile=profile)
+		else:
+			found = gs.geometricSearch(sig, options['max_tets'], verbose=False, certify=options['certify'], budget=budget, profile=profile)
+			result = {'geometric': len(found)}
+	if any(options[key] is not None for key in ['min_tets', 'level_nodes', 'max_nodes', 'max_seconds']):
+		summary = budget.summary()
+		result = {**(result or {}), 'complete': summary['complete'], 'expanded': summary['expanded'], 'truncated': summary['truncated']}
+	return result
+
+def runJob(job):
+	"""
+	Runs one job (command, label, isosig, options) in a worker. Returns its report:
+	status 'ok', 'failed', 'timeout' or 'memory', seconds, and the job's result if any.
+	"""
+	command, label, sig, options = job
+	report = {'job': label, 'sig': sig}
+	t0 = time.time()
+	signal.signal(signal.SIGALRM, alarm)
+	signal.alarm(options['timeout'] or 0)
+	try:
+		result = searchJob(command, label, sig, options)
+		report['status'] = 'ok'
+		if result is not None:
+			report['result'] = result
+	except JobTimeout:
+		report['status'] = 'timeout'
+	except MemoryError:
+		report['status'] = 'memory'
+	except Exception as e:
+		report['status'] = 'failed'
+		report['error'] = f'{type(e).__name__}: {e}'
+	finally:
+		signal.alarm(0)
+	report['seconds'] = round(time.time() - t0, 3)
+	return report
+
+def finishedJobs(results):
+	"""
+	Labels of the jobs which succeeded in a results file (for --resume).
+	"""
+	done = set()
+	if results is not None and os.path.exists(results):
+		with open(results, 'r') as f:
+			for line in f:
+				report = json.loads(line)
+				if report['status'] == 'ok':
+					done.add(report['job'])
+	return done
+
+def exitStatus(statuses):
+	if 'failed' in statuses:
+		return EXIT_FAILED
+	if 'timeout' in statuses or 'memory' in statuses:
+		return EXIT_LIMIT
+	return EXIT_OK
+
+def report(args, line):
+	"""
+	Print a report (a dictionary) to stdout in the chosen format, and append it to --results.
+	"""
+	if args.format == 'json':
+		print(json.dumps(line), flush=True)
+	else:
+		print(' '.join(f'{key}={value}' for key, value in line.items()), flush=True)
+	if args.results is not None:
+		f = open(args.results, 'a')
+		f.write(json.dumps(line) + '\n')
+		f.close()
+
+def runJobs(args):
+	"""
+	search, census and dd-search: run every selected job in a pool of args.processes workers.
+	"""
+	jobs = selectJobs(args)
+	if args.resume:
+		done = finishedJobs(args.results)
+		jobs = [job for job in jobs if job[0] not in done]
+	os.makedirs(args.directory, exist_ok=True)
+	options = {key: getattr(args, key, None) for key in ['graph', 'max_tets', 'levels', 'depth', 'directory', 'record_nons', 'visited_dir', 'certify', 'arrays', 'profile', 'timeout', 'float_only', 'min_tets', 'level_nodes', 'max_nodes', 'max_seconds', 'node_store']}
+	if options['depth'] is None:
+		options['depth'] = len(jobs)
+	work = [(args.command, label, sig, options) for label, sig in jobs]
+
+	statuses = []
+	t0 = time.time()
+	with Pool(args.processes, setLimits, (args.max_memory, args.float_only), maxtasksperchild=1) as pool:
+		for line in pool.imap_unordered(runJob, work):
+			statuses.append(line['status'])
+			report(args, line)
+			print(f'[{len(statuses)}/{len(work)}] {line["job"]} {line["status"]} ({round(time.time() - t0, 1)} seconds)', file=sys.stderr, flush=True)
+	return exitStatus(statuses)
+
+def verifyCommand(args):
+	import verification as ver
+	statuses = []
+	for file in args.files:
+		counts = ver.verifyNodes(file, processes=args.processes, cache=args.cache, verbose=False)
+		status = 'ok' if counts.get('mismatch', 0) == 0 and counts.get('error', 0) == 0 else 'failed'
+		report(args, {'job': file, 'status': status, **counts})
+		statuses.append(status)
+	return exitStatus(statuses)
+
+def isolatedCommand(args):
+	import batchisolated as bi
+	sigs = [sig for label, sig in selectJobs(args)]
+	errors = []
+	isolated = set(bi.verifyIsolatedBatch(sigs, processes=args.processes, errors=errors, verbose=False))
+	errors = set(errors)
+	statuses = []
+	for sig in sigs:
+		status = 'failed' if sig in errors else 'ok'
+		report(args, {'job': sig, 'status': status, 'isolated': sig in isolated})
+		statuses.append(status)
+	return exitStatus(statuses)
+
+def benchCommand(args):
+	import benchmark
+	ok = benchmark.runBenchmarks(args.workloads or None, results=args.output, baseline=args.baseline, threshold=args.threshold)
+	return EXIT_OK if ok else EXIT_FAILED
+
+def queueCommand(args):
+	import sharding
+	if args.range is not None:
+		added = sharding.addCensus(args.queue, args.census, args.range[0], args.range[1], args.max_tets, args.graph)
+		print(f'Added {added} jobs.', file=sys.stderr)
+	if args.reset_failed:
+		print(f'Reset {sharding.resetJobs(args.queue)} failed jobs.', file=sys.stderr)
+	report(args, {'job': args.queue, 'status': 'ok', **sharding.jobStatus(args.queue)})
+	return EXIT_OK
+
+def shardWorker(args):
+	import sharding
+	return sharding.runWorker(args.queue, args.directory, lease=args.lease, max_attempts=args.max_attempts, verbose=False)
+
+def workerCommand(args):
+	processes = args.processes or os.cpu_count()
+	with Pool(processes) as pool:
+		jobs = sum(pool.map(shardWorker, [args] * processes))
+	import sharding
+	status = sharding.jobStatus(args.queue)
+	report(args, {'job': args.queue, 'status': 'ok', 'run': jobs, **status})
+	return EXIT_FAILED if status.get('failed', 0) else EXIT_OK
+
+def mergeCommand(args):
+	import sharding
+	missing = sharding.mergeShards(args.queue, args.output, args.graph, args.max_tets, verbose=False)
+	report(args, {'job': args.output, 'status': 'ok' if not missing else 'failed', 'missing': len(missing)})
+	return EXIT_OK if not missing else EXIT_FAILED
+
+def indexCommand(args):
+	import sigindex
+	index = sigindex.SigIndex(args.index)
+	for tree in args.trees:
+		read, dropped = index.update(tree, verbose=False)
+		report(args, {'job': tree, 'status': 'ok', 'read': read, 'dropped': dropped})
+	index.close()
+	return EXIT_OK
+
+def lookupCommand(args):
+	import sigindex
+	index = sigindex.SigIndex(args.index)
+	found = index.lookupMany([sig for label, sig in selectJobs(args)])
+	index.close()
+	for sig, entries in found.items():
+		report(args, {'job': sig, 'status': 'ok' if entries else 'missing', 'entries': entries})
+	return EXIT_OK if all(found.values()) else EXIT_FAILED
+
+def parser():
+	p = argparse.ArgumentParser(description='Search the Pachner graph for geometric triangulations.')
+	sub = p.add_subparsers(dest='command', required=True)
+
+	common = argparse.ArgumentParser(add_help=False)
+	common.add_argument('--processes', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+	common.add_argument('--format', choices=['text', 'json'], default='text', help='format of the job reports on stdout')
+	common.add_argument('--results', default=None, help='file to append the job reports to, as JSON lines')
+	common.add_argument('--float-only', action='store_true', help='never compute exact shapes (and never import Sage)')
+
+	jobs = argparse.ArgumentParser(add_help=False)
+	jobs.add_argument('--manifest', default=None, help='file of isosigs and census ranges, see cli.py')
+	jobs.add_argument('--shard', type=shard, default=None, help='k/n: only run every n-th job, starting from job k')
+
+	limits = argparse.ArgumentParser(add_help=False)
+	limits.add_argument('--max-tets', type=int, default=10, help='triangulations of this size or greater are not searched')
+	limits.add_argument('--directory', default='.', help='output directory')
+	limits.add_argument('--timeout', type=int, default=None, help='seconds before a job is stopped')
+	limits.add_argument('--max-memory', type=int, default=None, help='memory limit of each job in MB')
+	limits.add_argument('--resume', action='store_true', help='skip jobs which succeeded according to --results')
+	limits.add_argument('--visited-dir', default=None, help='keep visited sets on disk here, see visitedset.py')
+	limits.add_argument('--profile', action='store_true', help='write a {job}-profile.json per job, see profiler.py')
+	limits.add_argument('--min-tets', type=int, default=None, help='no 3-2 moves from triangulations of this size or smaller, see budget.py')
+	limits.add_argument('--level-nodes', type=levelNodes, default=None, help='most nodes searched from per number of tetrahedra: N, or T:N,T:N,...')
+	limits.add_argument('--max-nodes', type=int, default=None, help='most nodes searched from per job')
+	limits.add_argument('--max-seconds', type=int, default=None, help='seconds after which a job stops searching, keeping its output (unlike --timeout)')
+
+	search = argparse.ArgumentParser(add_help=False)
+	search.add_argument('--graph', choices=['pseudogeometric', 'geometric', 'essential', 'none'], default='pseudogeometric', help="which subgraph to write out ('none': only count geometric triangulations)")
+	search.add_argument('--record-nons', action='store_true', help='also record non-pseudogeometric neighbours')
+	search.add_argument('--certify', action='store_true', help='certify the output, see verification.py')
+	search.add_argument('--arrays', action='store_true', help='pseudogeometric search with float shapes on array triangulations, see arraytri.py')
+	search.add_argument('--node-store', type=int, default=None, metavar='INTERVAL', help='queue nodes as parent pointers, checkpointing every INTERVAL levels, and write a -tree.csv; see nodestore.py')
+
+	s = sub.add_parser('search', parents=[common, jobs, limits, search], help='search the components of isosigs')
+	s.add_argument('sigs', nargs='*', help='isosigs to search from')
+
+	s = sub.add_parser('census', parents=[common, jobs, limits, search], help='search the components of a census range')
+	s.add_argument('--census', choices=list(CENSUSES), default='orientable')
+	s.add_argument('start', type=int, help='first census index to search')
+	s.add_argument('end', type=int, help='census index to stop before')
+
+	s = sub.add_parser('dd-search', parents=[common, jobs, limits], help='search for DD recursion gadgets')
+	s.add_argument('--census', choices=list(CENSUSES), default='knots')
+	s.add_argument('--levels', type=int, default=None, help='search up to census tetrahedra + levels (instead of --max-tets)')
+	s.add_argument('--depth', type=int, default=None, help='depth used in the output file names (default: number of jobs)')
+	s.add_argument('--range', type=int, nargs=2, default=None, metavar=('START', 'END'), help='census range to search')
+	s.add_argument('sigs', nargs='*', help='isosigs to search from')
+
+	s = sub.add_parser('verify', parents=[common], help='verify nodes CSVs with SnapPy')
+	s.add_argument('--cache', default=None, help='verification cache, see verification.py')
+	s.add_argument('files', nargs='+')
+
+	s = sub.add_parser('isolated', parents=[common, jobs], help='find geometrically isolated triangulations')
+	s.add_argument('sigs', nargs='*', help='isosigs to check')
+
+	s = sub.add_parser('queue', parents=[common], help='create, extend or show a sharded census job queue, see sharding.py')
+	s.add_argument('queue', help='job database (on shared storage)')
+	s.add_argument('--census', choices=list(CENSUSES), default='orientable')
+	s.add_argument('--range', type=int, nargs=2, default=None, metavar=('START', 'END'), help='census range to add jobs for')
+	s.add_argument('--graph', choices=['pseudogeometric', 'essential'], default='pseudogeometric')
+	s.add_argument('--max-tets', type=int, default=10, help='triangulations of this size or greater are not searched')
+	s.add_argument('--reset-failed', action='store_true', help='make failed jobs pending again')
+
+	s = sub.add_parser('worker', parents=[common], help='run jobs from a sharded census job queue until it is empty')
+	s.add_argument('queue', help='job database (on shared storage)')
+	s.add_argument('--directory', default='shards', help='outputs go to {directory}/{worker}')
+	s.add_argument('--lease', type=int, default=600, help='seconds before a job of a silent worker is handed out again')
+	s.add_argument('--max-attempts', type=int, default=3, help='attempts before a job is marked failed')
+
+	s = sub.add_parser('merge', parents=[common], help='merge the outputs of a sharded census into one directory')
+	s.add_argument('queue', help='job database (on shared storage)')
+	s.add_argument('output', help='directory to merge into (its name is used for the summary table)')
+	s.add_argument('--graph', choices=['pseudogeometric', 'essential'], default='pseudogeometric')
+	s.add_argument('--max-tets', type=int, default=None, help='only merge jobs with this max tets')
+
+	s = sub.add_parser('index', parents=[common], help='index the nodes CSVs under directories by isosig, see sigindex.py')
+	s.add_argument('index', help='index database')
+	s.add_argument('trees', nargs='+', help='directories of search outputs')
+
+	s = sub.add_parser('lookup', parents=[common, jobs], help='look isosigs up in an isosig index')
+	s.add_argument('index', help='index database')
+	s.add_argument('sigs', nargs='*', help='isosigs to look up')
+
+	s = sub.add_parser('bench', parents=[common], help='run the benchmarks, see testing-scripts/benchmark.py')
+	s.add_argument('--output', default='benchmark-results.json')
+	s.add_argument('--baseline', default=None)
+	s.add_argument('--threshold', type=float, default=0.1)
+	s.add_argument('workloads', nargs='*')
+	return p
+
+COMMANDS = {'search': runJobs, 'census': runJobs, 'dd-search': runJobs, 'verify': verifyCommand, 'isolated': isolatedCommand, 'bench': benchCommand, 'queue': queueCommand, 'worker': workerCommand, 'merge': mergeCommand, 'index': indexCommand, 'lookup': lookupCommand}
+
+def main(argv=None):
+	args = parser().parse_args(argv)
+	if args.float_only:
+		import geometricmoves as gm
+		gm.setFloatOnly()
+	try:
+		return COMMANDS[args.command](args)
+	except (ManifestError, OSError) as e:
+		print(f'error: {e}', file=sys.stderr)
+		return EXIT_USAGE
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -1,5 +1,65 @@
-import regina
-from sage.all import QQbar
+import regina, os
+import profiler as prof
+
+# Sage is slow to import, and only needed for exact (QQbar) arithmetic on shapes from
+# `find_field`. It is imported the first time an exact shape is seen, so float-only runs
+# (and process pool workers) never load it. In float-only mode (`setFloatOnly`, or the
+# environment variable GEOMETRIC_FLOAT_ONLY=1, which spawned workers inherit) exact shapes
+# are never computed and Sage is never imported.
+FLOAT_ONLY = os.environ.get('GEOMETRIC_FLOAT_ONLY') == '1'
+QQbar = None
+
+def setFloatOnly(flag=True):
+    global FLOAT_ONLY
+    FLOAT_ONLY = flag
+    os.environ['GEOMETRIC_FLOAT_ONLY'] = '1' if flag else '0'
+
+def exactField():
+    """
+    Sage's QQbar, imported on first use.
+    """
+    global QQbar
+    if QQbar is None:
+        from sage.all import QQbar
+    return QQbar
+
+def toExact(shape):
+    """
+    The shape as an element of QQbar, or None if it is floating point. Only Sage types
+    can be exact, so anything else is decided without importing Sage.
+    """
+    if FLOAT_ONLY or not type(shape).__module__.startswith('sage'):
+        return None
+    try:
+        return exactField()(shape)
+    except:
+        return None
+
+def real(z):
+    """
+    Real part of z, whether `real` is an attribute (python complex) or a method (Sage, SnapPy).
+    """
+    r = z.real
+    return r() if callable(r) else r
+
+def imag(z):
+    """
+    Imaginary part of z (see `real`).
+    """
+    i = z.imag
+    return i() if callable(i) else i
+
+def startingShapes(M, *args):
+    """
+    Shapes of the manifold M: exact (from SnapPy's `find_field(*args)`) if a field can be
+    found, otherwise (or in float-only mode) floating point.
+    """
+    if not FLOAT_ONLY:
+        try:
+            return M.tetrahedra_field_gens().find_field(*args)[2]
+        except:
+            print("Could not find field: falling back to floating point")
+    return M.tetrahedra_shapes(part='rect')
 
 def edgeParameter(v1, v2, z):
     """
@@ -22,6 +82,13 @@ def edgeParameter(v1, v2, z):
             return (z - 1) / z
     raise Exception("edgeParameter invalid")
 
+def isExact(shape):
+    """
+    Returns True if the shape is an exact algebraic number (e.g. from `find_field`),
+    False if it is floating point
+    """
+    return toExact(shape) is not None
+
 def shapeOrientation(shapes):
     """
     Given a list of shapes, determines whether they induce a triangulation which is
@@ -30,32 +97,37 @@ def shapeOrientation(shapes):
     - Negatively Oriented (return -1): at least one shape Im z < 0
     Second return type is a tuple (# of flat tetrahedra, # of negatively oriented tetrahedra)
     """
-    flat_count = 0
-    negative_count = 0
-    for s in shapes: 
-        try: #here to catch if input is floating or algebraic (should change this eventually)
-            if QQbar(s).imag() < 0:
-                negative_count += 1
-            if QQbar(s).imag() == 0:
-                flat_count += 1
-        except:
-            if s.imag() < 0:
-                negative_count += 1
-            if s.imag() < 0.00000001:
-                flat_count += 1
-    if negative_count > 0:
-        return (-1, (flat_count, negative_count))
-    elif flat_count > 0:
-        return (0, (flat_count, negative_count))
-    else:
-        return (1, (0, 0))
+    with prof.ACTIVE.phase('shape orientation'):
+        flat_count = 0
+        negative_count = 0
+        for s in shapes: 
+            exact = toExact(s)
+            if exact is not None:
+                if exact.imag() < 0:
+                    negative_count += 1
+                if exact.imag() == 0:
+                    flat_count += 1
+            else:
+                if imag(s) < 0:
+                    negative_count += 1
+                if imag(s) < 0.00000001:
+                    flat_count += 1
+        if negative_count > 0:
+            return (-1, (flat_count, negative_count))
+        elif flat_count > 0:
+            return (0, (flat_count, negative_count))
+        else:
+            return (1, (0, 0))
 
     # forked from branch moves - henryseg - veering
-def twoThreeMove(tri, shapes, face_num, perform = True, return_edge = False):
+def twoThreeMove(tri, shapes, face_num, perform = True, return_edge = False, check = True, local = False):
     """
     Apply a 2-3 move to a triangulation, maintaining geometric structure, if possible. 
     If perform = False, returns if the move is possible.
     If perform = True, modifies tri and shapes, returns (tri, new_shapes) for the performed move
+    If check = False, skips cross-checking the result against Regina's own 2-3 move.
+    If local = True, the orientation returned only takes the three new tetrahedra into
+    account (for when the other tetrahedra are known to be geometric).
     Important: assumes tri is oriented
     """
 
@@ -82,8 +154,10 @@ def twoThreeMove(tri, shapes, face_num, perform = True, return_edge = False):
     ### for now, lets assume yes
 
     ### check we do the same as regina... 
-    tri2 = regina.Triangulation3(tri)  ## make a copy
-    tri2.pachner(tri2.triangle(face_num))
+    if check:
+        with prof.ACTIVE.phase('regina cross-check'):
+            tri2 = regina.Triangulation3(tri)  ## make a copy
+            tri2.pachner(tri2.triangle(face_num))
 
     ## record the tetrahedra and gluings adjacent to tet0 and tet1
 
@@ -185,7 +259,9 @@ def twoThreeMove(tri, shapes, face_num, perform = True, return_edge = False):
                 else:
                     new_tets[j].join(1 - i, gluings[i][j][0], gluings[i][j][1])
 
-    assert tri.isIsomorphicTo(tri2)
+    if check:
+        with prof.ACTIVE.phase('regina cross-check'):
+            assert tri.isIsomorphicTo(tri2)
     # assert tri.isOriented()
 
     ### update the shape parameters:
@@ -215,12 +291,14 @@ def twoThreeMove(tri, shapes, face_num, perform = True, return_edge = False):
     if not (new_shape0 and new_shape1 and new_shape2): #if any returned false
         return (True, tri, shapes, (-2, (0,0)))
 	
-    return (True, tri, shapes, shapeOrientation(shapes))    
+    return (True, tri, shapes, shapeOrientation(shapes[-3:] if local else shapes))    
 
-def threeTwoMove(tri, shapes, edge_num):
+def threeTwoMove(tri, shapes, edge_num, check = True, local = False):
     """Apply a 3-2 move to a triangulation, maintaining geometric structure, if possible. 
     If perform = False, returns if the move is possible.
     If perform = True, modifies tri and shapes, returns (success, tri, new_shapes, geom?) for the performed move
+    If check = False, skips cross-checking the result against Regina's own 3-2 move.
+    If local = True, the orientation returned only takes the two new tetrahedra into account.
     Important: assumes tri is oriented
     """
 
@@ -241,8 +319,10 @@ def threeTwoMove(tri, shapes, edge_num):
         return (False, False, False, (False, (False, False)))  ### tetrahedra must be distinct
      
     ### check we do the same as regina... 
-    tri2 = regina.Triangulation3(tri)  ## make a copy
-    tri2.pachner(tri2.edge(edge_num))
+    if check:
+        with prof.ACTIVE.phase('regina cross-check'):
+            tri2 = regina.Triangulation3(tri)  ## make a copy
+            tri2.pachner(tri2.edge(edge_num))
 
     ## record the tetrahedra and gluings adjacent to the tets 
 
@@ -342,7 +422,9 @@ def threeTwoMove(tri, shapes, edge_num):
                     assert gluings[i][j][0].adjacentTetrahedron(gluings[i][j][1][3 - i]) == None
                     new_tets[j].join(3 - i, gluings[i][j][0], gluings[i][j][1])  ## swap 1 and 2
 
-    assert tri.isIsomorphicTo(tri2)
+    if check:
+        with prof.ACTIVE.phase('regina cross-check'):
+            assert tri.isIsomorphicTo(tri2)
     # assert tri.isOriented()
 
     ### update shapes
@@ -362,7 +444,7 @@ def threeTwoMove(tri, shapes, edge_num):
         return (True, tri, shapes, (-2, (0,0)))
 
     shapes.extend([new_shape0, new_shape1])
-    return (True, tri, shapes, shapeOrientation(shapes))  
+    return (True, tri, shapes, shapeOrientation(shapes[-2:] if local else shapes))  
 
 
     
\ No newline at end of file
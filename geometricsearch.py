@@ -1,13 +1,96 @@
 import regina, snappy
 import geometricmoves as gm
+import profiler as prof
+import visitedset as vs
+import verification as ver
+import budget as bg
 import time
-from sage.all import QQbar
 
 #####################################################################################
 ########################### Searching Functions #####################################
 #####################################################################################
 
-def geometricSearch(sig, max_tets, verify=False, verbose=True, census=False):
+def manifoldName(M):
+	"""
+	Name of the manifold M in SnapPy's census (as in the names of the pseudogeometric
+	output files), or '' if it is not identified.
+	"""
+	l = M.identify()
+	return l[0] if l else ''
+
+def canonicalFace(C, iso, t, f):
+	"""
+	Index in the canonical triangulation C = iso(T) of face f of tetrahedron t of T.
+	"""
+	return C.tetrahedron(iso.simpImage(t)).triangle(iso.facetPerm(t)[f]).index()
+
+def canonicalEdge(C, iso, t, a, b):
+	"""
+	Index in the canonical triangulation C = iso(T) of the edge ab of tetrahedron t of T.
+	"""
+	p = iso.facetPerm(t)
+	return C.tetrahedron(iso.simpImage(t)).edge(p[a], p[b]).index()
+
+class Node:
+	"""
+	A triangulation found by a graph search, with what the search needs to know about it,
+	computed once when it is found: the triangulation T and its shapes, its id (see
+	`visitedset.SigTable`), and the isomorphism iso from T to the canonical triangulation
+	of its isosig (from `isoSigDetail`, so iso(T) is `fromIsoSig(sig)`). The faces and edges
+	of T are labelled by their indices in the canonical triangulation (see `label`), which
+	do not depend on the path the search took to T. With a `nodestore.NodeStore`, a queued
+	node only keeps its id, its key in the store and its number of tetrahedra tets (T, shapes
+	and iso are None) until it is searched from.
+	"""
+	__slots__ = ('T', 'shapes', 'id', 'iso', 'faces', 'edges', 'key', 'tets')
+
+	def __init__(self, T, shapes, id, iso, key=None, tets=None):
+		self.T = T
+		self.tets = T.countTetrahedra() if T is not None else tets
+		self.shapes = shapes
+		self.id = id
+		self.iso = iso
+		self.faces = None
+		self.edges = None
+		self.key = key
+
+	def canonical(self, d, i):
+		"""
+		Index in the canonical triangulation of edge i (d = 1) or face i (d = 2) of T.
+		"""
+		if self.faces is None:
+			C = self.iso.apply(self.T)
+			self.faces = [canonicalFace(C, self.iso, face.embedding(0).simplex().index(), face.embedding(0).face()) for face in self.T.triangles()]
+			self.edges = []
+			for edge in self.T.edges():
+				embed = edge.embedding(0)
+				self.edges.append(canonicalEdge(C, self.iso, embed.simplex().index(), embed.vertices()[0], embed.vertices()[1]))
+		return self.edges[i] if d == 1 else self.faces[i]
+
+	def load(self, store):
+		"""
+		Fills in T, shapes and iso of a node kept only in store (see nodestore.py).
+		"""
+		rebuilt = store.rebuild(self.key)
+		self.T, self.shapes, self.iso = rebuilt.T, rebuilt.shapes, rebuilt.iso
+
+	def local(self, d, index):
+		"""
+		The edge (d = 1) or face (d = 2) of T with the given index in the canonical triangulation
+		(the inverse of `canonical`).
+		"""
+		self.canonical(d, 0)
+		return (self.edges if d == 1 else self.faces).index(index)
+
+	def label(self, d, i):
+		"""
+		Label of the move on edge i (d = 1) or face i (d = 2) of T in the edges files:
+		#triangles - the index of the edge or face in the canonical triangulation.
+		"""
+		label = 'Edge: ' if d == 1 else 'Face: '
+		return f'{label}{self.T.countTriangles() - self.canonical(d, i)}'
+
+def geometricSearch(sig, max_tets, verify=False, verbose=True, census=False, processes=None, verify_cache=None, certify=False, budget=None, profile=None, progress=0):
 	"""
 	Search the geometric subgraph component containing the input isomorphism signature;
 	that is, perform 2-3 and 3-2 moves on the starting triangulation until either there
@@ -16,99 +99,137 @@ def geometricSearch(sig, max_tets, verify=False, verbose=True, census=False):
 	- sig: isometry signature (not decorated), assumed to be of a geometric triangulation
 	- max_tets: an integer, triangulations of this size or greater not to be searched
 	- verify: if true, will use SnapPy's `verify_hyperbolicity()` to check the output's
-		correctness. Usually takes a long time.
+		correctness, after the search, across `processes` processes (see verification.py).
+	- verify_cache: file of previously verified isosigs, see `verification.verifySigs`
+	- certify: if true, proves the output correct from the exact shapes found by the search
+		(see verification.py), and falls back to `verify` for the triangulations whose shapes
+		are floating point.
 	- census: if true, will output geometric triangulations to {sig}.txt. It is better
 		to use a graphing function instead.
+	- budget: a `budget.Budget` (floor, per-level and total node caps, time) limiting the
+		search: nodes it cuts off are recorded but not searched from. It says afterwards
+		where the search was cut off.
+	- profile: if given, records where the time goes (see profiler.py) and writes a JSON
+		summary to this file. progress: if > 0, prints a progress line every `progress` seconds.
 
 	Outputs list containing isosigs of geometric triangulations found.
 	"""
 	if verbose:
 		print(f"Searching {sig}...")
 	t0 = time.time()
-
-	
-
-	T = regina.Triangulation3.fromIsoSig(sig)
-	T.orient()
-	M = snappy.Manifold(T)
-
-	### field may not be found
-	L = M.tetrahedra_field_gens()
-	try:
-		shapes = L.find_field(100,10)[2]
-	except:
-		print("Could not find field: falling back to floating point")
-		shapes = M.tetrahedra_shapes(part='rect')
-	
-	geometric = [sig]
-	geomshapes = [shapes] # throw shapes in here, indexed same as geometric
-	nongeometric = []
-
-	# TODO : [ (Triangulation, [Shapes], index, dimension) ]
-	TODO = [(T, shapes, i, 2) for i in range(T.countTriangles())] + [(T, shapes, i, 1) for i in range(T.countEdges())]
-
-	while len(TODO) > 0:
-		T, shapes, i, d = TODO.pop(0)
-
-		# always work on a copy
-		S = regina.Triangulation3(T)
-		shapes2 = shapes.copy()
-
-		if d == 1: # 3-2 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
-
-		elif d == 2: # 2-3 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
-
-		if success:
-			newSig = newT.isoSig()
-			if oriented == 1:
-				if not newSig in geometric: #if we haven't seen it before
-					geometric.append(newSig)
-					if census:
-						f = open(f'{sig}.txt', "a")
-						f.write(f'[{newSig}], {newShapes}\n')
-						f.close()
-					geomshapes.append(newShapes)
-					TODO.extend([(newT, newShapes, j, 1) for j in range(newT.countEdges())])
-					if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
-						TODO.extend([(newT, newShapes, j, 2) for j in range(newT.countTriangles())])
+	with prof.profiling(profile, progress):
+		budget = bg.Budget() if budget is None else budget
+		budget.start()
+
+
+
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		M = snappy.Manifold(T)
+
+		### field may not be found
+		shapes = gm.startingShapes(M, 100,10)
+
+		nodes = vs.SigTable() # ids of the triangulations seen (see visitedset.SigTable)
+		geometric = [nodes.add(sig)[0]] # ids, in the order found
+		geomshapes = [shapes] # throw shapes in here, indexed same as geometric
+		nongeometric = []
+		seen = (set(geometric), set()) # ids of geometric and non-geometric triangulations
+		inexact = set() # ids of the triangulations found with floating point shapes (if certify)
+
+		# TODO : [ (Triangulation, [Shapes], index, dimension) ]
+		budget.count(T.countTetrahedra())
+		TODO = [(T, shapes, i, 2) for i in range(T.countTriangles())] + [(T, shapes, i, 1) for i in range(T.countEdges()) if budget.down(T.countTetrahedra())]
+
+		while len(TODO) > 0:
+			if budget.timeUp():
+				budget.drop({id(T): T.countTetrahedra() for T, shapes, i, d in TODO}.values())
+				break
+			T, shapes, i, d = TODO.pop(0)
+			prof.ACTIVE.queue(len(TODO), T.countTetrahedra())
+
+			# always work on a copy
+			with prof.ACTIVE.phase('copy'):
+				S = regina.Triangulation3(T)
+				shapes2 = shapes.copy()
+
+			with prof.ACTIVE.phase('move'):
+				if d == 1: # 3-2 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
+
+				elif d == 2: # 2-3 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
+
+			if success:
+				with prof.ACTIVE.phase('isosig'):
+					newSig = newT.isoSig()
+				with prof.ACTIVE.phase('dedupe'):
+					newId = nodes.add(newSig)[0]
+					visited = seen[0] if oriented == 1 else seen[1]
+					new = newId not in visited
+					visited.add(newId)
+				if certify and new and not ver.exactShapes(newShapes):
+					inexact.add(newId)
+				if oriented == 1:
+					if new: #if we haven't seen it before
+						geometric.append(newId)
+						prof.ACTIVE.node()
+						if census:
+							with prof.ACTIVE.phase('csv'):
+								f = open(f'{sig}.txt', "a")
+								f.write(f'[{newSig}], {newShapes}\n')
+								f.close()
+						geomshapes.append(newShapes)
+						if budget.expand(newT.countTetrahedra()):
+							if budget.down(newT.countTetrahedra()): # don't go down if you're at min tetrahedra
+								TODO.extend([(newT, newShapes, j, 1) for j in range(newT.countEdges())])
+							if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
+								TODO.extend([(newT, newShapes, j, 2) for j in range(newT.countTriangles())])
+				else:
+					if new: #if we haven't seen it before
+						nongeometric.append(newId)
+						prof.ACTIVE.node()
+
+		inexact = {nodes.sig(t) for t in inexact}
+		geometric = [nodes.sig(t) for t in geometric]
+		nongeometric = [nodes.sig(t) for t in nongeometric]
+		if verbose:
+			print(f'Number of geometric triangulations: {len(geometric)}')
+			print(f'Number of non-geometric triangulations: {len(nongeometric)}')
+			print(f'Total: {len(geometric) + len(nongeometric)} triangulations in {round(time.time() - t0, 2)} seconds.')
+			if not budget.complete():
+				print(budget.report())
+
+		check = geometric + nongeometric
+		if certify:
+			if ver.certifyRoot(M, geomshapes[0]):
+				check = [t for t in check if t in inexact]
+				if verbose:
+					print(f'Certified {len(geometric) + len(nongeometric) - len(check)} triangulations from exact shapes.')
+				if check:
+					print(f'{len(check)} triangulations have floating point shapes: falling back to verification')
+					verify = True
 			else:
-				if not newSig in nongeometric: #if we haven't seen it before
-					nongeometric.append(newSig)
-						
-	if verbose:
-		print(f'Number of geometric triangulations: {len(geometric)}')
-		print(f'Number of non-geometric triangulations: {len(nongeometric)}')
-		print(f'Total: {len(geometric) + len(nongeometric)} triangulations in {round(time.time() - t0, 2)} seconds.')
-	t1 = time.time()
-
-	if verify: #verify that geometric are geometric, non are non
-		print("Verifying geometric...")
-
-		for i in range(len(geometric)):
-			t = geometric[i]
-			M = snappy.Manifold(t)
-			tf, shapes = M.verify_hyperbolicity()
-			L = M.tetrahedra_field_gens()
-			shapes = L.find_field(100,10)[2]
-			if not tf:
-				print(f"Geometric not actually geometric: {M.triangulation_isosig(decorated=False)}")
-				assert False
-		print("Done verifying geometric. Verifying nongeometric...")
-		for t in nongeometric:
-			M = snappy.Manifold(t)
-			if M.verify_hyperbolicity()[0]:
-				print(f"Nongeometric actually geometric: {M.triangulation_isosig(decorated=False)}")
-				assert False
-		print(f"Done! Verified {len(geometric) + len(nongeometric)} triangulations in {round(time.time() - t1, 2)} seconds.")
-	return geometric
+				print("Shapes are not exact: falling back to verification")
+				verify = True
+
+		if verify: #verify that geometric are geometric, non are non
+			results = ver.verifySigs(check, processes, verify_cache, verbose)
+			found = set(geometric)
+			unverified = [t for t in check if t in found and not results[t]]
+			for t in check:
+				if t not in found and results[t]:
+					print(f"Nongeometric actually geometric: {t}")
+					assert False
+			if unverified: # SnapPy could not verify them, or failed: not a proof either way
+				print(f'{len(unverified)} geometric triangulations could not be verified by SnapPy ({sum(1 for t in unverified if results[t] is None)} errors), e.g. {unverified[0]}')
+		return geometric
 
 #####################################################################################
 ########################### Graphing Functions ######################################
 #####################################################################################
 
-def graphGeometricSearch(sig, max_tets, verbose=True, geometric_only=False, directory='.'):
+def graphGeometricSearch(sig, max_tets, verbose=True, geometric_only=False, directory='.', seen=None, budget=None, store=None, profile=None, progress=0):
 	"""
 	Search the geometric subgraph component containing the input isomorphism signature;
 	that is, perform 2-3 and 3-2 moves on the starting triangulation until either there
@@ -121,188 +242,275 @@ def graphGeometricSearch(sig, max_tets, verbose=True, geometric_only=False, dire
 	- sig: isometry signature (not decorated), assumed to be of a geometric triangulation
 	- max_tets: an integer, triangulations of this size or greater not to be searched
 	- geometric_only: if true, only records geometric triangulations in the output files.
+	- seen: isosigs found by earlier runs (e.g. from `sigindex.SigIndex.sigs`), taken as
+		already visited geometric triangulations: they are not recorded, counted or searched from again.
+	- budget: a `budget.Budget` (floor, per-level and total node caps, time) limiting the
+		search: nodes it cuts off are recorded but not searched from. It says afterwards
+		where the search was cut off.
+	- store: a `nodestore.NodeStore`, to keep queued nodes as a few bytes in its search tree
+		(rebuilt by replaying moves when searched from) instead of as triangulations and
+		shapes. The tree is written to {sig}-geometric-tree.csv.
+	- profile: if given, records where the time goes (see profiler.py) and writes a JSON
+		summary to this file. progress: if > 0, prints a progress line every `progress` seconds.
 	"""
 
 	if verbose:
 		print(f"Searching {sig}...")
 	t0 = time.time()
-
-	T = regina.Triangulation3.fromIsoSig(sig)
-	T.orient()
-	M = snappy.Manifold(T)
-
-	### field may not be found -- to fix later
-	L = M.tetrahedra_field_gens()
-	try:
-		shapes = L.find_field(100,10)[2]
-	except:
-		print("Could not find field: falling back to floating point")
-		shapes = M.tetrahedra_shapes(part='rect')
-	
-	geometric = [sig]
-	nongeometric = []
-
-	f = open(f'{directory}/{sig}-geometric-nodes.csv', "w")
-	f.write(f'id,oriented,tetrahedra\n{sig},1,{T.countTetrahedra()}\n')
-	f.close()
-	f = open(f'{directory}/{sig}-geometric-edges.csv', "w")
-	# labeling edge with #tet - index to look for repeated patterns!
-	f.write('target,source,label\n')
-	f.close()
-
-	TODO = [(T, shapes, i, 2) for i in range(T.countTriangles())] + [(T, shapes, i, 1) for i in range(T.countEdges())]
-
-	while len(TODO) > 0:
-		T, shapes, i, d = TODO.pop(0)
-
-		# always work on a copy
-		S = regina.Triangulation3(T)
-		shapes2 = shapes.copy()
-
-		if d == 1: # 3-2 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
-
-		elif d == 2: # 2-3 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
-
-		if success:
-			newSig = newT.isoSig()
-			if oriented > 0: # if geometric
-				if not newSig in geometric: #if we haven't seen it before
-					geometric.append(newSig)
-					TODO.extend([(newT, newShapes, j, 1) for j in range(newT.countEdges())])
-					if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
-						TODO.extend([(newT, newShapes, j, 2) for j in range(newT.countTriangles())])
-				else:
+	with prof.profiling(profile, progress):
+		budget = bg.Budget() if budget is None else budget
+		budget.start()
+
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		M = snappy.Manifold(T)
+
+		### field may not be found -- to fix later
+		shapes = gm.startingShapes(M, 100,10)
+
+		nodes = vs.SigTable() # ids of the triangulations seen (see visitedset.SigTable)
+		root = nodes.add(sig)[0]
+		geometric = {root} # ids
+		nongeometric = set()
+		excluded = set() if seen is None else {nodes.add(s)[0] for s in seen} # not searched again, nor counted
+
+		f = open(f'{directory}/{sig}-geometric-nodes.csv', "w")
+		f.write(f'id,oriented,tetrahedra\n{sig},1,{T.countTetrahedra()}\n')
+		f.close()
+		f = open(f'{directory}/{sig}-geometric-edges.csv', "w")
+		# labeling edge with #tet - index to look for repeated patterns!
+		f.write('target,source,label\n')
+		f.close()
+
+		node = Node(T, shapes, root, T.isoSigDetail()[1])
+		if store is not None:
+			store.table = nodes
+			node.key = store.addRoot(root, T, shapes)
+		# TODO : [ (Node, index, dimension) ]
+		budget.count(T.countTetrahedra())
+		TODO = [(node, i, 2) for i in range(T.countTriangles())] + [(node, i, 1) for i in range(T.countEdges()) if budget.down(T.countTetrahedra())]
+
+		while len(TODO) > 0:
+			if budget.timeUp():
+				budget.drop({node.id: node.tets for node, i, d in TODO}.values())
+				break
+			node, i, d = TODO.pop(0)
+			prof.ACTIVE.queue(len(TODO), node.tets)
+			if node.T is None: # kept only in the store until now
+				with prof.ACTIVE.phase('rebuild'):
+					node.load(store)
+
+			# always work on a copy
+			with prof.ACTIVE.phase('copy'):
+				S = regina.Triangulation3(node.T)
+				shapes2 = node.shapes.copy()
+
+			with prof.ACTIVE.phase('move'):
+				if d == 1: # 3-2 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
+
+				elif d == 2: # 2-3 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
+
+			if success:
+				with prof.ACTIVE.phase('isosig'):
+					newSig, iso = newT.isoSigDetail()
+				with prof.ACTIVE.phase('dedupe'):
+					newId = nodes.add(newSig)[0]
+					visited = geometric if oriented > 0 else nongeometric
+					is_seen = newId in visited or (oriented > 0 and newId in excluded)
+				if is_seen:
 					continue #here is why we don't loop (we are backtracking a little)
-			else: # if not geometric
-				if not newSig in nongeometric: #if we haven't seen it before
-					nongeometric.append(newSig)
-				else:
-					continue
-
-			if geometric_only:
-				if oriented <= 0:
-					continue
-			f = open(f'{directory}/{sig}-geometric-nodes.csv', "a")
-			f.write(f'{newSig},{oriented},{newT.countTetrahedra()}\n')
-			f.close()
-			f = open(f'{directory}/{sig}-geometric-edges.csv', "a")
-			# labeling edge with #tet - index to look for repeated patterns!
-			f.write(f'{newSig},{T.isoSig()},{'Edge: ' if d==1 else 'Face: '}{T.countTriangles() - i}\n')
-			f.close()
-						
-	if verbose:
-		print(f'Number of geometric triangulations: {len(geometric)}')
-		print(f'Number of non-geometric triangulations: {len(nongeometric)}')
-		print(f'Total: {len(geometric) + len(nongeometric)} triangulations in {round(time.time() - t0, 2)} seconds.')
+				visited.add(newId)
+				prof.ACTIVE.node()
+				if oriented > 0 and budget.expand(newT.countTetrahedra()): # if geometric (and within budget)
+					if store is None:
+						newNode = Node(newT, newShapes, newId, iso)
+					else: # keep it only in the store until it is searched from
+						newNode = Node(None, None, newId, None, store.add(newId, node.key, d, node.canonical(d, i), newT, newShapes), newT.countTetrahedra())
+					if budget.down(newT.countTetrahedra()): # don't go down if you're at min tetrahedra
+						TODO.extend([(newNode, j, 1) for j in range(newT.countEdges())])
+					if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
+						TODO.extend([(newNode, j, 2) for j in range(newT.countTriangles())])
+				elif store is not None:
+					store.add(newId, node.key, d, node.canonical(d, i))
+
+				if geometric_only:
+					if oriented <= 0:
+						continue
+				with prof.ACTIVE.phase('csv'):
+					f = open(f'{directory}/{sig}-geometric-nodes.csv', "a")
+					f.write(f'{newSig},{oriented},{newT.countTetrahedra()}\n')
+					f.close()
+					f = open(f'{directory}/{sig}-geometric-edges.csv', "a")
+					# labeling edge with #tet - index to look for repeated patterns!
+					f.write(f'{newSig},{nodes.sig(node.id)},{node.label(d, i)}\n')
+					f.close()
+
+		if verbose:
+			print(f'Number of geometric triangulations: {len(geometric)}')
+			print(f'Number of non-geometric triangulations: {len(nongeometric)}')
+			print(f'Total: {len(geometric) + len(nongeometric)} triangulations in {round(time.time() - t0, 2)} seconds.')
+			if not budget.complete():
+				print(budget.report())
 
-	return
+		if store is not None:
+			store.write(f'{directory}/{sig}-geometric-tree.csv')
+		return
 
-def graphPseudogeometricSearch(sig, max_tets, verbose=True, record_nons=True, directory='.'):
+def graphPseudogeometricSearch(sig, max_tets, verbose=True, record_nons=True, directory='.', visited_dir=None, certify=False, seen=None, budget=None, store=None, profile=None, progress=0):
 	"""
 	Similar to `graphGeometricSearch`, except searches through the pseudogeometric subgraph.
 	(That is, allows tetrahedra to have shape parameter with imaginary part equal to 0, i.e. flat.)
+	- visited_dir: if given, the table of visited isosigs (with the class of each and the node
+		it was found from) is kept on disk in this directory (see visitedset.py) instead of
+		in memory. Use for components too large for RAM.
+	- certify: if true, adds a `certified` column to the nodes: 'exact' if the node's orientation
+		is proven by its own exact shapes (from a root whose exact shapes satisfy the gluing
+		equations), 'float' if not. Float nodes are then verified with SnapPy
+		(see `verification.verifyNodes`).
+	- seen: isosigs found by earlier runs (e.g. from `sigindex.SigIndex.sigs`), taken as
+		already visited pseudogeometric triangulations: they are not recorded, counted or searched from again.
+	- budget: a `budget.Budget` (floor, per-level and total node caps, time) limiting the
+		search: nodes it cuts off are recorded but not searched from. It says afterwards
+		where the search was cut off.
+	- store: a `nodestore.NodeStore`, to keep queued nodes as a few bytes in its search tree
+		(rebuilt by replaying moves when searched from) instead of as triangulations and
+		shapes. The tree is written to {name}-({sig})-pseudogeometric-tree.csv.
+	- profile: if given, records where the time goes (see profiler.py) and writes a JSON
+		summary to this file. progress: if > 0, prints a progress line every `progress` seconds.
 	"""
 
 	if verbose:
 		print(f"Searching {sig}...")
 	t0 = time.time()
+	with prof.profiling(profile, progress):
+		budget = bg.Budget() if budget is None else budget
+		budget.start()
+
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		M = snappy.Manifold(T)
+
+		name = manifoldName(M)
+
+		### field may not be found -- to fix later
+		shapes = gm.startingShapes(M, 10000,100, True, True)
+
+		cert = ''
+		if certify:
+			exact = ver.certifyRoot(M, shapes)
+			cert = ',exact' if exact else ',float'
+			floats = not exact # whether any node is 'float'
+
+		# ids of the triangulations recorded, with the node each was found from as a flat (or
+		# geometric) and as a non-flat triangulation (see `visitedset.parentValue`), which tells
+		# the edges that found new nodes apart without keeping them (see `visitedset.treeEdge`)
+		nodes = vs.SigTable(visited_dir, f'{name}-({sig})-visited', values=2)
+		FLAT, NOTFLAT = 0, 1
+		root = nodes.add(sig)[0]
+		nodes.setValue(sig, FLAT, vs.parentValue())
+		counts = [1, 0] # flat and non-flat triangulations
+		excluded = set() if seen is None else {nodes.add(s)[0] for s in seen} # not searched again, nor counted
+
+		f = open(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', "w")
+		f.write(f'id,oriented,tetrahedra,flat count,negative count{",certified" if certify else ""}\n{sig},1,{T.countTetrahedra()},0,0{cert}\n')
+		f.close()
+		f = open(f'{directory}/{name}-({sig})-pseudogeometric-edges.csv', "w")
+		# labeling edge with #tet - index to look for repeated patterns!
+		f.write('target,source,label\n')
+		f.close()
+
+		node = Node(T, shapes, root, T.isoSigDetail()[1])
+		if store is not None:
+			store.table = nodes
+			node.key = store.addRoot(root, T, shapes)
+		# TODO : [ (Node, index, dimension) ]
+		budget.count(T.countTetrahedra())
+		TODO = [(node, i, 2) for i in range(T.countTriangles())] + [(node, i, 1) for i in range(T.countEdges()) if budget.down(T.countTetrahedra())]
+
+		while len(TODO) > 0:
+			if budget.timeUp():
+				budget.drop({node.id: node.tets for node, i, d in TODO}.values())
+				break
+			node, i, d = TODO.pop(0)
+			prof.ACTIVE.queue(len(TODO), node.tets)
+			if node.T is None: # kept only in the store until now
+				with prof.ACTIVE.phase('rebuild'):
+					node.load(store)
+
+			# always work on a copy
+			with prof.ACTIVE.phase('copy'):
+				S = regina.Triangulation3(node.T)
+				shapes2 = node.shapes.copy()
+
+			with prof.ACTIVE.phase('move'):
+				if d == 1: # 3-2 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
+
+				elif d == 2: # 2-3 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
+
+			# negatively oriented or inessential triangulations are only recorded if record_nons
+			if success and (oriented > -1 or record_nons):
+				with prof.ACTIVE.phase('isosig'):
+					newSig, iso = newT.isoSigDetail()
+				with prof.ACTIVE.phase('dedupe'):
+					newId = nodes.add(newSig)[0]
+					values = nodes.values(newSig)
+					visited = FLAT if oriented > -1 else NOTFLAT
+					is_seen = values[visited] != 0 or (visited == FLAT and newId in excluded)
+				if not is_seen: #if we haven't seen it before
+					nodes.setValue(newSig, visited, vs.parentValue(node.id))
+					counts[visited] += 1
+					prof.ACTIVE.node()
+					if certify: # each node is certified by its own shapes
+						cert = ',exact' if exact and ver.exactShapes(newShapes) else ',float'
+						floats = floats or cert == ',float'
+					with prof.ACTIVE.phase('csv'):
+						f = open(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', "a")
+						f.write(f'{newSig},{oriented},{newT.countTetrahedra()},{flat_count},{negative_count}{cert}\n')
+						f.close()
 
-	T = regina.Triangulation3.fromIsoSig(sig)
-	T.orient()
-	M = snappy.Manifold(T)
-
-	name = ''
-	l = M.identify()
-	if l:
-		name = l[0]
-
-	### field may not be found -- to fix later
-	L = M.tetrahedra_field_gens()
-	try:
-		shapes = L.find_field(10000,100, True, True)[2] # shapes = L.find_field(100,10)[2]
-	except:
-		print("Could not find field: falling back to floating point")
-		shapes = M.tetrahedra_shapes(part='rect')
-	
-	flat = [sig]
-	notflat = []
-	edges = []
-
-	f = open(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', "w")
-	f.write(f'id,oriented,tetrahedra,flat count,negative count\n{sig},1,{T.countTetrahedra()},0,0\n')
-	f.close()
-	f = open(f'{directory}/{name}-({sig})-pseudogeometric-edges.csv', "w")
-	# labeling edge with #tet - index to look for repeated patterns!
-	f.write('target,source,label\n')
-	f.close()
-
-	# TODO : [ (Triangulation, [Shapes], index, dimension) ]
-	TODO = [(T, shapes, i, 2) for i in range(T.countTriangles())] + [(T, shapes, i, 1) for i in range(T.countEdges())]
-
-	while len(TODO) > 0:
-		T, shapes, i, d = TODO.pop(0)
-		Tsig = T.isoSig()
-
-		# always work on a copy
-		S = regina.Triangulation3(T)
-		shapes2 = shapes.copy()
-
-		if d == 1: # 3-2 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
-
-		elif d == 2: # 2-3 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
-
-		if success:
-			newSig = newT.isoSig()
-			if oriented > -1: # if flat or geometric
-				if not newSig in flat: #if we haven't seen it before
-					# record new triangulation sig
-					flat.append(newSig)
-					edges.append((Tsig, newSig))
-					f = open(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', "a")
-					f.write(f'{newSig},{oriented},{newT.countTetrahedra()},{flat_count},{negative_count}\n')
-					f.close()
-
-					# add neighbors to queue
-					TODO.extend([(newT, newShapes, j, 1) for j in range(newT.countEdges())])
-					if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
-						TODO.extend([(newT, newShapes, j, 2) for j in range(newT.countTriangles())])
+					if oriented > -1 and budget.expand(newT.countTetrahedra()): # if flat or geometric (and within budget)
+						# add neighbors to queue
+						if store is None:
+							newNode = Node(newT, newShapes, newId, iso)
+						else: # keep it only in the store until it is searched from
+							newNode = Node(None, None, newId, None, store.add(newId, node.key, d, node.canonical(d, i), newT, newShapes), newT.countTetrahedra())
+						if budget.down(newT.countTetrahedra()): # don't go down if you're at min tetrahedra
+							TODO.extend([(newNode, j, 1) for j in range(newT.countEdges())])
+						if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
+							TODO.extend([(newNode, j, 2) for j in range(newT.countTriangles())])
+					elif store is not None:
+						store.add(newId, node.key, d, node.canonical(d, i))
 				else:
-					if (Tsig, newSig) in edges or (newSig, Tsig) in edges: # check so we can record edges later
+					with prof.ACTIVE.phase('dedupe'):
+						seen_edge = vs.treeEdge(nodes, node.id, newId, values)
+					if seen_edge: # check so we can record edges later
 						continue #here is why we don't loop (we are backtracking a little)
-				f = open(f'{directory}/{name}-({sig})-pseudogeometric-edges.csv', "a")
-				# labeling edge with #tet - index to look for repeated patterns!
-				f.write(f'{newSig},{T.isoSig()},{'Edge: ' if d==1 else 'Face: '}{T.countTriangles() - i}\n')
-				f.close()
-					
-			else: # if negatively oriented or inessential
-				if record_nons:
-					if not newSig in notflat: #if we haven't seen it before
-						notflat.append(newSig)
-						edges.append((Tsig, newSig))
-						f = open(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', "a")
-						f.write(f'{newSig},{oriented},{newT.countTetrahedra()},{flat_count},{negative_count}\n')
-						f.close()
-					else:
-						if (Tsig, newSig) in edges or (newSig, Tsig) in edges: # check so we can record edges later
-							continue #here is why we don't loop (we are backtracking a little)
+				with prof.ACTIVE.phase('csv'):
 					f = open(f'{directory}/{name}-({sig})-pseudogeometric-edges.csv', "a")
 					# labeling edge with #tet - index to look for repeated patterns!
-					f.write(f'{newSig},{T.isoSig()},{'Edge: ' if d==1 else 'Face: '}{T.countTriangles() - i}\n')
+					f.write(f'{newSig},{nodes.sig(node.id)},{node.label(d, i)}\n')
 					f.close()
-						
-	if verbose:
-		print(f'Number of pseudogeometric triangulations: {len(flat)}')
-		print(f'Number of non-pseudogeometric triangulations: {len(notflat)}')
-		print(f'Total: {len(flat) + len(notflat)} triangulations in {round(time.time() - t0, 2)} seconds.')
 
-	return
+		if verbose:
+			print(f'Number of pseudogeometric triangulations: {counts[FLAT]}')
+			print(f'Number of non-pseudogeometric triangulations: {counts[NOTFLAT]}')
+			print(f'Total: {sum(counts)} triangulations in {round(time.time() - t0, 2)} seconds.')
+			if not budget.complete():
+				print(budget.report())
+
+		if store is not None:
+			store.write(f'{directory}/{name}-({sig})-pseudogeometric-tree.csv')
+		vs.closeVisited(nodes)
+		if certify and floats:
+			ver.verifyNodes(f'{directory}/{name}-({sig})-pseudogeometric-nodes.csv', verbose=verbose)
+		return
 
 
-def graphEssentialSearch(sig, max_tets, max_1_flat=False, verbose=True, directory='.'):
+def graphEssentialSearch(sig, max_tets, max_1_flat=False, verbose=True, directory='.', seen=None, budget=None, store=None, profile=None, progress=0):
 	"""
 	Similar to `graphGeometricSearch`, except searches through the essential graph.
 	Note: the essential graph is known to be connected.
@@ -312,100 +520,134 @@ def graphEssentialSearch(sig, max_tets, max_1_flat=False, verbose=True, director
 	max_1_flat: if true, only graphs essential triangulations with no negatively oriented tetrahedra
 	   and at most 1 flat tetrahedron. For testing conjecture that the subset of triangulations
 	   with at most one flat tetrahedron is connected
+	seen: isosigs found by earlier runs (e.g. from `sigindex.SigIndex.sigs`), taken as
+		already visited essential triangulations: they are not recorded, counted or searched from again.
+	budget: a `budget.Budget` (floor, per-level and total node caps, time) limiting the
+		search: nodes it cuts off are recorded but not searched from. It says afterwards
+		where the search was cut off.
+	store: a `nodestore.NodeStore`, to keep queued nodes as a few bytes in its search tree
+		(rebuilt by replaying moves when searched from) instead of as triangulations and
+		shapes. The tree is written to {sig}-essential-tree.csv.
+	profile: if given, records where the time goes (see profiler.py) and writes a JSON
+		summary to this file. progress: if > 0, prints a progress line every `progress` seconds.
 	"""
 
 	if verbose:
 		print(f"Searching {sig}...")
 	t0 = time.time()
-
-	T = regina.Triangulation3.fromIsoSig(sig)
-	T.orient()
-	M = snappy.Manifold(T)
-
-	### field may not be found
-	L = M.tetrahedra_field_gens()
-	try:
-		shapes = L.find_field(100,10)[2]
-	except:
-		print("Could not find field: falling back to floating point")
-		shapes = M.tetrahedra_shapes(part='rect')
-	
-	essential = [sig]
-	inessential = []
-	edges = []
-
-	f = open(f'{directory}/{sig}-essential-nodes.csv', "w")
-	f.write(f'id,oriented,tetrahedra,flat count,negative count\n{sig},1,{T.countTetrahedra()},0,0\n')
-	f.close()
-	f = open(f'{directory}/{sig}-essential-edges.csv', "w")
-	# labeling edge with #tet - index to look for repeated patterns!
-	f.write('target,source,label\n')
-	f.close()
-
-	# TODO : [ (Triangulation, [Shapes], index, dimension, almostgeom) ]
-	TODO = [(T, shapes, i, 2, True) for i in range(T.countTriangles())] + [(T, shapes, i, 1, True) for i in range(T.countEdges())]
-
-	while len(TODO) > 0:
-		T, shapes, i, d, almostgeom = TODO.pop(0)
-		Tsig = T.isoSig()
-
-		# always work on a copy
-		S = regina.Triangulation3(T)
-		shapes2 = shapes.copy()
-
-		if d == 1: # 3-2 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
-
-		elif d == 2: # 2-3 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
-
-		if success:
-			newSig = newT.isoSig()
-			newAlmostgeom = oriented > -1 and flat_count < 2
-			if oriented > -2: # if essential
-				if not newSig in essential: #if we haven't seen it before
-					# record new triangulation sig
-					essential.append(newSig)
-					edges.append((Tsig, newSig))
-
-					if not max_1_flat or newAlmostgeom:
-						f = open(f'{directory}/{sig}-essential-nodes.csv', "a")
-						f.write(f'{newSig},{oriented},{newT.countTetrahedra()},{flat_count},{negative_count}\n')
-						f.close()
-
-
-					# add neighbors to queue
-					TODO.extend([(newT, newShapes, j, 1, newAlmostgeom) for j in range(newT.countEdges())])
-					if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
-						TODO.extend([(newT, newShapes, j, 2, newAlmostgeom) for j in range(newT.countTriangles())])
+	with prof.profiling(profile, progress):
+		budget = bg.Budget() if budget is None else budget
+		budget.start()
+
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		M = snappy.Manifold(T)
+
+		### field may not be found
+		shapes = gm.startingShapes(M, 100,10)
+
+		nodes = vs.SigTable() # ids of the triangulations seen (see visitedset.SigTable)
+		root = nodes.add(sig)[0]
+		essential = {root} # ids
+		inessential = set()
+		excluded = set() if seen is None else {nodes.add(s)[0] for s in seen} # not searched again, nor counted
+		edges = set() # edges to new nodes, see `visitedset.edgeKey`
+
+		f = open(f'{directory}/{sig}-essential-nodes.csv', "w")
+		f.write(f'id,oriented,tetrahedra,flat count,negative count\n{sig},1,{T.countTetrahedra()},0,0\n')
+		f.close()
+		f = open(f'{directory}/{sig}-essential-edges.csv', "w")
+		# labeling edge with #tet - index to look for repeated patterns!
+		f.write('target,source,label\n')
+		f.close()
+
+		node = Node(T, shapes, root, T.isoSigDetail()[1])
+		if store is not None:
+			store.table = nodes
+			node.key = store.addRoot(root, T, shapes)
+		# TODO : [ (Node, index, dimension, almostgeom) ]
+		budget.count(T.countTetrahedra())
+		TODO = [(node, i, 2, True) for i in range(T.countTriangles())] + [(node, i, 1, True) for i in range(T.countEdges()) if budget.down(T.countTetrahedra())]
+
+		while len(TODO) > 0:
+			if budget.timeUp():
+				budget.drop({node.id: node.tets for node, i, d, almostgeom in TODO}.values())
+				break
+			node, i, d, almostgeom = TODO.pop(0)
+			prof.ACTIVE.queue(len(TODO), node.tets)
+			if node.T is None: # kept only in the store until now
+				with prof.ACTIVE.phase('rebuild'):
+					node.load(store)
+
+			# always work on a copy
+			with prof.ACTIVE.phase('copy'):
+				S = regina.Triangulation3(node.T)
+				shapes2 = node.shapes.copy()
+
+			with prof.ACTIVE.phase('move'):
+				if d == 1: # 3-2 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
+
+				elif d == 2: # 2-3 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
+
+			if success:
+				with prof.ACTIVE.phase('isosig'):
+					newSig, iso = newT.isoSigDetail()
+				newAlmostgeom = oriented > -1 and flat_count < 2
+				with prof.ACTIVE.phase('dedupe'):
+					newId = nodes.add(newSig)[0]
+					visited = essential if oriented > -2 else inessential
+					is_seen = newId in visited or (oriented > -2 and newId in excluded)
+				if not is_seen: #if we haven't seen it before
+					visited.add(newId)
+					prof.ACTIVE.node()
+					edges.add(vs.edgeKey(node.id, newId))
+					if oriented > -2: # if essential
+						record = not max_1_flat or newAlmostgeom
+					else: # if inessential edge exists
+						record = not max_1_flat
+					if record:
+						with prof.ACTIVE.phase('csv'):
+							f = open(f'{directory}/{sig}-essential-nodes.csv', "a")
+							f.write(f'{newSig},{oriented},{newT.countTetrahedra()},{flat_count},{negative_count}\n')
+							f.close()
+
+					if oriented > -2 and budget.expand(newT.countTetrahedra()): # if essential (and within budget)
+						# add neighbors to queue
+						if store is None:
+							newNode = Node(newT, newShapes, newId, iso)
+						else: # keep it only in the store until it is searched from
+							newNode = Node(None, None, newId, None, store.add(newId, node.key, d, node.canonical(d, i), newT, newShapes), newT.countTetrahedra())
+						if budget.down(newT.countTetrahedra()): # don't go down if you're at min tetrahedra
+							TODO.extend([(newNode, j, 1, newAlmostgeom) for j in range(newT.countEdges())])
+						if newT.countTetrahedra() < max_tets: # don't go up if you're at max tetrahedra
+							TODO.extend([(newNode, j, 2, newAlmostgeom) for j in range(newT.countTriangles())])
+					elif store is not None:
+						store.add(newId, node.key, d, node.canonical(d, i))
 				else:
-					if (Tsig, newSig) in edges or (newSig, Tsig) in edges: # check so we can record edges later
+					with prof.ACTIVE.phase('dedupe'):
+						seen_edge = vs.edgeKey(node.id, newId) in edges
+					if seen_edge: # check so we can record edges later
 						continue #here is why we don't loop (we are backtracking a little)
-					
-			else: # if inessential edge exists
-				if not newSig in inessential: #if we haven't seen it before
-					inessential.append(newSig)
-					edges.append((Tsig, newSig))
-					if not max_1_flat:
-						f = open(f'{directory}/{sig}-essential-nodes.csv', "a")
-						f.write(f'{newSig},{oriented},{newT.countTetrahedra()},{flat_count},{negative_count}\n')
+
+				if not max_1_flat or (newAlmostgeom and almostgeom):
+					with prof.ACTIVE.phase('csv'):
+						f = open(f'{directory}/{sig}-essential-edges.csv', "a")
+						# labeling edge with #tet - index to look for repeated patterns!
+						f.write(f'{newSig},{nodes.sig(node.id)},{node.label(d, i)}\n')
 						f.close()
-				else:
-					if (Tsig, newSig) in edges or (newSig, Tsig) in edges: # check so we can record edges later
-						continue #here is why we don't loop (we are backtracking a little)
 
-			if not max_1_flat or (newAlmostgeom and almostgeom):
-				f = open(f'{directory}/{sig}-essential-edges.csv', "a")
-				# labeling edge with #tet - index to look for repeated patterns!
-				f.write(f'{newSig},{T.isoSig()},{'Edge: ' if d==1 else 'Face: '}{T.countTriangles() - i}\n')
-				f.close()
-						
-	if verbose:
-		print(f'Number of essential triangulations: {len(essential)}')
-		print(f'Number of inessential triangulations: {len(inessential)}')
-		print(f'Total: {len(essential) + len(inessential)} triangulations in {round(time.time() - t0, 2)} seconds.')
+		if verbose:
+			print(f'Number of essential triangulations: {len(essential)}')
+			print(f'Number of inessential triangulations: {len(inessential)}')
+			print(f'Total: {len(essential) + len(inessential)} triangulations in {round(time.time() - t0, 2)} seconds.')
+			if not budget.complete():
+				print(budget.report())
 
-	return
+		if store is not None:
+			store.write(f'{directory}/{sig}-essential-tree.csv')
+		return
 
 
 def essentialCensus(max_tets):
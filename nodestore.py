@@ -0,0 +1,192 @@
+import csv
+from array import array
+from collections import OrderedDict
+import regina, snappy
+import geometricmoves as gm
+import geometricsearch as gs
+import visitedset as vs
+
+#####################################################################################
+########################### Node Store ##############################################
+#####################################################################################
+# The search tree of a graph search, in a few bytes per node: each node found is stored as
+# (parent, move, index), the move (1 = 3-2, 2 = 2-3, as in the search queues) which found it
+# from its parent, on the edge or face with that index in the parent's canonical triangulation
+# (see `geometricsearch.Node`). Only a few checkpoint nodes (the root, and the nodes at
+# depths that are multiples of `interval`) keep their triangulation (as Regina's tight
+# encoding, which keeps the labelling) and their shapes, exact if the search's were.
+#
+# Any node's triangulation and shapes are rebuilt on demand by replaying the moves from
+# its nearest checkpoint (or recently rebuilt) ancestor, so a search given a store keeps
+# only ids in its queue, and the move path from the root to any node is a walk up the tree:
+#
+#	store = NodeStore()
+#	graphPseudogeometricSearch(sig, 10, store=store)	# also writes the tree to ...-tree.csv
+#	store.pathSigs(someSig)		# [(root sig, None, None), ..., (someSig, move, index)]
+#	node = store.rebuild(store.find(store.table.id(someSig)))	# node.T, node.shapes
+#
+# Replaying is deterministic: checkpoints keep the labelling of the triangulation the search
+# found, and a move's canonical index picks out the same edge or face of a parent labelled
+# as the search's was, so a rebuilt node has the same labelling and shapes as the search's.
+
+class NodeStore:
+	"""
+	Search tree with checkpoints (see top of file). Nodes are given keys 0, 1, 2, ... in
+	the order they are added; ids are those of the search's `visitedset.SigTable`.
+	- interval: nodes at depths that are multiples of interval are checkpoints (if they
+		are added with their triangulation), so a rebuild replays fewer than interval moves
+	- cache: number of rebuilt nodes kept, most recently used first
+	"""
+	def __init__(self, interval=8, cache=256):
+		self.interval = interval
+		self.cache_size = cache
+		self.ids = array('q') # sig id of each node
+		self.parents = array('i') # key of the parent, -1 for the root
+		self.moves = array('b') # move from the parent, 0 for the root
+		self.indices = array('i') # canonical index of the edge or face moved on in the parent
+		self.depths = array('I')
+		self.keys = {} # sig id: key of the first node added with it, for `find`
+		self.checkpoints = {} # key: (tight encoding, shapes)
+		self.cache = OrderedDict() # key: geometricsearch.Node
+		self.table = None # the search's SigTable, for queries by isosig
+
+	def __len__(self):
+		return len(self.ids)
+
+	def addRoot(self, id, T, shapes):
+		return self.add(id, -1, 0, -1, T, shapes)
+
+	def add(self, id, parent, d, index, T=None, shapes=None):
+		"""
+		Adds the node with sig id found from the node with key parent by move d on the edge
+		or face with the given canonical index. It is a checkpoint if T and shapes are given
+		and its depth is a multiple of interval. Returns its key.
+		"""
+		key = len(self.ids)
+		depth = 0 if parent < 0 else self.depths[parent] + 1
+		self.ids.append(id)
+		self.parents.append(parent)
+		self.moves.append(d)
+		self.indices.append(index)
+		self.depths.append(depth)
+		self.keys.setdefault(id, key)
+		if T is not None and depth % self.interval == 0:
+			self.checkpoints[key] = (T.tightEncoding(), list(shapes))
+		return key
+
+	def find(self, id):
+		"""
+		Key of the node with sig id, or None if it was not added.
+		"""
+		return self.keys.get(id)
+
+	def path(self, key):
+		"""
+		Keys of the nodes from the root to key.
+		"""
+		keys = []
+		while key >= 0:
+			keys.append(key)
+			key = self.parents[key]
+		return keys[::-1]
+
+	def pathSigs(self, sig):
+		"""
+		Move path from the root to sig as [(isosig, move, canonical index)], the first
+		entry (the root) with move and index None. None if sig is not in the store.
+		"""
+		id = self.table.id(sig)
+		key = None if id is None else self.find(id)
+		if key is None:
+			return None
+		return [(self.table.sig(self.ids[k]), self.moves[k] or None, self.indices[k] if self.parents[k] >= 0 else None) for k in self.path(key)]
+
+	def rebuild(self, key):
+		"""
+		`geometricsearch.Node` of key, replayed from its nearest cached or checkpoint ancestor.
+		"""
+		chain = []
+		while key not in self.cache and key not in self.checkpoints:
+			chain.append(key)
+			key = self.parents[key]
+		if key in self.cache:
+			self.cache.move_to_end(key)
+			node = self.cache[key]
+		else:
+			encoding, shapes = self.checkpoints[key]
+			T = regina.Triangulation3.tightDecoding(encoding)
+			node = self.remember(gs.Node(T, list(shapes), self.ids[key], T.isoSigDetail()[1], key))
+		for key in reversed(chain):
+			node = self.replay(node, key)
+		return node
+
+	def replay(self, node, key):
+		"""
+		The node with key, from its parent's node by its move (already checked by the search,
+		so without the Regina cross-check).
+		"""
+		d = self.moves[key]
+		i = node.local(d, self.indices[key])
+		S = regina.Triangulation3(node.T)
+		if d == 1: # 3-2 move
+			success, newT, newShapes, orientation = gm.threeTwoMove(S, node.shapes.copy(), i, check=False)
+		else: # 2-3 move
+			success, newT, newShapes, orientation = gm.twoThreeMove(S, node.shapes.copy(), i, check=False)
+		return self.remember(gs.Node(newT, newShapes, self.ids[key], newT.isoSigDetail()[1], key))
+
+	def remember(self, node):
+		if self.cache_size:
+			self.cache[node.key] = node
+			if len(self.cache) > self.cache_size:
+				self.cache.popitem(last=False)
+		return node
+
+	def nbytes(self):
+		"""
+		Bytes taken by the tree itself (without checkpoints, cache and the index of `find`).
+		"""
+		return sum(a.itemsize * len(a) for a in [self.ids, self.parents, self.moves, self.indices, self.depths])
+
+	def write(self, file):
+		"""
+		Writes the tree to a CSV: id,parent,move,index,depth,shapes (ids as isosigs; shapes is
+		'exact' or 'float' for the root, the kind of shapes the search started from, and empty
+		for the other nodes).
+		"""
+		mode = 'exact' if all(gm.isExact(z) for z in self.checkpoints[0][1]) else 'float'
+		f = open(file, 'w')
+		f.write('id,parent,move,index,depth,shapes\n')
+		for key in range(len(self)):
+			parent = self.parents[key]
+			f.write(f'{self.table.sig(self.ids[key])},{self.table.sig(self.ids[parent]) if parent >= 0 else ""},{self.moves[key]},{self.indices[key]},{self.depths[key]},{mode if key == 0 else ""}\n')
+		f.close()
+
+def readTree(file, shapes=None, interval=8, cache=256):
+	"""
+	NodeStore from a tree CSV written by `NodeStore.write`, with its own SigTable. The root
+	is its only checkpoint: its triangulation is rebuilt from its isosig (oriented, as the
+	searches do) with the given shapes, or shapes of the kind recorded in the file: floating
+	point, or exact from `gm.startingShapes` (which must then be the ones the search started
+	from for rebuilds to match it).
+	"""
+	store = NodeStore(interval, cache)
+	store.table = vs.SigTable()
+	keys = {}
+	mode = None
+	with open(file, 'r') as f:
+		for row in csv.DictReader(f):
+			id = store.table.add(row['id'])[0]
+			keys[row['id']] = store.add(id, keys[row['parent']] if row['parent'] else -1, int(row['move']), int(row['index']))
+			if not row['parent']:
+				mode = row.get('shapes') # None in files written before the column
+	root = store.table.sig(store.ids[0])
+	T = regina.Triangulation3.fromIsoSig(root)
+	T.orient()
+	if shapes is None and mode == 'float':
+		shapes = snappy.Manifold(T).tetrahedra_shapes(part='rect')
+	elif shapes is None:
+		shapes = gm.startingShapes(snappy.Manifold(T), 10000, 100)
+		if mode == 'exact' and not all(gm.isExact(z) for z in shapes):
+			raise Exception(f"the search from {root} started from exact shapes, which were not found: pass them as shapes")
+	store.checkpoints[0] = (T.tightEncoding(), list(shapes))
+	return store
@@ -0,0 +1,152 @@
+import contextlib, json, sys, time
+
+#####################################################################################
+########################### Profiling ###############################################
+#####################################################################################
+# Optional instrumentation of the moves and the search drivers. Code reports to
+# `ACTIVE`, which is a `NullProfiler` (doing nothing) unless profiling was started:
+#
+#	with prof.ACTIVE.phase('isosig'):
+#		newSig = newT.isoSig()
+#	prof.ACTIVE.node()
+#
+# Search drivers run inside `profiling`, which stops profiling however they exit.
+# Phases may nest (e.g. 'regina cross-check' happens inside 'move'), so phase times
+# are inclusive.
+
+class Phase:
+	"""
+	Context manager adding the time spent inside it to a phase of a Profiler.
+	"""
+	__slots__ = ('profiler', 'name', 't')
+
+	def __init__(self, profiler, name):
+		self.profiler = profiler
+		self.name = name
+
+	def __enter__(self):
+		self.t = time.perf_counter()
+
+	def __exit__(self, *exc):
+		p = self.profiler
+		p.times[self.name] = p.times.get(self.name, 0) + time.perf_counter() - self.t
+		p.calls[self.name] = p.calls.get(self.name, 0) + 1
+		return False
+
+class Profiler:
+	"""
+	Records cumulative time and call counts per phase, nodes found, the peak queue length,
+	and the frontier (queue length) whenever the search moves to another tetrahedra level.
+	If progress > 0, prints a progress line (to stderr) at most every `progress` seconds.
+	"""
+	def __init__(self, progress=0):
+		self.times = {}
+		self.calls = {}
+		self.levels = {} # tetrahedra -> frontier sizes when the search moved to that level
+		self.level = None
+		self.nodes = 0
+		self.peak_queue = 0
+		self.progress = progress
+		self.t0 = time.time()
+		self.last_progress = self.t0
+
+	def phase(self, name):
+		return Phase(self, name)
+
+	def node(self):
+		"""
+		Record a newly found node.
+		"""
+		self.nodes += 1
+		if self.progress and time.time() - self.last_progress > self.progress:
+			self.last_progress = time.time()
+			print(self.progressLine(), file=sys.stderr)
+
+	def queue(self, length, tets):
+		"""
+		Record the queue length after taking off a node with `tets` tetrahedra.
+		"""
+		if length > self.peak_queue:
+			self.peak_queue = length
+		if tets != self.level:
+			self.level = tets
+			self.levels.setdefault(tets, []).append(length)
+
+	def progressLine(self):
+		elapsed = time.time() - self.t0
+		return f'[{round(elapsed, 1)}s] {self.nodes} nodes ({round(self.nodes / elapsed, 1)}/s), peak queue {self.peak_queue}'
+
+	def summary(self):
+		elapsed = time.time() - self.t0
+		return {
+			'seconds': elapsed,
+			'nodes': self.nodes,
+			'nodes per second': self.nodes / elapsed if elapsed > 0 else 0,
+			'peak queue': self.peak_queue,
+			'levels': {str(n): {'entered': len(self.levels[n]), 'peak frontier': max(self.levels[n]), 'mean frontier': sum(self.levels[n]) / len(self.levels[n])} for n in sorted(self.levels)},
+			'phases': {name: {'seconds': self.times[name], 'calls': self.calls[name]} for name in sorted(self.times, key=lambda k: -self.times[k])},
+		}
+
+class NullPhase:
+	__slots__ = ()
+
+	def __enter__(self):
+		pass
+
+	def __exit__(self, *exc):
+		return False
+
+NULL_PHASE = NullPhase()
+
+class NullProfiler:
+	"""
+	Stands in for a Profiler when profiling is off.
+	"""
+	def phase(self, name):
+		return NULL_PHASE
+
+	def node(self):
+		pass
+
+	def queue(self, length, tets):
+		pass
+
+ACTIVE = NullProfiler()
+
+def start(progress=0):
+	"""
+	Start profiling (see `Profiler`). Returns the new profiler.
+	"""
+	global ACTIVE
+	ACTIVE = Profiler(progress)
+	return ACTIVE
+
+def stop(path=None):
+	"""
+	Stop profiling, writing the JSON summary to path if given. Returns the summary,
+	or None if profiling was not on.
+	"""
+	global ACTIVE
+	if not isinstance(ACTIVE, Profiler):
+		return None
+	summary = ACTIVE.summary()
+	ACTIVE = NullProfiler()
+	if path is not None:
+		with open(path, 'w') as f:
+			json.dump(summary, f, indent=4)
+	return summary
+
+@contextlib.contextmanager
+def profiling(path=None, progress=0):
+	"""
+	Profile the code inside the with block if path is given or progress > 0 (see `start`),
+	stopping when it exits, even by an exception, and writing the summary to path.
+	"""
+	if path is None and not progress:
+		yield
+		return
+	start(progress)
+	try:
+		yield
+	finally:
+		stop(path)
@@ -0,0 +1,176 @@
+import regina, snappy
+import geometricmoves as gm
+import random, time, math
+from multiprocessing import Pool
+
+#####################################################################################
+########################### Random Walk Estimation ##################################
+#####################################################################################
+# For components too large to enumerate, estimate their size and makeup by random walks
+# on the (pseudo)geometric subgraph instead of a full BFS.
+#
+# A walker at x proposes one of its c(x) candidate moves uniformly at random (every face
+# for a 2-3 move, if below max_tets, and every edge for a 3-2 move). If the move fails or
+# leaves the subgraph, the walker stays at x. Otherwise it moves to y with the
+# Metropolis-Hastings probability min(1, c(x)/c(y)), which makes the stationary
+# distribution uniform over the nodes of the component (up to symmetries of the
+# triangulations, which can make some moves coincide).
+#
+# Each walker reports its samples; estimates are averaged over walkers and come with
+# jackknife (leave-one-walker-out) confidence intervals. The number of nodes is estimated
+# from collisions (samples of the same isosig) between different walkers only: samples of
+# one walker are correlated (a rejected move leaves the walker where it was), so its
+# repeat visits would count too many collisions and give too few nodes.
+
+def candidateCount(T, max_tets):
+	"""
+	Number of candidate moves at T: edges, plus faces if T is below max_tets.
+	"""
+	if T.countTetrahedra() < max_tets:
+		return T.countTriangles() + T.countEdges()
+	return T.countEdges()
+
+def startingShapes(M, use_fp=False):
+	"""
+	Shapes of the manifold M: floating point if use_fp is true, otherwise exact if a
+	field can be found (and floating point if not).
+	"""
+	if use_fp:
+		return M.tetrahedra_shapes(part='rect')
+	return gm.startingShapes(M, 100, 10)
+
+def walk(sig, steps, max_tets, seed, burn_in=100, thin=10, min_oriented=0, use_fp=False):
+	"""
+	Run one Metropolis-Hastings walker from sig for `steps` steps (after `burn_in`),
+	recording the current node every `thin` steps.
+	- min_oriented: 0 walks the pseudogeometric subgraph, 1 the geometric subgraph
+	Returns a list of samples (isosig, tetrahedra, oriented, degree estimate), where the
+	degree estimate c(x) * [proposal stayed in subgraph] is unbiased for the degree of x
+	(counting moves, not distinct neighbours).
+	"""
+	rng = random.Random(seed)
+	T = regina.Triangulation3.fromIsoSig(sig)
+	T.orient()
+	shapes = startingShapes(snappy.Manifold(T), use_fp)
+	oriented = 1
+	c = candidateCount(T, max_tets)
+
+	samples = []
+	for step in range(burn_in + steps):
+		k = rng.randrange(c)
+		S = regina.Triangulation3(T)
+		shapes2 = shapes.copy()
+		if k < S.countEdges(): # 3-2 move
+			success, newT, newShapes, (newOriented, counts) = gm.threeTwoMove(S, shapes2, k)
+		else: # 2-3 move
+			success, newT, newShapes, (newOriented, counts) = gm.twoThreeMove(S, shapes2, k - S.countEdges())
+		valid = success and newOriented >= min_oriented
+
+		if step >= burn_in and (step - burn_in) % thin == 0:
+			samples.append((T.isoSig(), T.countTetrahedra(), oriented, c if valid else 0))
+
+		if valid:
+			newC = candidateCount(newT, max_tets)
+			if rng.random() < min(1, c / newC):
+				T, shapes, oriented, c = newT, newShapes, newOriented, newC
+	return samples
+
+def estimates(walkers):
+	"""
+	Point estimates from the samples of each walker (see `walk`):
+	- nodes: number of nodes, from isosig collisions between different walkers (see top of
+		file): pairs of samples from different walkers / pairs with the same isosig. None if
+		there are no such collisions (e.g. with a single walker).
+	- levels: {tetrahedra: fraction of nodes}
+	- geometric: fraction of nodes which are geometric (as opposed to flat)
+	- degree: average degree
+	geometric and degree are None (and levels empty) if there are no samples.
+	"""
+	samples = [s for w in walkers for s in w]
+	m = len(samples)
+	if m == 0:
+		return {'nodes': None, 'levels': {}, 'geometric': None, 'degree': None}
+	counts = {} # isosig: {walker: samples}
+	for w, walker in enumerate(walkers):
+		for s in walker:
+			count = counts.setdefault(s[0], {})
+			count[w] = count.get(w, 0) + 1
+	pairs = (m * m - sum(len(walker) ** 2 for walker in walkers)) // 2
+	collisions = sum((sum(count.values()) ** 2 - sum(n * n for n in count.values())) // 2 for count in counts.values())
+	levels = {}
+	for s in samples:
+		levels[s[1]] = levels.get(s[1], 0) + 1 / m
+	return {
+		'nodes': pairs / collisions if collisions else None,
+		'levels': levels,
+		'geometric': sum(1 for s in samples if s[2] == 1) / m,
+		'degree': sum(s[3] for s in samples) / m,
+	}
+
+def jackknife(walkers, statistic):
+	"""
+	Jackknife over walkers of statistic(walkers). Returns (estimate, 95% half width),
+	or (estimate, None) if fewer than two walkers give a value.
+	"""
+	full = statistic(walkers)
+	if full is None:
+		return (None, None)
+	loo = [statistic(walkers[:i] + walkers[i + 1:]) for i in range(len(walkers))]
+	loo = [v for v in loo if v is not None]
+	n = len(loo)
+	if n < 2:
+		return (full, None)
+	mean = sum(loo) / n
+	var = (n - 1) / n * sum((v - mean) ** 2 for v in loo)
+	return (full, 1.96 * math.sqrt(var))
+
+def estimateComponent(sig, max_tets, walkers=8, steps=10000, burn_in=100, thin=10, min_oriented=0, use_fp=False, processes=None, seed=0, verbose=True):
+	"""
+	Estimate the size and makeup of the component of sig in the pseudogeometric
+	(min_oriented = 0) or geometric (min_oriented = 1) subgraph below max_tets, using
+	`walkers` independent walkers run in parallel across `processes` processes.
+
+	Returns a dictionary of (estimate, 95% half width) pairs:
+	- nodes: total number of nodes
+	- levels: {tetrahedra: number of nodes}
+	- fractions: {tetrahedra: fraction of nodes}
+	- geometric: fraction of nodes which are geometric
+	- degree: average degree
+	"""
+	if verbose:
+		print(f"Sampling {sig} with {walkers} walkers...")
+	t0 = time.time()
+
+	args = [(sig, steps, max_tets, seed + w, burn_in, thin, min_oriented, use_fp) for w in range(walkers)]
+	with Pool(processes) as pool:
+		results = pool.starmap(walk, args)
+
+	levels = sorted(set(s[1] for w in results for s in w))
+	def levelFraction(n):
+		return lambda walkers: estimates(walkers)['levels'].get(n, 0)
+	def levelCount(n):
+		def statistic(walkers):
+			e = estimates(walkers)
+			return None if e['nodes'] is None else e['nodes'] * e['levels'].get(n, 0)
+		return statistic
+
+	report = {
+		'nodes': jackknife(results, lambda walkers: estimates(walkers)['nodes']),
+		'levels': {n: jackknife(results, levelCount(n)) for n in levels},
+		'fractions': {n: jackknife(results, levelFraction(n)) for n in levels},
+		'geometric': jackknife(results, lambda walkers: estimates(walkers)['geometric']),
+		'degree': jackknife(results, lambda walkers: estimates(walkers)['degree']),
+	}
+
+	if verbose:
+		def show(e):
+			if e[0] is None:
+				return 'unknown'
+			return f'{round(e[0], 3)}' + (f' +- {round(e[1], 3)}' if e[1] is not None else '')
+		print(f'Estimated number of nodes: {show(report["nodes"])}')
+		for n in levels:
+			print(f'\t{n} tetrahedra: {show(report["levels"][n])} nodes ({show(report["fractions"][n])} of component)')
+		print(f'Fraction geometric: {show(report["geometric"])}')
+		print(f'Average degree: {show(report["degree"])}')
+		print(f'Sampled {walkers * (steps // thin)} nodes in {round(time.time() - t0, 2)} seconds.')
+	return report
@@ -0,0 +1,297 @@
+import geometricmoves as gm
+from itertools import permutations
+
+######################### Recursion Gadget Patterns ##########################################
+# `checkDDRec` looks for one gadget, with its cases written out by hand. Here a gadget is
+# described by a *pattern*: k tetrahedra with the gluings between them, and inequalities
+# Re(edge parameter) < bound on their shapes. Patterns are put in a canonical form (so
+# the same gadget written with different labels is the same pattern) and collected in a
+# `PatternIndex`, which matches all of them against a triangulation in one pass.
+#
+# Conventions:
+# - a permutation is a 4-tuple p, sending vertex v to p[v]
+# - a gluing (i, f, j, g) glues face f of pattern tetrahedron i to face g[f] of j, sending
+#   vertex v of i to vertex g[v] of j
+# - an inequality (i, a, b, bound) asks that the edge parameter of edge ab of pattern
+#   tetrahedron i has real part less than bound
+# - a match sends pattern tetrahedron i to a tetrahedron of the triangulation, with a
+#   permutation sending pattern vertices to its vertices. Edge parameters are always
+#   evaluated in the triangulation's labels, so relabelling a pattern does not change it.
+# - patterns are oriented: the triangulation is assumed oriented, and pattern tetrahedron
+#   0 is only ever sent to a tetrahedron by an even permutation. The orientation of the
+#   other pattern tetrahedra follows from the gluings (which are odd between consistently
+#   oriented tetrahedra), and canonical forms only use orientation preserving relabellings.
+#   A pattern and its mirror image are different patterns, unless the pattern is made with
+#   mirror=True: then it is also matched by odd permutations (so it matches its mirror image
+#   too, with the inequalities still evaluated in the triangulation's labels), and its
+#   canonical form uses every relabelling. The DD gadget has the same gluings as its mirror
+#   image but a different shape condition, so `ddPatterns` gives it as two oriented patterns.
+
+PERMS = list(permutations(range(4)))
+
+def sign(p):
+	s = 1
+	for a in range(4):
+		for b in range(a + 1, 4):
+			if p[a] > p[b]:
+				s = -s
+	return s
+
+EVEN_PERMS = [p for p in PERMS if sign(p) == 1]
+
+def compose(p, q):
+	"""
+	p after q
+	"""
+	return (p[q[0]], p[q[1]], p[q[2]], p[q[3]])
+
+def inverse(p):
+	inv = [0, 0, 0, 0]
+	for v in range(4):
+		inv[p[v]] = v
+	return tuple(inv)
+
+def edgeClass(a, b):
+	"""
+	Opposite edges have the same edge parameter: represent the edge by the one through vertex 0.
+	"""
+	if 0 in (a, b):
+		return (0, a + b)
+	return (0, 6 - a - b)
+
+def multiplicity(gluings, i):
+	"""
+	Largest number of gluings between tetrahedron i and a single tetrahedron.
+	"""
+	counts = {}
+	for (a, f, b, g) in gluings:
+		if a == i:
+			counts[b] = counts.get(b, 0) + 1
+		if b == i and a != i:
+			counts[a] = counts.get(a, 0) + 1
+	return max(counts.values(), default=0)
+
+class GadgetPattern:
+	"""
+	A recursion gadget pattern (see top of file), stored in canonical form.
+	- name: a name to report matches by
+	- tets: number of tetrahedra
+	- gluings: list of gluings, each given once (from either side)
+	- inequalities: list of shape inequalities
+	- mirror: if true, the pattern also matches its mirror image (see top of file)
+	"""
+	def __init__(self, name, tets, gluings, inequalities, mirror=False):
+		self.name = name
+		self.tets = tets
+		self.mirror = mirror
+		self.key, self.gluings, self.inequalities = canonical(tets, gluings, inequalities, mirror)
+		self.multiplicity = multiplicity(self.gluings, 0)
+
+	def __eq__(self, other):
+		return self.key == other.key
+
+	def __hash__(self):
+		return hash(self.key)
+
+	def match(self, tri, shapes, anchor):
+		"""
+		Try to match the pattern with pattern tetrahedron 0 at tetrahedron `anchor` of tri.
+		Returns the list of matched tetrahedron indices, or None.
+		"""
+		for p in PERMS if self.mirror else EVEN_PERMS:
+			found = self.matchFrom(tri, shapes, anchor, p)
+			if found is not None:
+				return found
+		return None
+
+	def matchFrom(self, tri, shapes, anchor, p):
+		tets = [anchor] + [None] * (self.tets - 1)
+		relabel = [p] + [None] * (self.tets - 1)
+		for (i, f, j, g) in self.gluings: # sorted so that i is always matched already
+			tet = tri.tetrahedron(tets[i])
+			adj = tet.adjacentTetrahedron(relabel[i][f])
+			if adj is None:
+				return None
+			G = tet.adjacentGluing(relabel[i][f])
+			G = (G[0], G[1], G[2], G[3])
+			q = compose(G, compose(relabel[i], inverse(g)))
+			if tets[j] is None:
+				if adj.index() in tets:
+					return None
+				tets[j] = adj.index()
+				relabel[j] = q
+			elif tets[j] != adj.index() or relabel[j] != q:
+				return None
+		for (i, a, b, bound) in self.inequalities:
+			param = gm.edgeParameter(relabel[i][a], relabel[i][b], shapes[tets[i]])
+			if param is False or not gm.real(param) < bound:
+				return None
+		return tets
+
+def canonical(tets, gluings, inequalities, mirror=False):
+	"""
+	Canonical form of a pattern: over every choice of root tetrahedron (of largest
+	multiplicity) and orientation preserving relabelling of its vertices (any relabelling
+	if mirror), number the tetrahedra in breadth first order and relabel each newly reached
+	tetrahedron so that the gluing reaching it is the identity. Returns (key, gluings,
+	inequalities) for the smallest resulting key, which records mirror.
+	"""
+	# gluings from both sides, by (tetrahedron, face)
+	at = {}
+	for (i, f, j, g) in gluings:
+		at[(i, f)] = (j, g)
+		at[(j, g[f])] = (i, inverse(g))
+	top = max(multiplicity(gluings, i) for i in range(tets))
+
+	# orientation of each tetrahedron relative to tetrahedron 0
+	orientation = {0: 1}
+	order = [0]
+	for i in order:
+		for f in range(4):
+			if (i, f) in at:
+				j, g = at[(i, f)]
+				if j not in orientation:
+					orientation[j] = -orientation[i] * sign(g)
+					order.append(j)
+	if len(order) != tets:
+		raise Exception("gadget pattern must be connected")
+
+	best = None
+	for root in range(tets):
+		if multiplicity(gluings, root) != top:
+			continue
+		for s in PERMS:
+			if not mirror and sign(s) != orientation[root]:
+				continue
+			new = {root: 0}
+			relabel = {root: s} # old labels of tetrahedron -> new labels
+			order = [root]
+			for i in order:
+				for f in range(4): # in new labels
+					old_f = inverse(relabel[i])[f]
+					if (i, old_f) in at:
+						j, g = at[(i, old_f)]
+						if j not in new:
+							new[j] = len(order)
+							order.append(j)
+							relabel[j] = compose(relabel[i], inverse(g))
+			if len(order) != tets:
+				raise Exception("gadget pattern must be connected")
+
+			new_gluings = set()
+			for (i, old_f), (j, g) in at.items():
+				f = relabel[i][old_f]
+				h = compose(relabel[j], compose(g, inverse(relabel[i])))
+				side = (new[i], f, new[j], h)
+				other = (new[j], h[f], new[i], inverse(h))
+				new_gluings.add(min(side, other))
+			new_gluings = sorted(new_gluings)
+			new_inequalities = sorted((new[i],) + edgeClass(relabel[i][a], relabel[i][b]) + (bound,) for (i, a, b, bound) in inequalities)
+			key = (tuple(new_gluings), tuple(new_inequalities), mirror)
+			if best is None or key < best[0]:
+				best = (key, new_gluings, new_inequalities)
+	return best
+
+def patternFromTetrahedra(tri, tets, inequalities, name, mirror=False):
+	"""
+	Turn a gadget found in tri into a pattern: the tetrahedra `tets` (indices in tri) and
+	all gluings between them, with inequalities (position in tets, a, b, bound) in the
+	labels of tri.
+	"""
+	gluings = []
+	for i in range(len(tets)):
+		tet = tri.tetrahedron(tets[i])
+		for f in range(4):
+			adj = tet.adjacentTetrahedron(f)
+			if adj is not None and adj.index() in tets:
+				j = tets.index(adj.index())
+				G = tet.adjacentGluing(f)
+				G = (G[0], G[1], G[2], G[3])
+				if (i, f) <= (j, G[f]): # each gluing once
+					gluings.append((i, f, j, G))
+	return GadgetPattern(name, len(tets), gluings, inequalities, mirror)
+
+def ddPatterns():
+	"""
+	The Dadd-Duan gadget of `checkDDRec`, as patterns: tetrahedra A, B glued along two
+	faces, A012 = B012 (identity) and A's face opposite 0 to B's face opposite 1 (0->1,
+	1->3, 2->2, 3->0), with Re(edge parameter of A03) < 1; and its mirror image, where the
+	condition is on the image of A02. Together they match exactly when `checkDDRec` finds
+	a gadget.
+	"""
+	gluings = [(0, 3, 1, (0, 1, 2, 3)), (0, 0, 1, (1, 3, 2, 0))]
+	s = (1, 0, 2, 3) # relabelling every tetrahedron by an odd permutation mirrors the pattern
+	mirrored = [(i, s[f], j, compose(s, compose(g, inverse(s)))) for (i, f, j, g) in gluings]
+	return [GadgetPattern('DD', 2, gluings, [(0, 0, 3, 1)]), GadgetPattern('DD', 2, mirrored, [(0, s[0], s[2], 1)])]
+
+class PatternIndex:
+	"""
+	A collection of gadget patterns, matched together. Patterns are bucketed by the
+	multiplicity of their root, so a tetrahedron is only tried as the root of patterns
+	it could possibly be the root of.
+	"""
+	def __init__(self, patterns=()):
+		self.buckets = {}
+		self.size = 0
+		self.max_tets = 0
+		for p in patterns:
+			self.add(p)
+
+	def add(self, pattern):
+		"""
+		Adds pattern to the index. Returns False if an equivalent pattern is already there.
+		"""
+		bucket = self.buckets.setdefault(pattern.multiplicity, [])
+		if pattern in bucket:
+			return False
+		bucket.append(pattern)
+		self.size += 1
+		self.max_tets = max(self.max_tets, pattern.tets)
+		return True
+
+	def __len__(self):
+		return self.size
+
+	def anchors(self, tri, tets):
+		"""
+		Tetrahedra which could be the root of a match containing one of `tets`: those within
+		(largest pattern size - 1) gluings of them.
+		"""
+		near = set(tets)
+		frontier = set(tets)
+		for step in range(self.max_tets - 1):
+			nxt = set()
+			for t in frontier:
+				tet = tri.tetrahedron(t)
+				for f in range(4):
+					adj = tet.adjacentTetrahedron(f)
+					if adj is not None and adj.index() not in near:
+						nxt.add(adj.index())
+			near |= nxt
+			frontier = nxt
+		return sorted(near)
+
+	def match(self, tri, shapes, tets=None):
+		"""
+		Match every pattern against tri. If tets is given, only matches containing one of
+		those tetrahedra are looked for (see `recursiongadget.newTetrahedra`).
+		Returns (True, pattern name, matched tetrahedra) for the first match found,
+		otherwise (False, None, None).
+		"""
+		anchors = range(tri.countTetrahedra()) if tets is None else self.anchors(tri, tets)
+		for t in anchors:
+			tet = tri.tetrahedron(t)
+			counts = {}
+			for f in range(4):
+				adj = tet.adjacentTetrahedron(f)
+				if adj is not None:
+					counts[adj.index()] = counts.get(adj.index(), 0) + 1
+			m = max(counts.values(), default=0)
+			for key in self.buckets:
+				if key > m:
+					continue
+				for pattern in self.buckets[key]:
+					found = pattern.match(tri, shapes, t)
+					if found is not None and (tets is None or set(found) & set(tets)):
+						return (True, pattern.name, found)
+		return (False, None, None)
@@ -1,9 +1,13 @@
 import regina, snappy
 import geometricmoves as gm
-import geometricsearch as gs
+import profiler as prof
+import visitedset as vs
+import verification as ver
+import budget as bg
 import time
-from sage.all import QQbar
 import csv
+from itertools import permutations
+from multiprocessing import Pool
 
 ######################### Recursion Gadget Search ############################################
 # A *recursion gadget* is a substructure of a geometric triangulation and a sequence of moves
@@ -12,63 +16,86 @@ import csv
 # Dadd and Duan showed the Figure-8 Knot admits a two-tetrahedron recursive gadget, which
 # we call a Dadd-Duan or DD Recursion Gadget.
 
-def checkDDRec(tri, shapes):
+PERMS3 = list(permutations(range(3))) # orders of the vertices of a face
+
+def checkDDFace(tri, shapes, face):
+	"""
+	Check whether the Dadd-Duan Recursion Gadget exists at the given face of tri
+	(see `checkDDRec`). If exists, return (True, tet0, tet1, face index), otherwise None.
+	The face is tried from both sides, with its vertices in every order (so in every
+	labelling of A with the face as A012, see `checkDDRec`), and the shape condition is
+	read in that labelling, so the answer does not depend on how tri is labelled.
+	tri must be oriented.
+	"""
+	for k in range(2):
+		embed = face.embedding(k)
+		tet0 = embed.simplex()
+		v = embed.vertices() # (perm) Maps vertices (0,1,2) of face to the corresponding vertex numbers of tet0
+		tet1 = tet0.adjacentTetrahedron(v[3])
+		if tet1 == tet0:
+			continue
+		g = tet0.adjacentGluing(v[3])
+		for a, b, c in PERMS3:
+			A = (v[a], v[b], v[c], v[3]) # A's vertices in tet0
+			B = (g[A[0]], g[A[1]], g[A[2]], g[A[3]]) # B's vertices in tet1: A012 = B012
+			# A's face opposite 0 is glued to B, A3 -> B0, A1 -> B3, A2 -> B2 (and A0 -> B1)
+			if tet0.adjacentTetrahedron(A[0]) != tet1:
+				continue
+			h = tet0.adjacentGluing(A[0])
+			if h[A[3]] != B[0] or h[A[1]] != B[3] or h[A[2]] != B[2]:
+				continue
+			# the shape condition is on A03, or on A02 in the mirror image (A labelled against the orientation)
+			if regina.Perm4(*A).sign() == 1:
+				param = gm.edgeParameter(A[0], A[3], shapes[tet0.index()])
+			else:
+				param = gm.edgeParameter(A[0], A[2], shapes[tet0.index()])
+			if param is not False and gm.real(param) < 1:
+				return (True, tet0.index(), tet1.index(), face.index())
+	return None
+
+def checkDDRec(tri, shapes, tets=None):
 	"""
 	Given a triangulation tri and a list of shapes, check whether the 
-	Dadd-Duan Recursion Gadget exists:
-	- A123 = B230 and A012 = B013
+	Dadd-Duan Recursion Gadget exists: tetrahedra A and B with
+	- A012 = B012 and A123 = B320 (A's faces opposite 3 and 0 glued to B)
 	- shape of A = shape of B (implied [write proof])
-	- real part of shape < 1
+	- real part of the edge parameter of A03 < 1, or of A02 if the labelling of A is
+	  against the orientation of tri (the mirror image of the gadget)
+	in some labelling of A and B (see `checkDDFace`; `gadgetpatterns.ddPatterns` is the
+	same gadget as patterns). The condition makes the 2-3 move on A012 geometric, so the
+	gadget recurs.
 
+	If tets is given, only checks the faces of those tetrahedra (see `newTetrahedra`).
 	If exists, return True and the indices of corresponding tetrahedra
 	"""
-	found_combinatorial = False
-	combin_at = []
-	for face in tri.triangles():
-		embed0 = face.embedding(0)
-		tet0 = embed0.simplex()
-		tet_num0 = tet0.index()
-		tet_0_face_num = embed0.face()
-		v0 = embed0.vertices() # (perm) Maps vertices (0,1,2) of face to the corresponding vertex numbers of tet0
-
-		embed1 = face.embedding(1)
-		tet1 = embed1.simplex()
-		tet_num1 = tet1.index()
-		tet_1_face_num = embed1.face()
-		v1 = embed1.vertices() # Maps vertices (0,1,2) of face to the corresponding vertex numbers of tet1
-
-		ag0 = tet0.adjacentGluing(v0[0])
-		ag1 = tet0.adjacentGluing(v0[1])
-		ag2 = tet0.adjacentGluing(v0[2])
-
-		try:
-			shape0 = QQbar(shapes[tet_num0])
-		except:
-			shape0 = shapes[tet_num0]
-
-	    # check the other faces
-	    # TODO: draw picture of this so it can make sense to others
-		if tet0.adjacentTetrahedron(v0[0]).index() == tet_num1 and (ag0[v0[3]] == v1[0] and ag0[v0[1]] == v1[3] and ag0[v0[2]] == v1[2]):
-			if (1/(1-shape0)).real() < 1:
-					return (True, tet_num0, tet_num1, face.index())
-			else:
-				found_combinatorial = True
-				combin_at.append((tet_num0, tet_num1))
-		if tet0.adjacentTetrahedron(v0[2]).index() == tet_num1 and (ag2[v0[3]] == v1[2] and ag2[v0[0]] == v1[3] and ag2[v0[1]] == v1[1]):
-			if shape0.real() < 1:
-					return (True, tet_num0, tet_num1, face.index())
-			else:
-				found_combinatorial = True
-				combin_at.append((tet_num0, tet_num1))
-		if tet0.adjacentTetrahedron(v0[1]).index() == tet_num1 and (ag1[v0[3]] == v1[1] and ag1[v0[2]] == v1[3] and ag1[v0[0]] == v1[0]):
-			if ((shape0 - 1)/shapes[tet_num0]).real() < 1:
-					return (True, tet_num0, tet_num1, face.index())
-			else:
-				found_combinatorial = True
-				combin_at.append((tet_num0, tet_num1))
-
+	if tets is None:
+		faces = tri.triangles()
+	else:
+		faces = [tri.triangle(i) for i in sorted(set(tri.tetrahedron(t).triangle(j).index() for t in tets for j in range(4)))]
+	for face in faces:
+		found = checkDDFace(tri, shapes, face)
+		if found:
+			return found
 	return (False, -1, -1, -1)
 
+def newTetrahedra(tri, d):
+	"""
+	Indices of the tetrahedra created by the move just performed on tri: the last three
+	after a 2-3 move (d = 2), the last two after a 3-2 move (d = 1). A DD gadget that was
+	not in the parent triangulation must contain one of these.
+	"""
+	n = tri.countTetrahedra()
+	return range(n - 3 if d == 2 else n - 2, n)
+
+def checkGadgets(tri, shapes, patterns=None, tets=None):
+	"""
+	Check for the DD gadget with `checkDDRec`, or, if a `gadgetpatterns.PatternIndex` is
+	given, for any of its patterns. Returns True if a gadget is found.
+	"""
+	if patterns is None:
+		return checkDDRec(tri, shapes, tets)[0]
+	return patterns.match(tri, shapes, tets)[0]
+
 def quick_check(sig):
 	M = snappy.Manifold(sig)
 	T = regina.Triangulation3(M)
@@ -76,103 +103,133 @@ def quick_check(sig):
 	shapes = M.tetrahedra_shapes(part='rect')
 	print(checkDDRec(T, shapes))
 
-def pseudogeometricDDSearch(sig, max_tets, id_string, depth, verbose=True, directory='graphs', levels=False, use_fp = False):
+def pseudogeometricDDSearch(sig, max_tets, id_string, depth, verbose=True, directory='graphs', levels=False, use_fp = False, visited_dir=None, patterns=None, budget=None, profile=None, progress=0):
 	"""
 	Given an isosig, search pseudogeometric graph in search of a DD Recursion Gadget.
 	Returns if found, otherwise goes to max_tets ceiling.
 	id_string is just an identifier to put next to the sigs that return true, e.g. index in a census
+	Each queued node remembers whether it is gadget-free, so its neighbours only need their
+	new tetrahedra checked (see `newTetrahedra`).
+	visited_dir: if given, the visited set is kept on disk in this directory (see visitedset.py)
+	patterns: a `gadgetpatterns.PatternIndex` to search for instead of only the DD gadget
+	budget: a `budget.Budget` limiting the search (see `geometricsearch.graphPseudogeometricSearch`);
+		a search cut off by it is still recorded as finding no gadget
+	profile: if given, records where the time goes (see profiler.py) and writes a JSON
+		summary to this file. progress: if > 0, prints a progress line every `progress` seconds.
 	"""
 	if verbose:
 		print(f"Searching {sig}...")
 	t0 = time.time()
+	with prof.profiling(profile, progress):
+		budget = bg.Budget() if budget is None else budget
+		budget.start()
 
-	T = regina.Triangulation3.fromIsoSig(sig)
-	T.orient()
-	og_size = T.countTetrahedra()
-	M = snappy.Manifold(T)
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		og_size = T.countTetrahedra()
+		M = snappy.Manifold(T)
 
-	if use_fp:
-		shapes = M.tetrahedra_shapes(part='rect')
-		fp = 'YES'
-	else:
-		### field may not be found, so revert to float
-		L = M.tetrahedra_field_gens()
-		ts1 = time.time()
-		try:
-			shapes = L.find_field(100,10)[2]
-			fp = 'N' #using floating point
-		except:
+		if use_fp or gm.FLOAT_ONLY:
+			shapes = M.tetrahedra_shapes(part='rect')
+			fp = 'YES'
+		else:
+			### field may not be found, so revert to float
+			L = M.tetrahedra_field_gens()
+			ts1 = time.time()
 			try:
-				shapes = L.find_field(10000, 100)[2]
-				fp = 'N'
+				shapes = L.find_field(100,10)[2]
+				fp = 'N' #using floating point
 			except:
-				print(f"Could not find field: falling back to floating point: {sig}")
-				shapes = M.tetrahedra_shapes(part='rect')
-				fp = 'YES'
-		print(f'Field search took {round((time.time()-ts1)/60, 2)} minutes.')
-	# Check immediately if first triangulation has DD gadget
-	if checkDDRec(T, shapes)[0]:
-		f = open(f'{directory}/dd-gadget-knots-levels{max_tets}-depth{depth}.csv', "a")
-		f.write(f'{id_string},{sig},0,{fp}\n')
-		f.close()
-		print(f'(!***!) Found in first triangulation!')
-		return
+				try:
+					shapes = L.find_field(10000, 100)[2]
+					fp = 'N'
+				except:
+					print(f"Could not find field: falling back to floating point: {sig}")
+					shapes = M.tetrahedra_shapes(part='rect')
+					fp = 'YES'
+			print(f'Field search took {round((time.time()-ts1)/60, 2)} minutes.')
+		# Check immediately if first triangulation has DD gadget
+		if checkGadgets(T, shapes, patterns):
+			f = open(f'{directory}/dd-gadget-knots-levels{max_tets}-depth{depth}.csv', "a")
+			f.write(f'{id_string},{sig},0,{fp}\n')
+			f.close()
+			print('(!***!) Found in first triangulation!')
+			return
 
 
-	flat = [sig]
+		flat = vs.SigTable(visited_dir, f'{id_string}-({sig})-flat')
+		flat.add(sig)
 
 
-	# TODO : [ (Triangulation, [Shapes], index, dimension) ]
-	TODO = [(T, shapes, i, 2) for i in range(T.countTriangles())] + [(T, shapes, i, 1) for i in range(T.countEdges())]
+		# TODO : [ (Triangulation, [Shapes], index, dimension, gadget free) ]
+		budget.count(og_size)
+		TODO = [(T, shapes, i, 2, True) for i in range(T.countTriangles())] + [(T, shapes, i, 1, True) for i in range(T.countEdges()) if budget.down(og_size)]
 
-	while len(TODO) > 0:
-		T, shapes, i, d = TODO.pop(0)
-		Tsig = T.isoSig()
+		while len(TODO) > 0:
+			if budget.timeUp():
+				budget.drop({id(T): T.countTetrahedra() for T, shapes, i, d, gadget_free in TODO}.values())
+				break
+			T, shapes, i, d, gadget_free = TODO.pop(0)
+			prof.ACTIVE.queue(len(TODO), T.countTetrahedra())
 
-		# always work on a copy
-		S = regina.Triangulation3(T)
-		shapes2 = shapes.copy()
+			# always work on a copy
+			with prof.ACTIVE.phase('copy'):
+				S = regina.Triangulation3(T)
+				shapes2 = shapes.copy()
 
-		if d == 1: # 3-2 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
+			with prof.ACTIVE.phase('move'):
+				if d == 1: # 3-2 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.threeTwoMove(S, shapes2, i)
 
-		elif d == 2: # 2-3 move
-			success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
+				elif d == 2: # 2-3 move
+					success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(S, shapes2, i)
+
+			if success:
+				with prof.ACTIVE.phase('isosig'):
+					newSig = newT.isoSig()
+				if oriented > -1: # if flat or geometric
+					with prof.ACTIVE.phase('dedupe'):
+						newId, new = flat.add(newSig) # record new triangulation sig
+					if new: #if we haven't seen it before
+						prof.ACTIVE.node()
+						with prof.ACTIVE.phase('gadget check'):
+							found = checkGadgets(newT, newShapes, patterns, newTetrahedra(newT, d) if gadget_free else None)
+						if oriented > 0 and found:
+							with prof.ACTIVE.phase('csv'):
+								f = open(f'{directory}/dd-gadget-knots-levels{max_tets}-depth{depth}.csv', "a")
+								f.write(f'{id_string},{newSig},{newT.countTetrahedra() - regina.Triangulation3.fromIsoSig(sig).countTetrahedra()},{fp}\n')
+								f.close()
+							print(f'(*) Found after {len(flat)} pseudogeometric triangulations searched!')
+							vs.closeVisited(flat)
+							return
+
+						if not budget.expand(newT.countTetrahedra()):
+							continue
+						# add neighbors to queue
+						if budget.down(newT.countTetrahedra()): # don't go down if you're at min tetrahedra
+							TODO.extend([(newT, newShapes, j, 1, not found) for j in range(newT.countEdges())])
+						keep_going = (abs(newT.countTetrahedra() -  og_size)< max_tets) if levels else (newT.countTetrahedra() < max_tets)
+						if keep_going: # don't go up if you're at max tetrahedra
+							TODO.extend([(newT, newShapes, j, 2, not found) for j in range(newT.countTriangles())])
 
-		if success:
-			newSig = newT.isoSig()
-			if oriented > -1: # if flat or geometric
-				if not newSig in flat: #if we haven't seen it before
-					# record new triangulation sig
-					flat.append(newSig)
-					if oriented > 0 and checkDDRec(newT, newShapes)[0]:
-						f = open(f'{directory}/dd-gadget-knots-levels{max_tets}-depth{depth}.csv', "a")
-						f.write(f'{id_string},{newSig},{newT.countTetrahedra() - regina.Triangulation3.fromIsoSig(sig).countTetrahedra()},{fp}\n')
-						f.close()
-						print(f'(*) Found after {len(flat)} pseudogeometric triangulations searched!')
-						return
 
-					# add neighbors to queue
-					TODO.extend([(newT, newShapes, j, 1) for j in range(newT.countEdges())])
-					keep_going = (abs(newT.countTetrahedra() -  og_size)< max_tets) if levels else (newT.countTetrahedra() < max_tets)
-					if keep_going: # don't go up if you're at max tetrahedra
-						TODO.extend([(newT, newShapes, j, 2) for j in range(newT.countTriangles())])
-				
-			
-						
-	if verbose:
-		print(f'DD gadget not found...')
-		print(f'Number of pseudogeometric triangulations: {len(flat)}')
-		print(f'Time spent: {round((time.time() - t0)/60, 2)} minutes.')
-	# record no DD-gadget found
-	f = open(f'{directory}/no-dd-gadget-knots-levels{max_tets}-depth{depth}.csv', "a")
-	f.write(f'{id_string},{sig},{fp}\n')
-	f.close()
-	return
+
+		if verbose:
+			print('DD gadget not found...')
+			print(f'Number of pseudogeometric triangulations: {len(flat)}')
+			print(f'Time spent: {round((time.time() - t0)/60, 2)} minutes.')
+			if not budget.complete():
+				print(budget.report())
+		vs.closeVisited(flat)
+		# record no DD-gadget found
+		f = open(f'{directory}/no-dd-gadget-knots-levels{max_tets}-depth{depth}.csv', "a")
+		f.write(f'{id_string},{sig},{fp}\n')
+		f.close()
+		return
 
 def censusDDSearch(depth, max_tets, directory='.'):
 	f = open(f'{directory}/dd-gadget-knots-maxtet{max_tets}-depth{depth}.csv', "w")
-	f.write(f'id,sig,depth\n')
+	f.write('id,sig,depth\n')
 	f.close()
 	for i in range(depth):
 		print(f'{i}----------------------------------------------------------')
@@ -185,10 +242,10 @@ def knotCensusDDSearch(depth, levels, directory='.', use_fp=False):
 	Uses 'levels' instead of max tets, i.e. max tets = census tets + levels.
 	"""
 	f = open(f'{directory}/dd-gadget-knots-levels{levels}-depth{depth}.csv', "w")
-	f.write(f'id,sig,depth,fp?\n')
+	f.write('id,sig,depth,fp?\n')
 	f.close()
 	f = open(f'{directory}/no-dd-gadget-knots-levels{levels}-depth{depth}.csv', "w")
-	f.write(f'id,sig,fp?\n')
+	f.write('id,sig,fp?\n')
 	f.close()
 	for i in range(depth):
 		print(f'{i}----------------------------------------------------------')
@@ -221,15 +278,79 @@ def verifyKnotDDSearch(file, verbose=False):
 				row_string += ',' + w
 			if not success:
 				print(f'Failed at {count}')
-				f = open(f'newDDfail.csv', "a")
+				f = open('newDDfail.csv', "a")
 				f.write(row_string[1:] + '\n')
 				f.close()
 			else: #if success
-				f = open(f'newDDsuccess.csv', "a")
+				f = open('newDDsuccess.csv', "a")
 				f.write(row_string[1:] + '\n')
 				f.close()
 	print('File verified!')
 
+def verifyDDRow(row):
+	"""
+	Verify one row (index, sig, ...) of a DD gadget results CSV, as in `verifyKnotDDSearch`.
+	Returns (row, True) if sig is isometric to the census knot, verified hyperbolic, and has
+	a DD gadget with the verified shapes; (row, False) if it is not isometric or has no DD
+	gadget; (row, None) if inconclusive (hyperbolicity not verified, or SnapPy failed).
+	"""
+	try:
+		index = int(row[0])
+		ddSig = row[1]
+		ddM = snappy.Manifold(ddSig)
+		T = regina.Triangulation3.fromIsoSig(ddSig)
+		T.orient()
+		if not ddM.is_isometric_to(snappy.CensusKnots[index]):
+			return (row, False)
+		hyp, shapes = ddM.verify_hyperbolicity()
+		if not hyp:
+			return (row, None)
+		return (row, checkDDRec(T, shapes)[0])
+	except Exception:
+		return (row, None)
+
+def verifyKnotDDSearchParallel(file, processes=None, cache='dd-verified.csv', start=0, end=None, directory='.', verbose=False):
+	"""
+	Parallel version of `verifyKnotDDSearch`, verifying rows start to end (for splitting a
+	file across machines) across a pool of `processes` processes. Verified (index, sig) pairs
+	are recorded in `cache`, and skipped when rerun. Rows are written to newDDsuccess.csv and
+	newDDfail.csv in directory; inconclusive rows (see `verifyDDRow`) are neither written nor
+	cached. Only successes are skipped when rerun, as in `verification.verifySigs`.
+	"""
+	t0 = time.time()
+	with open(file, 'r') as f:
+		reader = csv.reader(f)
+		next(reader) #skip heading
+		rows = list(reader)[start:end]
+	done = ver.loadCache(cache)
+	done = {key for key, success in done.items() if success}
+	todo = [row for row in rows if f'{row[0]}/{row[1]}' not in done]
+	if verbose:
+		print(f'Verifying {len(todo)} rows ({len(rows) - len(todo)} already verified)...')
+
+	count = 0
+	errors = 0
+	success_file = open(f'{directory}/newDDsuccess.csv', "a")
+	fail_file = open(f'{directory}/newDDfail.csv', "a")
+	cache_file = open(cache, "a")
+	with Pool(processes) as pool:
+		for row, success in pool.imap(verifyDDRow, todo, chunksize=4):
+			count += 1
+			if success is None:
+				print(f'Inconclusive at {row[0]}: {row[1]}')
+				errors += 1
+				continue
+			if not success:
+				print(f'Failed at {row[0]}: {row[1]}')
+			(success_file if success else fail_file).write(','.join(row) + '\n')
+			cache_file.write(f'{row[0]}/{row[1]},{1 if success else 0}\n')
+			if verbose and count % 100 == 0:
+				print(f'Verified {count} rows in {round((time.time() - t0) / 60, 2)} minutes.')
+	success_file.close()
+	fail_file.close()
+	cache_file.close()
+	print(f'File verified! ({errors} inconclusive)')
+
 def testCheckDDRec(sig, height):
 	M = snappy.Manifold(sig)
 	shapes = M.tetrahedra_shapes(part='rect')
@@ -250,16 +371,13 @@ def testCheckDDRec(sig, height):
 
 def getGeomTriWithNTets(sig, tets):
 	"""
-	Expects a triangulation with a DD gadget
+	Expects a triangulation with a DD gadget. Applies its 2-3 move until the triangulation
+	has `tets` tetrahedra (with the same fast path and cost as `streamGeomTris`), and prints
+	the isosig of the result.
 	"""
 	M = snappy.Manifold(sig)
 	### field may not be found
-	L = M.tetrahedra_field_gens()
-	try:
-		shapes = L.find_field(100,10)[2]
-	except:
-		print("Could not find field: falling back to floating point")
-		shapes = M.tetrahedra_shapes(part='rect')
+	shapes = gm.startingShapes(M, 100, 10)
 	T = regina.Triangulation3(M)
 	T.orient()
 	Mtets = M.num_tetrahedra()
@@ -267,9 +385,49 @@ def getGeomTriWithNTets(sig, tets):
 	success, t1, t2, f = checkDDRec(T, shapes)
 	assert success
 	for i in range(tets-Mtets):
-		success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(T, shapes, f)
+		success, newT, newShapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(T, shapes, f, check=False, local=True)
 		assert success
 		assert oriented == 1
 		# print(f'{newT.isoSig()} is geometric with {newT.countTetrahedra()} tetrahedra.')
-		success, t1, t2, f = checkDDRec(newT, newShapes)
+		success, t1, t2, f = checkDDRec(newT, newShapes, newTetrahedra(newT, 2))
 	print(newT.isoSig())
+
+def streamGeomTris(sig, tets, file, every=1, verbose=True):
+	"""
+	Expects a triangulation with a DD gadget. Applies the gadget's 2-3 move until the
+	triangulation has `tets` tetrahedra, writing (tetrahedra, isosig) rows to file for
+	every `every`-th triangulation (and the last one).
+	Each step skips Regina's cross-check, only checks the orientation of the three new
+	tetrahedra, and only looks for the gadget again among them. A step still costs O(n)
+	for a triangulation with n tetrahedra: Regina recomputes the skeleton after every move
+	(to find the gadget's face), removing the two old tetrahedra renumbers the later ones,
+	and their shapes are popped from the list. So reaching n tetrahedra takes O(n^2) time,
+	with a small constant (about 2 seconds for 1000 tetrahedra in float mode). Each isosig
+	written costs more than a step (Regina tries every tetrahedron as a starting point), so
+	with every=1 writing them dominates; write every k-th for large n.
+	"""
+	t0 = time.time()
+	M = snappy.Manifold(sig)
+	### field may not be found
+	shapes = gm.startingShapes(M, 100, 10)
+	T = regina.Triangulation3(M)
+	T.orient()
+	Mtets = M.num_tetrahedra()
+	assert tets - Mtets > 0
+	success, t1, t2, f = checkDDRec(T, shapes)
+	assert success
+
+	out = open(file, "w")
+	out.write('tetrahedra,sig\n')
+	for i in range(tets-Mtets):
+		success, T, shapes, (oriented, (flat_count, negative_count)) = gm.twoThreeMove(T, shapes, f, check=False, local=True)
+		assert success
+		assert oriented == 1
+		if (i + 1) % every == 0 or i == tets - Mtets - 1:
+			out.write(f'{T.countTetrahedra()},{T.isoSig()}\n')
+		success, t1, t2, f = checkDDRec(T, shapes, newTetrahedra(T, 2))
+		assert success
+	out.close()
+	if verbose:
+		print(f'Generated geometric triangulations up to {T.countTetrahedra()} tetrahedra in {round(time.time() - t0, 2)} seconds.')
+	return T, shapes
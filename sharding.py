@@ -0,0 +1,224 @@
+import os, csv, time, shutil, socket, sqlite3, threading
+
+#####################################################################################
+########################### Sharded Census Runs #####################################
+#####################################################################################
+# A census run split over many machines. The manifolds to search are jobs in a SQLite
+# database on shared storage. Any number of workers (on any machines) take jobs from it,
+# search them into their own output directory, and record the result; a merge then
+# gathers the outputs of all workers into one directory laid out like examples/, with
+# a summary table. E.g. (see also the queue, worker and merge commands of cli.py)
+#
+#	addCensus('census.db', 'orientable', 0, 1000, 10)		# once
+#	runWorker('census.db', 'shards')				# on every machine, as often as wanted
+#	mergeShards('census.db', 'pseudogeometric-census-10-tets')	# at the end
+#
+# Workers take jobs with a lease, which they renew while the job runs. If a worker dies
+# (crash, out of memory, machine lost), its lease runs out and the job is handed out
+# again. Jobs that fail (or are lost) `max_attempts` times are marked failed, with the
+# last error. Job status: pending -> running -> done, or failed; see `jobStatus`.
+#
+# The database relies on SQLite's file locking, which works on most shared file systems
+# (NFS with working locks, Lustre, ...). Only the small job records go through it: the
+# search outputs are written to each worker's directory.
+
+CENSUSES = {'orientable': 'OrientableCuspedCensus', 'knots': 'CensusKnots'}
+GRAPHS = ['pseudogeometric', 'essential']
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS jobs (
+	id INTEGER PRIMARY KEY,
+	census TEXT, idx INTEGER, name TEXT, sig TEXT,
+	graph TEXT, max_tets INTEGER,
+	status TEXT DEFAULT 'pending',
+	attempts INTEGER DEFAULT 0,
+	worker TEXT, lease REAL,
+	prefix TEXT, seconds REAL, geometric INTEGER, nongeometric INTEGER, error TEXT,
+	UNIQUE (census, idx, graph, max_tets))'''
+
+def openQueue(path):
+	"""
+	Connection to the job database at path (created if needed), in autocommit mode:
+	transactions are started explicitly.
+	"""
+	db = sqlite3.connect(path, timeout=600, isolation_level=None)
+	db.execute(SCHEMA)
+	return db
+
+def addCensus(path, census, start, end, max_tets, graph='pseudogeometric'):
+	"""
+	Adds a job for each manifold start, ..., end - 1 of a census (see CENSUSES), searching
+	the `graph` subgraph (see GRAPHS) up to max_tets. Jobs already in the queue are kept
+	as they are. Returns the number of jobs added.
+	"""
+	import snappy
+	C = getattr(snappy, CENSUSES[census])
+	rows = [(census, i, C[i].name(), C[i].triangulation_isosig(decorated=False), graph, max_tets) for i in range(start, min(end, len(C)))]
+	db = openQueue(path)
+	before = db.total_changes
+	db.execute('BEGIN IMMEDIATE')
+	db.executemany('INSERT OR IGNORE INTO jobs (census, idx, name, sig, graph, max_tets) VALUES (?, ?, ?, ?, ?, ?)', rows)
+	db.execute('COMMIT')
+	added = db.total_changes - before
+	db.close()
+	return added
+
+def claimJob(db, worker, lease, max_attempts):
+	"""
+	Hands the next job to worker for `lease` seconds: a pending job, or a running job whose
+	lease ran out. Jobs lost `max_attempts` times are marked failed instead. Returns the job
+	as (id, name, sig, graph, max_tets), or None if there are no jobs left to hand out.
+	"""
+	now = time.time()
+	db.execute('BEGIN IMMEDIATE')
+	db.execute("UPDATE jobs SET status = 'failed', error = 'lease ran out' WHERE status = 'running' AND lease < ? AND attempts >= ?", (now, max_attempts))
+	job = db.execute("SELECT id, name, sig, graph, max_tets FROM jobs WHERE status = 'pending' OR (status = 'running' AND lease < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+	if job is not None:
+		db.execute("UPDATE jobs SET status = 'running', worker = ?, lease = ?, attempts = attempts + 1 WHERE id = ?", (worker, now + lease, job[0]))
+	db.execute('COMMIT')
+	return job
+
+def renewLease(db, id, worker, lease):
+	"""
+	Extends worker's lease on a job. Returns False if the job is no longer worker's.
+	"""
+	cursor = db.execute("UPDATE jobs SET lease = ? WHERE id = ? AND worker = ? AND status = 'running'", (time.time() + lease, id, worker))
+	return cursor.rowcount == 1
+
+def finishJob(db, id, worker, max_attempts, prefix=None, seconds=None, counts=(None, None), error=None):
+	"""
+	Records the result of a job, if it is still worker's: done if error is None, otherwise
+	pending again (for a retry) or failed after max_attempts attempts.
+	"""
+	if error is None:
+		db.execute("UPDATE jobs SET status = 'done', prefix = ?, seconds = ?, geometric = ?, nongeometric = ?, error = NULL WHERE id = ? AND worker = ? AND status = 'running'", (prefix, seconds, counts[0], counts[1], id, worker))
+	else:
+		db.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ? WHERE id = ? AND worker = ? AND status = 'running'", (max_attempts, error, id, worker))
+
+class Heartbeat(threading.Thread):
+	"""
+	Renews a worker's lease on a job every lease / 3 seconds until stopped (with its own
+	database connection, as connections are not shared between threads).
+	"""
+	def __init__(self, path, id, worker, lease):
+		super().__init__(daemon=True)
+		self.path, self.id, self.worker, self.lease = path, id, worker, lease
+		self.stopped = threading.Event()
+
+	def run(self):
+		db = openQueue(self.path)
+		while not self.stopped.wait(self.lease / 3):
+			if not renewLease(db, self.id, self.worker, self.lease):
+				break
+		db.close()
+
+def countNodes(file):
+	"""
+	(geometric, nongeometric) number of nodes in a nodes CSV written by a search.
+	"""
+	with open(file, 'r') as f:
+		oriented = [row['oriented'] for row in csv.DictReader(f)]
+	geometric = sum(1 for o in oriented if o == '1')
+	return (geometric, len(oriented) - geometric)
+
+def searchJob(sig, graph, max_tets, directory):
+	"""
+	Runs the search of a job as the census drivers of geometricsearch.py do. Returns the
+	path prefix of its output files (up to -nodes.csv / -edges.csv).
+	"""
+	import regina, snappy
+	import geometricsearch as gs
+	if graph == 'pseudogeometric':
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		gs.graphPseudogeometricSearch(sig, max_tets, verbose=False, record_nons=False, directory=directory)
+		return os.path.join(directory, f'{gs.manifoldName(snappy.Manifold(T))}-({sig})-pseudogeometric')
+	gs.graphEssentialSearch(sig, max_tets, verbose=False, directory=directory)
+	return os.path.join(directory, f'{sig}-essential')
+
+def runWorker(path, directory, worker=None, lease=600, max_attempts=3, max_jobs=None, verbose=True):
+	"""
+	Takes jobs from the queue at path and runs them until there are none left (or
+	max_jobs have been run). Outputs go to {directory}/{worker}.
+	- worker: name of this worker, unique across machines (default: host name and pid)
+	- lease: seconds a job stays this worker's without a renewal (see top of file)
+	Returns the number of jobs run.
+	"""
+	worker = f'{socket.gethostname()}-{os.getpid()}' if worker is None else worker
+	output = os.path.join(directory, worker)
+	os.makedirs(output, exist_ok=True)
+	db = openQueue(path)
+	count = 0
+	while max_jobs is None or count < max_jobs:
+		job = claimJob(db, worker, lease, max_attempts)
+		if job is None:
+			break
+		id, name, sig, graph, max_tets = job
+		if verbose:
+			print(f'{worker}: searching {name} ({sig})...')
+		heartbeat = Heartbeat(path, id, worker, lease)
+		heartbeat.start()
+		t0 = time.time()
+		try:
+			prefix = os.path.abspath(searchJob(sig, graph, max_tets, output))
+			finishJob(db, id, worker, max_attempts, prefix, time.time() - t0, countNodes(prefix + '-nodes.csv'))
+		except Exception as e:
+			finishJob(db, id, worker, max_attempts, error=f'{type(e).__name__}: {e}')
+			if verbose:
+				print(f'{worker}: {name} failed: {type(e).__name__}: {e}')
+		finally:
+			heartbeat.stopped.set()
+			heartbeat.join()
+		count += 1
+	db.close()
+	return count
+
+def jobStatus(path):
+	"""
+	{status: number of jobs} for the queue at path.
+	"""
+	db = openQueue(path)
+	status = dict(db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+	db.close()
+	return status
+
+def resetJobs(path, status='failed'):
+	"""
+	Makes the jobs with the given status pending again, with no attempts. Returns their number.
+	"""
+	db = openQueue(path)
+	count = db.execute("UPDATE jobs SET status = 'pending', attempts = 0, worker = NULL, lease = NULL WHERE status = ?", (status,)).rowcount
+	db.close()
+	return count
+
+def mergeShards(path, output, graph='pseudogeometric', max_tets=None, verbose=True):
+	"""
+	Copies the outputs of the done jobs of the queue at path (searching `graph`, up to
+	max_tets if given) into the directory output, as in examples/, and writes the summary
+	table percent-geom-from-{output}.csv there (manifold, geometric, nongeometric,
+	percentage; in census order). Only the output of the worker the job was recorded for is
+	used, so jobs run twice (after a lost lease) are not duplicated.
+	Returns the jobs not done, as (census, index, name, status, error).
+	"""
+	db = openQueue(path)
+	condition, params = ('graph = ?', (graph,)) if max_tets is None else ('graph = ? AND max_tets = ?', (graph, max_tets))
+	done = db.execute(f"SELECT name, prefix, geometric, nongeometric FROM jobs WHERE {condition} AND status = 'done' ORDER BY census, idx", params).fetchall()
+	missing = db.execute(f"SELECT census, idx, name, status, error FROM jobs WHERE {condition} AND status != 'done' ORDER BY census, idx", params).fetchall()
+	db.close()
+
+	os.makedirs(output, exist_ok=True)
+	summary = []
+	for name, prefix, geometric, nongeometric in done:
+		for part in ['nodes', 'edges']:
+			shutil.copyfile(f'{prefix}-{part}.csv', os.path.join(output, f'{os.path.basename(prefix)}-{part}.csv'))
+		summary.append(f'{name}, {geometric}, {nongeometric}, {round(100 * geometric / (geometric + nongeometric), 1)}\n')
+
+	f = open(os.path.join(output, f'percent-geom-from-{os.path.basename(os.path.normpath(output))}.csv'), 'w')
+	f.write('manifold, geometric, nongeometric, percentage\n')
+	f.writelines(summary)
+	f.close()
+
+	if verbose:
+		print(f'Merged {len(done)} jobs into {output}, {len(missing)} not done.')
+		for census, idx, name, status, error in missing[:20]:
+			print(f'\t{census} {idx} ({name}): {status}{f" ({error})" if error else ""}')
+	return missing
@@ -0,0 +1,128 @@
+import os, re, csv, sqlite3
+
+#####################################################################################
+########################### Isosig Index ############################################
+#####################################################################################
+# A persistent index of every node in a tree of search outputs (such as examples/), to
+# answer "which manifold and which run has this triangulation, and how is it oriented?"
+# without reading the CSVs:
+#
+#	index = SigIndex('sigs.db')
+#	index.update('examples')		# only reads nodes files that are new or changed
+#	index.lookup('dLQbcccdxwb')		# [{'manifold': 'm007(0,0)', 'run': ..., 'oriented': 1, ...}]
+#	index.lookupMany(sigs)			# {sig: [...]} for many isosigs at once
+#
+# A triangulation is listed once per nodes file it is in. Files are recognised by name:
+#	{manifold}-({start})-{graph}-nodes.csv	(graphPseudogeometricSearch)
+#	{start}-{graph}-nodes.csv		(graphGeometricSearch, graphEssentialSearch)
+# where start is the isosig the search started from. The run of a file is its directory,
+# relative to the root of the tree. Counts of flat and negative tetrahedra are None for
+# files without those columns.
+#
+# `sigs` lists the isosigs of earlier runs, e.g. for the `seen` argument of the graph
+# searches in geometricsearch.py, so that they skip what those runs already found.
+
+NODES = re.compile(r'^(?:(?P<manifold>.*)-\((?P<start>[^()]*)\)|(?P<start2>[^()]*))-(?P<graph>[a-z]+)-nodes\.csv$')
+
+SCHEMA = ['''CREATE TABLE IF NOT EXISTS files (
+	id INTEGER PRIMARY KEY,
+	path TEXT UNIQUE, mtime REAL, size INTEGER,
+	run TEXT, manifold TEXT, start TEXT, graph TEXT)''',
+	'''CREATE TABLE IF NOT EXISTS nodes (
+	sig TEXT, file INTEGER, oriented INTEGER, tetrahedra INTEGER, flat INTEGER, negative INTEGER)''',
+	'CREATE INDEX IF NOT EXISTS nodes_sig ON nodes (sig)',
+	'CREATE INDEX IF NOT EXISTS nodes_file ON nodes (file)']
+
+COLUMNS = ['manifold', 'run', 'graph', 'start', 'oriented', 'tetrahedra', 'flat count', 'negative count', 'file']
+SELECT = 'SELECT n.sig, f.manifold, f.run, f.graph, f.start, n.oriented, n.tetrahedra, n.flat, n.negative, f.path FROM nodes n JOIN files f ON n.file = f.id'
+
+def optionalInt(value):
+	return None if value is None or value == '' else int(value)
+
+class SigIndex:
+	"""
+	Isosig index stored in the SQLite database at path (see top of file).
+	"""
+	def __init__(self, path):
+		self.db = sqlite3.connect(path)
+		for statement in SCHEMA:
+			self.db.execute(statement)
+		self.db.commit()
+
+	def update(self, tree, verbose=True):
+		"""
+		Brings the index up to date with the nodes files under the directory tree: files
+		that are new or changed (by modification time and size) are (re)read, and files
+		that are gone are dropped. Returns (number of files read, number dropped).
+		"""
+		tree = os.path.abspath(tree)
+		found = {}
+		for directory, dirs, files in os.walk(tree):
+			for name in files:
+				if NODES.match(name):
+					path = os.path.join(directory, name)
+					stat = os.stat(path)
+					found[path] = (stat.st_mtime, stat.st_size)
+
+		known = {path: (id, mtime, size) for id, path, mtime, size in self.db.execute('SELECT id, path, mtime, size FROM files WHERE substr(path, 1, ?) = ?', (len(tree) + 1, tree + os.sep))}
+		dropped = [id for path, (id, mtime, size) in known.items() if path not in found]
+		changed = [path for path, stat in found.items() if path not in known or known[path][1:] != stat]
+		for id in dropped + [known[path][0] for path in changed if path in known]:
+			self.db.execute('DELETE FROM nodes WHERE file = ?', (id,))
+			self.db.execute('DELETE FROM files WHERE id = ?', (id,))
+
+		for path in changed:
+			self.addFile(path, tree, *found[path])
+		self.db.commit()
+		if verbose:
+			print(f'Read {len(changed)} files, dropped {len(dropped)}; {self.count()} nodes indexed.')
+		return (len(changed), len(dropped))
+
+	def addFile(self, path, tree, mtime, size):
+		match = NODES.match(os.path.basename(path))
+		start = match['start'] if match['start'] is not None else match['start2']
+		run = os.path.relpath(os.path.dirname(path), tree)
+		cursor = self.db.execute('INSERT INTO files (path, mtime, size, run, manifold, start, graph) VALUES (?, ?, ?, ?, ?, ?, ?)', (path, mtime, size, run, match['manifold'], start, match['graph']))
+		file = cursor.lastrowid
+		with open(path, 'r') as f:
+			rows = ((row['id'], file, int(row['oriented']), int(row['tetrahedra']), optionalInt(row.get('flat count')), optionalInt(row.get('negative count'))) for row in csv.DictReader(f))
+			self.db.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+	def count(self):
+		return self.db.execute('SELECT COUNT(*) FROM nodes').fetchone()[0]
+
+	def lookup(self, sig):
+		"""
+		Every entry for sig, as dictionaries with COLUMNS as keys (empty if sig is not indexed).
+		"""
+		return [dict(zip(COLUMNS, row[1:])) for row in self.db.execute(f'{SELECT} WHERE n.sig = ?', (sig,))]
+
+	def lookupMany(self, sigs, chunk=500):
+		"""
+		{sig: entries (see `lookup`)} for every sig in sigs, in batches of `chunk` isosigs per query.
+		"""
+		sigs = list(sigs)
+		result = {sig: [] for sig in sigs}
+		for i in range(0, len(sigs), chunk):
+			part = sigs[i:i + chunk]
+			for row in self.db.execute(f'{SELECT} WHERE n.sig IN ({", ".join("?" * len(part))})', part):
+				result[row[0]].append(dict(zip(COLUMNS, row[1:])))
+		return result
+
+	def sigs(self, manifold=None, run=None, graph=None, oriented=None):
+		"""
+		The distinct isosigs of the entries with the given manifold, run, graph and
+		orientation class (any of them if None; oriented may be a list of classes).
+		"""
+		conditions, params = [], []
+		for column, value in [('f.manifold', manifold), ('f.run', run), ('f.graph', graph), ('n.oriented', oriented)]:
+			if value is None:
+				continue
+			values = value if isinstance(value, (list, tuple, set)) else [value]
+			conditions.append(f'{column} IN ({", ".join("?" * len(values))})')
+			params.extend(values)
+		where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+		return {row[0] for row in self.db.execute(f'SELECT DISTINCT n.sig FROM nodes n JOIN files f ON n.file = f.id{where}', params)}
+
+	def close(self):
+		self.db.close()
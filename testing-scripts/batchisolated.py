@@ -0,0 +1,103 @@
+import snappy, regina
+import geometricmoves as gm
+import verification as ver
+from multiprocessing import Pool
+
+# Batch version of `verifyIsolated` (see verifyisolated.py). Instead of solving for the
+# hyperbolic structure of every neighbour, the shapes of the input triangulation are
+# computed once and each neighbour's shapes are predicted with the geometric moves. Since
+# the complete structure is unique, the prediction decides geometricity; SnapPy's
+# `verify_hyperbolicity()` is only used for neighbours with a nearly flat tetrahedron.
+
+def isGeometric(S, shapes, tolerance):
+	"""
+	Given a triangulation S and its predicted shapes, returns whether S is geometric,
+	verifying with SnapPy if the smallest imaginary part is within tolerance of 0.
+	"""
+	margin = min(gm.imag(z) for z in shapes)
+	if margin > tolerance:
+		return True
+	if margin < -tolerance:
+		return False
+	return bool(ver.verifySig(S.isoSig())[1])
+
+def isolatedStatus(sig, tolerance=1e-6):
+	"""
+	Returns (sig, True) if sig is geometrically isolated (by 2-3 and 3-2 moves),
+	(sig, False) otherwise, and (sig, None) if SnapPy or Regina raised an error (as
+	`verification.verifySig`). If the input triangulation is not geometric its shapes do not
+	predict its neighbours', so every neighbour is verified with SnapPy as in `verifyIsolated`.
+	The moves skip their Regina cross-check (see `gm.twoThreeMove`).
+	"""
+	try:
+		return (sig, isolated(sig, tolerance))
+	except Exception:
+		return (sig, None)
+
+def isolated(sig, tolerance):
+	T = regina.Triangulation3.fromIsoSig(sig)
+	T.orient()
+	M = snappy.Manifold(T)
+	predict = M.solution_type() == 'all tetrahedra positively oriented'
+	shapes = M.tetrahedra_shapes(part='rect')
+
+	moves = [(i, 2) for i in range(T.countTriangles())] + [(i, 1) for i in range(T.countEdges())]
+	for i, d in moves:
+		S = regina.Triangulation3(T)
+		if predict:
+			if d == 1: # 3-2 move
+				success, newT, newShapes, (oriented, counts) = gm.threeTwoMove(S, shapes.copy(), i, check=False)
+			else: # 2-3 move
+				success, newT, newShapes, (oriented, counts) = gm.twoThreeMove(S, shapes.copy(), i, check=False)
+			if success and oriented != -2 and isGeometric(newT, newShapes, tolerance):
+				return False
+		else:
+			if not S.pachner(S.edge(i) if d == 1 else S.triangle(i)):
+				continue
+			if snappy.Manifold(S).verify_hyperbolicity()[0]:
+				return False
+	return True
+
+def readSigs(file):
+	"""
+	Isosigs from a file, one per line (the first column of a CSV is also fine).
+	"""
+	sigs = []
+	with open(file, 'r') as f:
+		for line in f:
+			sig = line.split(',')[0].strip()
+			if sig and sig != 'id':
+				sigs.append(sig)
+	return sigs
+
+def verifyIsolatedBatch(sigs, processes=None, output=None, errors=None, verbose=True):
+	"""
+	Screen a list (or file, see `readSigs`) of isosigs for geometrically isolated
+	triangulations, in parallel. Writes `sig,isolated` rows to output, if given (isolated
+	is 1, 0, or empty if checking sig raised an error). Isosigs that raised an error are
+	appended to the list errors, if given. Returns the list of isolated isosigs.
+	"""
+	if isinstance(sigs, str):
+		sigs = readSigs(sigs)
+	isolated = []
+	failed = []
+	f = open(output, 'w') if output is not None else None
+	if f is not None:
+		f.write('sig,isolated\n')
+	with Pool(processes) as pool:
+		for sig, iso in pool.imap(isolatedStatus, sigs, chunksize=4):
+			if iso:
+				isolated.append(sig)
+			elif iso is None:
+				failed.append(sig)
+			if f is not None:
+				f.write(f'{sig},{"" if iso is None else 1 if iso else 0}\n')
+	if f is not None:
+		f.close()
+	if verbose:
+		print(f'{len(isolated)} of {len(sigs)} triangulations are geometrically isolated.')
+		if failed:
+			print(f'{len(failed)} raised errors, e.g. {failed[0]}')
+	if errors is not None:
+		errors.extend(failed)
+	return isolated
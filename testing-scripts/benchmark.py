@@ -0,0 +1,201 @@
+import os, sys, csv, json, time, resource, platform, tempfile
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'recursion-gadget')]
+
+import snappy, regina
+import geometricmoves as gm
+import geometricsearch as gs
+import recursiongadget as rg
+from verifyisolated import verifyIsolated
+
+#####################################################################################
+########################### Benchmarks ##############################################
+#####################################################################################
+# Fixed workloads for measuring whether a change makes things faster. Each workload runs
+# in a freshly spawned process (not forked, which would inherit the memory of this one),
+# so its peak memory (see `peakMemory`) is its own and the modules' it imports, and reports its time, peak memory
+# and a result. Search results are checked against the node and edge counts of the
+# graphs in examples/. Results are written to a JSON file, which can be compared with
+# a stored baseline (a results file from an earlier run):
+#
+#	runBenchmarks(results='benchmark-results.json', baseline='benchmark-baseline.json')
+
+EXAMPLES = os.path.join(ROOT, 'examples', 'pseudogeometric-census-10-tets')
+
+# census manifolds to search, by name and starting isosig (see examples/)
+SEARCHES = [('m003', 'cPcbbbdxm'), ('m004', 'cPcbbbiht'), ('m006', 'dLQacccjnjs'), ('m007', 'dLQbcccdxwb')]
+
+def exampleCounts(name, sig):
+	"""
+	Node and edge counts of the example graph of a search, and its max_tets (the most
+	tetrahedra of any of its nodes).
+	"""
+	nodes, edges = readGraph(os.path.join(EXAMPLES, f'{name}(0,0)-({sig})-pseudogeometric'))
+	return {'nodes': len(nodes), 'edges': len(edges), 'max_tets': max(nodes.values())}
+
+def readGraph(prefix):
+	"""
+	Reads {prefix}-nodes.csv and {prefix}-edges.csv. Returns ({id: tetrahedra}, set of edges),
+	with edges as unordered pairs.
+	"""
+	with open(prefix + '-nodes.csv', 'r') as f:
+		nodes = {row['id']: int(row['tetrahedra']) for row in csv.DictReader(f)}
+	with open(prefix + '-edges.csv', 'r') as f:
+		edges = set(frozenset((row['target'], row['source'])) for row in csv.DictReader(f))
+	return nodes, edges
+
+def startingShapes(sig, exact):
+	T = regina.Triangulation3.fromIsoSig(sig)
+	T.orient()
+	M = snappy.Manifold(T)
+	if exact:
+		return T, M.tetrahedra_field_gens().find_field(10000, 100, True, True)[2]
+	return T, M.tetrahedra_shapes(part='rect')
+
+def benchMoves(exact, repeat=20):
+	"""
+	Micro-benchmark: every 2-3 and 3-2 move on the starting triangulations of SEARCHES,
+	`repeat` times, with exact or floating point shapes. Result: number of successful moves.
+	"""
+	work = [startingShapes(sig, exact) for name, sig in SEARCHES]
+	moves = 0
+	successes = 0
+	t0 = time.perf_counter()
+	for r in range(repeat):
+		for T, shapes in work:
+			for i in range(T.countTriangles()):
+				success = gm.twoThreeMove(regina.Triangulation3(T), shapes.copy(), i)[0]
+				successes += bool(success)
+			for i in range(T.countEdges()):
+				success = gm.threeTwoMove(regina.Triangulation3(T), shapes.copy(), i)[0]
+				successes += bool(success)
+			moves += T.countTriangles() + T.countEdges()
+	seconds = time.perf_counter() - t0
+	return {'result': successes // repeat, 'moves': moves, 'seconds per move': seconds / moves}
+
+def benchSearch(name, sig):
+	"""
+	`graphPseudogeometricSearch` of a census manifold up to the max_tets of its example
+	graph, checked against the example's node and edge counts.
+	"""
+	expected = exampleCounts(name, sig)
+	with tempfile.TemporaryDirectory() as directory:
+		gs.graphPseudogeometricSearch(sig, expected['max_tets'], verbose=False, record_nons=False, directory=directory)
+		nodes, edges = readGraph(os.path.join(directory, f'{name}(0,0)-({sig})-pseudogeometric'))
+	result = {'nodes': len(nodes), 'edges': len(edges)}
+	return {'result': result, 'expected': {'nodes': expected['nodes'], 'edges': expected['edges']}}
+
+def benchDD(knots=10, levels=2):
+	"""
+	`pseudogeometricDDSearch` on the first `knots` census knots, with max tets = census
+	tets + levels. Result: number of knots a DD gadget was found for.
+	"""
+	with tempfile.TemporaryDirectory() as directory:
+		for i in range(knots):
+			sig = snappy.CensusKnots[i].triangulation_isosig(decorated=False)
+			rg.pseudogeometricDDSearch(sig, levels, str(i), knots, verbose=False, directory=directory, levels=True)
+		found = os.path.join(directory, f'dd-gadget-knots-levels{levels}-depth{knots}.csv')
+		count = 0
+		if os.path.exists(found):
+			with open(found, 'r') as f:
+				count = sum(1 for line in f if line.strip())
+	return {'result': count}
+
+def benchIsolated(sample=50):
+	"""
+	`verifyIsolated` on the first `sample` nodes of the m004 example graph.
+	Result: number of geometrically isolated triangulations.
+	"""
+	nodes, edges = readGraph(os.path.join(EXAMPLES, 'm004(0,0)-(cPcbbbiht)-pseudogeometric'))
+	sigs = list(nodes)[:sample]
+	return {'result': sum(1 for sig in sigs if verifyIsolated(sig))}
+
+WORKLOADS = {
+	'moves-exact': (benchMoves, (True,)),
+	'moves-float': (benchMoves, (False,)),
+	**{f'search-{name}': (benchSearch, (name, sig)) for name, sig in SEARCHES},
+	'dd-census-knots': (benchDD, ()),
+	'isolated-sample': (benchIsolated, ()),
+}
+
+def peakMemory():
+	"""
+	Peak resident memory of this process in MB. On Linux this is VmHWM, which starts afresh
+	when a process execs (ru_maxrss does not: a spawned process would report the peak of
+	the one it was forked from), elsewhere ru_maxrss.
+	"""
+	try:
+		with open('/proc/self/status', 'r') as f:
+			for line in f:
+				if line.startswith('VmHWM:'):
+					return int(line.split()[1]) / 1024
+	except OSError:
+		pass
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def runWorkload(name):
+	"""
+	Runs a workload (in the current process), adding its time, peak memory (in MB) and
+	whether its result matches what is expected, if anything is.
+	"""
+	function, args = WORKLOADS[name]
+	t0 = time.perf_counter()
+	report = function(*args)
+	report['seconds'] = time.perf_counter() - t0
+	report['peak memory'] = peakMemory()
+	if 'expected' in report:
+		report['ok'] = report['result'] == report['expected']
+	return report
+
+def compare(results, baseline, threshold=0.1):
+	"""
+	Compares benchmark results with a baseline (both {workload: report}). Returns a list of
+	(workload, problem) pairs: changed results, and times or peak memory more than
+	`threshold` (as a fraction) above the baseline.
+	"""
+	problems = []
+	for name in results:
+		if name not in baseline:
+			continue
+		new, old = results[name], baseline[name]
+		if new['result'] != old['result']:
+			problems.append((name, f'result changed from {old["result"]} to {new["result"]}'))
+		for key in ['seconds', 'peak memory']:
+			if new[key] > old[key] * (1 + threshold):
+				problems.append((name, f'{key} up {round(100 * (new[key] / old[key] - 1))}% ({round(old[key], 2)} -> {round(new[key], 2)})'))
+	return problems
+
+def runBenchmarks(workloads=None, results='benchmark-results.json', baseline=None, threshold=0.1, verbose=True):
+	"""
+	Runs the workloads (names from WORKLOADS, default all), each in a spawned process, and
+	writes the reports to `results`. If baseline is given, compares against it (see `compare`).
+	Returns True if every check passed and nothing regressed.
+	"""
+	workloads = list(WORKLOADS) if workloads is None else workloads
+	reports = {}
+	ok = True
+	for name in workloads:
+		with get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+			report = pool.apply(runWorkload, (name,))
+		reports[name] = report
+		ok = ok and report.get('ok', True)
+		if verbose:
+			check = '' if 'ok' not in report else (' ok' if report['ok'] else f' MISMATCH (expected {report["expected"]})')
+			print(f'{name}: {round(report["seconds"], 2)} seconds, {round(report["peak memory"], 1)} MB, result {report["result"]}{check}')
+
+	f = open(results, 'w')
+	json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(), 'regina': regina.versionString(), 'snappy': snappy.__version__, 'workloads': reports}, f, indent=4)
+	f.close()
+
+	if baseline is not None:
+		with open(baseline, 'r') as f:
+			problems = compare(reports, json.load(f)['workloads'], threshold)
+		for name, problem in problems:
+			print(f'{name}: {problem}')
+		ok = ok and not problems
+	return ok
+
+if __name__ == '__main__':
+	sys.exit(0 if runBenchmarks(sys.argv[1:] or None, baseline=os.environ.get('BENCHMARK_BASELINE')) else 1)
@@ -0,0 +1,5 @@
+import os, sys
+
+# the tests import the modules of the repository as the scripts do
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'recursion-gadget'), os.path.join(ROOT, 'testing-scripts')]
@@ -0,0 +1,180 @@
+import os, sys, csv, glob, random, time
+from multiprocessing import Pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import snappy, regina
+import geometricmoves as gm
+
+#####################################################################################
+########################### Differential Testing ####################################
+#####################################################################################
+# Automated version of `testThreeTwoMove` (see testmoves.py). Samples (triangulation,
+# move) cases from the geometric nodes of the graphs in examples/, performs each move with
+# `twoThreeMove`/`threeTwoMove` (without their own Regina cross-check) and compares with
+#	- Regina: whether the move is possible, and the resulting triangulation up to isomorphism
+#	- SnapPy: the gluing equations of the resulting triangulation, which the new shapes must
+#	  satisfy, and its shapes, up to relabelling
+# A case is (isosig, move, index), with move 2 for a 2-3 move on face index and 1 for a
+# 3-2 move on edge index (as in the search queues), so mismatches can be replayed exactly.
+#
+# Shapes are compared up to relabelling: each tetrahedron is represented by the set of its
+# three edge parameters {z, 1/(1-z), (z-1)/z} (which does not depend on how its vertices are
+# labelled, up to orientation), and each of our tetrahedra is matched, within the tolerance,
+# to a different one of SnapPy's with the same edge parameters. (Sorting the tetrahedra on
+# rounded values instead would report differences when values straddle a rounding boundary.)
+# SnapPy's shapes are only compared when they are geometric, where the structure is unique.
+
+EXAMPLES = os.path.join(ROOT, 'examples', 'pseudogeometric-census-10-tets')
+
+def exampleSigs(directory=EXAMPLES):
+	"""
+	Isosigs of the geometric nodes of every example graph in directory.
+	"""
+	sigs = []
+	for file in sorted(glob.glob(os.path.join(directory, '*-nodes.csv'))):
+		with open(file, 'r') as f:
+			sigs.extend(row['id'] for row in csv.DictReader(f) if row['oriented'] == '1')
+	return list(dict.fromkeys(sigs))
+
+def sampleCases(count, seed=0, sigs=None):
+	"""
+	`count` random (isosig, move, index) cases (see top of file) from the example graphs,
+	the same for the same seed.
+	"""
+	rng = random.Random(seed)
+	sigs = exampleSigs() if sigs is None else sigs
+	cases = []
+	for k in range(count):
+		sig = rng.choice(sigs)
+		T = regina.Triangulation3.fromIsoSig(sig)
+		if rng.randrange(T.countTriangles() + T.countEdges()) < T.countTriangles():
+			cases.append((sig, 2, rng.randrange(T.countTriangles())))
+		else:
+			cases.append((sig, 1, rng.randrange(T.countEdges())))
+	return cases
+
+def edgeParameters(z):
+	"""
+	The three edge parameters of a tetrahedron with shape z (see top of file).
+	"""
+	z = complex(z)
+	return [z, 1 / (1 - z), (z - 1) / z]
+
+def sameShapes(shapes1, shapes2, tolerance):
+	"""
+	Whether the tetrahedra of shapes1 can be matched one to one with those of shapes2 with
+	the same edge parameters, up to tolerance (relative, for large values).
+	"""
+	if len(shapes1) != len(shapes2):
+		return False
+	left = [edgeParameters(w) for w in shapes2]
+	for z in shapes1:
+		z = complex(z)
+		for k, triple in enumerate(left):
+			if any(abs(z - w) <= tolerance * max(1, abs(z)) for w in triple):
+				del left[k]
+				break
+		else:
+			return False
+	return True
+
+def gluingError(N, shapes):
+	"""
+	Largest error of shapes in the gluing equations (edge and cusp) of the manifold N,
+	whose tetrahedra are labelled as in the triangulation it was made from.
+	"""
+	error = 0
+	for A, B, c in N.gluing_equations(form='rect'):
+		value = 1
+		for z, a, b in zip(shapes, A, B):
+			z = complex(z)
+			value *= z ** a * (1 - z) ** b
+		error = max(error, abs(value - c))
+	return error
+
+def checkCase(case, tolerance=1e-6):
+	"""
+	Runs one case (see top of file). Returns (case, problem), where problem is None if
+	everything agrees, otherwise a description of the mismatch.
+	"""
+	sig, d, i = case
+	try:
+		T = regina.Triangulation3.fromIsoSig(sig)
+		T.orient()
+		shapes = snappy.Manifold(T).tetrahedra_shapes(part='rect')
+
+		R = regina.Triangulation3(T)
+		legal = R.pachner(R.edge(i) if d == 1 else R.triangle(i))
+		S = regina.Triangulation3(T)
+		if d == 1: # 3-2 move
+			success, newT, newShapes, (oriented, counts) = gm.threeTwoMove(S, shapes.copy(), i, check=False)
+		else: # 2-3 move
+			success, newT, newShapes, (oriented, counts) = gm.twoThreeMove(S, shapes.copy(), i, check=False)
+
+		if bool(success) != bool(legal):
+			return (case, f'move possible: ours {bool(success)}, regina {bool(legal)}')
+		if not success:
+			return (case, None)
+		if not newT.isIsomorphicTo(R):
+			return (case, 'triangulation differs from regina')
+		if oriented == -2: # degenerate shapes
+			return (case, None)
+
+		N = snappy.Manifold(newT)
+		error = gluingError(N, newShapes)
+		if error > tolerance:
+			return (case, f'shapes do not satisfy the gluing equations (error {error:.2e})')
+		# SnapPy may converge to a non-geometric solution even if a geometric one exists,
+		# so its shapes are only compared when they are geometric
+		if N.solution_type() == 'all tetrahedra positively oriented':
+			if oriented != 1:
+				return (case, f'orientation: ours {oriented}, snappy geometric')
+			if not sameShapes(newShapes, N.tetrahedra_shapes(part='rect'), tolerance):
+				return (case, 'shapes differ from snappy')
+		return (case, None)
+	except Exception as e:
+		return (case, f'error: {type(e).__name__}: {e}')
+
+def readCases(file):
+	"""
+	Cases from a mismatch file written by `differentialTest`.
+	"""
+	with open(file, 'r') as f:
+		return [(row['sig'], int(row['move']), int(row['index'])) for row in csv.DictReader(f)]
+
+def differentialTest(cases=1000, seed=0, processes=None, output='move-mismatches.csv', verbose=True):
+	"""
+	Checks cases in parallel (see `checkCase`). cases is a number of cases to sample (see
+	`sampleCases`), a list of cases, or a mismatch file to replay (see `readCases`).
+	Writes the mismatches to output as `sig,move,index,problem` rows (which can be
+	replayed by passing the file back in). Returns the list of (case, problem) mismatches.
+	"""
+	t0 = time.time()
+	if isinstance(cases, int):
+		cases = sampleCases(cases, seed)
+	elif isinstance(cases, str):
+		cases = readCases(cases)
+
+	mismatches = []
+	with Pool(processes) as pool:
+		for case, problem in pool.imap(checkCase, cases, chunksize=16):
+			if problem is not None:
+				mismatches.append((case, problem))
+
+	f = open(output, 'w', newline='')
+	writer = csv.writer(f)
+	writer.writerow(['sig', 'move', 'index', 'problem'])
+	for (sig, d, i), problem in mismatches:
+		writer.writerow([sig, d, i, problem])
+	f.close()
+
+	if verbose:
+		print(f'{len(mismatches)} mismatches in {len(cases)} cases ({round(time.time() - t0, 2)} seconds).')
+		for (sig, d, i), problem in mismatches[:20]:
+			print(f'\t{sig} {"Edge" if d == 1 else "Face"} {i}: {problem}')
+	return mismatches
+
+if __name__ == '__main__':
+	sys.exit(1 if differentialTest(int(sys.argv[1]) if len(sys.argv) > 1 else 1000) else 0)
@@ -0,0 +1,61 @@
+import random
+import pytest
+
+#####################################################################################
+########################### Array Triangulation Tests ###############################
+#####################################################################################
+# Random walks of moves on array triangulations, checking every move against
+# `twoThreeMove`/`threeTwoMove` of geometricmoves.py on the Regina triangulation with the
+# same labelling: the same isosig, the same orientation, and the same shapes up to
+# relabelling the new tetrahedra (see `differential.sameShapes`).
+
+np = pytest.importorskip('numpy')
+regina = pytest.importorskip('regina')
+snappy = pytest.importorskip('snappy')
+import geometricmoves as gm
+import arraytri as at
+from differential import sameShapes
+
+def reginaIndex(A, T, d, i):
+	"""
+	Regina's index in T (labelled as A) of the edge (d = 1) or face (d = 2) with index i
+	in A (see `ArrayTriangulation.faces` and `edges`).
+	"""
+	if d == 2:
+		t, f = A.faces()[i].tolist()
+		return T.tetrahedron(t).triangle(f).index()
+	t, e = divmod(int(A.edges()[0][i]), 6)
+	return T.tetrahedron(t).edge(*at.EDGES[e]).index()
+
+def checkMoves(A):
+	"""
+	Checks every move of A against geometricmoves.py. Returns the moves to flat or geometric
+	triangulations, as (d, i, shapes).
+	"""
+	T = A.toRegina()
+	pseudogeometric = []
+	for d, i, oriented, counts, shapes in A.moves():
+		newA = A.threeTwoMove(i, shapes) if d == 1 else A.twoThreeMove(i, shapes)
+		move = gm.threeTwoMove if d == 1 else gm.twoThreeMove
+		success, newT, newShapes, (expected, expected_counts) = move(regina.Triangulation3(T), list(A.shapes), reginaIndex(A, T, d, i))
+		assert success
+		assert newA.isoSig() == newT.isoSig()
+		assert oriented == expected and counts == expected_counts
+		if oriented > -2:
+			assert sameShapes(newA.shapes, newShapes, 1e-6)
+		if oriented > -1:
+			pseudogeometric.append((d, i, shapes))
+	return pseudogeometric
+
+@pytest.mark.parametrize('name', ['m004', 'm006', 'm015', 'm129'])
+def testRandomWalk(name):
+	gm.setFloatOnly()
+	rng = random.Random(0)
+	M = snappy.Manifold(name)
+	T = regina.Triangulation3(M)
+	T.orient()
+	A = at.ArrayTriangulation.fromRegina(T, M.tetrahedra_shapes(part='rect'))
+	for step in range(15):
+		moves = [move for move in checkMoves(A) if move[0] == 1 or A.size() < 8]
+		d, i, shapes = rng.choice(moves)
+		A = A.threeTwoMove(i, shapes) if d == 1 else A.twoThreeMove(i, shapes)
@@ -0,0 +1,66 @@
+import os
+import pytest
+import budget as bg
+
+#####################################################################################
+########################### Budget Tests ############################################
+#####################################################################################
+# What each budget cuts off, and that the summary counts it under the right reason
+# and level.
+
+def testLevelCaps():
+	budget = bg.Budget(level_nodes={5: 2})
+	assert [budget.expand(5) for k in range(4)] == [True, True, False, False]
+	assert all(budget.expand(6) for k in range(10)) # no cap at 6
+	assert budget.summary()['levels'] == {'5': 2, '6': 10}
+	assert budget.summary()['truncated'] == {'level cap': {'5': 2}}
+	budget = bg.Budget(level_nodes=1) # the same cap on every level
+	assert [budget.expand(n) for n in [4, 4, 5, 5, 5]] == [True, False, True, False, False]
+	assert budget.truncated == {'level cap': {4: 1, 5: 2}}
+
+def testNodeBudget():
+	budget = bg.Budget(max_nodes=3, level_nodes={4: 1})
+	budget.count(4) # the root
+	assert [budget.expand(n) for n in [4, 5, 5, 6, 6]] == [False, True, True, False, False]
+	assert budget.truncated == {'level cap': {4: 1}, 'node budget': {6: 2}}
+	assert not budget.complete()
+	assert 'Truncated by node budget: 2 nodes not expanded (2 at 6 tetrahedra).' in budget.report()
+
+def testFloor():
+	budget = bg.Budget(min_tets=4)
+	assert not budget.down(3) and not budget.down(4) and budget.down(5)
+	assert bg.Budget().down(1)
+	assert budget.complete() # the floor is not a truncation
+
+def testTimeBudget():
+	budget = bg.Budget(max_seconds=0)
+	budget.t0 -= 1
+	assert budget.timeUp()
+	assert not budget.expand(5)
+	budget.drop([5, 6, 6])
+	assert budget.summary()['truncated'] == {'time budget': {'5': 2, '6': 2}}
+	assert budget.summary()['expanded'] == 0
+	assert bg.Budget().complete() and not bg.Budget().timeUp()
+	budget = bg.Budget(max_seconds=60) # made long before its search starts
+	budget.t0 -= 61
+	assert budget.timeUp()
+	budget.start()
+	assert not budget.timeUp()
+
+def testSearch(tmp_path):
+	pytest.importorskip('snappy')
+	pytest.importorskip('regina')
+	import geometricmoves as gm
+	import geometricsearch as gs
+	gm.setFloatOnly()
+	counts = {}
+	for run, budget in [('full', bg.Budget()), ('capped', bg.Budget(level_nodes={6: 3}, min_tets=3))]:
+		directory = tmp_path / run
+		directory.mkdir()
+		gs.graphPseudogeometricSearch('cPcbbbiht', 7, verbose=False, directory=str(directory), budget=budget)
+		nodes = [name for name in os.listdir(directory) if name.endswith('-nodes.csv')][0]
+		counts[run] = (len(open(directory / nodes).read().splitlines()), budget.summary())
+	(full, unlimited), (capped, summary) = counts['full'], counts['capped']
+	assert unlimited['complete'] and unlimited['truncated'] == {}
+	assert summary['levels']['6'] == 3 and summary['truncated']['level cap']['6'] > 0
+	assert not summary['complete'] and capped < full
@@ -0,0 +1,113 @@
+import cmath, random
+import pytest
+
+pytest.importorskip('regina')
+import gadgetpatterns as gp
+
+#####################################################################################
+########################### Gadget Pattern Tests ####################################
+#####################################################################################
+# `ddPatterns` against `checkDDRec`, on triangulations reached by random geometric moves
+# from a few small manifolds (the figure-8 knot, m004, has the DD gadget).
+
+MANIFOLDS = ['m004', 'm003', 'm006', 'm009', 'm015', 'm023', 'm129']
+
+def walk(name, steps, seed=0):
+	"""
+	Triangulations (oriented, with shapes) on a random walk of geometric moves from name.
+	"""
+	import regina, snappy
+	import geometricmoves as gm
+	rng = random.Random(seed)
+	M = snappy.Manifold(name)
+	T = regina.Triangulation3(M)
+	T.orient()
+	shapes = M.tetrahedra_shapes(part='rect')
+	found = [(T, shapes)]
+	for step in range(steps):
+		for attempt in range(20):
+			if rng.random() < 0.6 or T.countTetrahedra() < 3:
+				success, newT, newShapes, (oriented, counts) = gm.twoThreeMove(regina.Triangulation3(T), shapes.copy(), rng.randrange(T.countTriangles()))
+			else:
+				success, newT, newShapes, (oriented, counts) = gm.threeTwoMove(regina.Triangulation3(T), shapes.copy(), rng.randrange(T.countEdges()))
+			if success and oriented == 1 and newT.countTetrahedra() <= 9:
+				T, shapes = newT, newShapes
+				found.append((T, shapes))
+				break
+	return found
+
+@pytest.fixture(scope='module')
+def triangulations():
+	pytest.importorskip('snappy')
+	import geometricmoves as gm
+	gm.setFloatOnly()
+	return [tri for name in MANIFOLDS for tri in walk(name, 30)]
+
+def testMirror():
+	gluings = [(0, 3, 1, (0, 1, 2, 3)), (0, 0, 1, (1, 3, 2, 0))]
+	s = (1, 0, 2, 3) # relabelling every tetrahedron by an odd permutation mirrors the pattern
+	mirrored = [(i, s[f], j, gp.compose(s, gp.compose(g, gp.inverse(s)))) for (i, f, j, g) in gluings]
+	assert gp.GadgetPattern('A', 2, gluings, [(0, 0, 2, 1)]) != gp.GadgetPattern('B', 2, mirrored, [(0, 1, 2, 1)])
+	assert gp.GadgetPattern('A', 2, gluings, [(0, 0, 2, 1)], mirror=True) == gp.GadgetPattern('B', 2, mirrored, [(0, 1, 2, 1)], mirror=True)
+
+def testGluingsAgree(triangulations):
+	# with regular shapes every edge parameter has real part 1/2, so only the gluings count
+	import recursiongadget as rg
+	index = gp.PatternIndex(gp.ddPatterns())
+	regular = cmath.exp(1j * cmath.pi / 3)
+	found = 0
+	for T, shapes in triangulations:
+		shapes = [regular] * T.countTetrahedra()
+		expected = rg.checkDDRec(T, shapes)[0]
+		assert index.match(T, shapes)[0] == expected
+		found += expected
+	assert 0 < found < len(triangulations)
+
+def relabel(T, shapes):
+	"""
+	T with its tetrahedra and their vertices relabelled at random (keeping the orientation),
+	and the shapes to go with it.
+	"""
+	import regina
+	import geometricmoves as gm
+	n = T.countTetrahedra()
+	iso = regina.Isomorphism3.random(n, True)
+	new = [None] * n
+	for t in range(n):
+		s = iso.facetPerm(t).inverse()
+		new[iso.simpImage(t)] = gm.edgeParameter(s[0], s[1], shapes[t])
+	return iso(T), new
+
+def mirror(T, shapes):
+	"""
+	The mirror image of T: every tetrahedron relabelled by swapping vertices 0 and 1, with
+	shape 1/conjugate(z), so that it is still oriented and geometric.
+	"""
+	import regina
+	n = T.countTetrahedra()
+	iso = regina.Isomorphism3.identity(n)
+	for t in range(n):
+		iso.setFacetPerm(t, regina.Perm4(1, 0, 2, 3))
+	return iso(T), [1 / complex(z).conjugate() for z in shapes]
+
+def testShapesAgree(triangulations):
+	import recursiongadget as rg
+	index = gp.PatternIndex(gp.ddPatterns())
+	assert rg.checkDDRec(*triangulations[0])[0] and index.match(*triangulations[0])[0] # m004
+	found = 0
+	for T, shapes in triangulations:
+		expected = rg.checkDDRec(T, shapes)[0]
+		assert index.match(T, shapes)[0] == expected
+		found += expected
+	assert 0 < found < len(triangulations)
+
+def testRelabelled(triangulations):
+	# the gadget does not depend on the labels of the triangulation, and its mirror image
+	# is found in the mirror image of the triangulation
+	import recursiongadget as rg
+	index = gp.PatternIndex(gp.ddPatterns())
+	for T, shapes in triangulations:
+		expected = rg.checkDDRec(T, shapes)[0]
+		for U, new in [relabel(T, shapes), mirror(T, shapes)]:
+			assert rg.checkDDRec(U, new)[0] == expected
+			assert index.match(U, new)[0] == expected
@@ -0,0 +1,76 @@
+import os
+import pytest
+
+#####################################################################################
+########################### Node Store Tests ########################################
+#####################################################################################
+# Searches with a NodeStore: every node rebuilds to its isosig, with the labelling the
+# search had, also from a tree written to a file (with or without the root's shapes), and
+# queued nodes can be dropped by a time budget.
+
+pytest.importorskip('snappy')
+regina = pytest.importorskip('regina')
+import geometricmoves as gm
+import geometricsearch as gs
+import nodestore as ns
+import budget as bg
+
+SIG = 'cPcbbbiht' # m004
+
+def search(tmp_path, run, **kwargs):
+	gm.setFloatOnly()
+	directory = tmp_path / run
+	directory.mkdir()
+	gs.graphPseudogeometricSearch(SIG, 6, verbose=False, directory=str(directory), **kwargs)
+	return directory
+
+def testRebuild(tmp_path):
+	store = ns.NodeStore(interval=3, cache=0)
+	search(tmp_path, 'sparse', store=store)
+	every = ns.NodeStore(interval=1, cache=0) # every expanded node is a checkpoint
+	search(tmp_path, 'every', store=every)
+	assert len(store) == len(every) > 20
+	for key in range(len(store)):
+		node = store.rebuild(key)
+		assert node.T.isoSig() == store.table.sig(store.ids[key])
+		if key in every.checkpoints: # the labelling the search had
+			assert node.T.tightEncoding() == every.checkpoints[key][0]
+			assert [complex(z) for z in node.shapes] == [complex(z) for z in every.checkpoints[key][1]]
+	sig = store.table.sig(store.ids[-1])
+	path = store.pathSigs(sig)
+	assert path[0] == (SIG, None, None) and path[-1][0] == sig and len(path) == store.depths[-1] + 1
+	assert store.find(store.ids[-1]) == len(store) - 1 and store.find(-5) is None
+
+def testReadTree(tmp_path):
+	store = ns.NodeStore(interval=4)
+	directory = search(tmp_path, 'tree', store=store)
+	tree = [name for name in os.listdir(directory) if name.endswith('-tree.csv')][0]
+	T = regina.Triangulation3.fromIsoSig(SIG)
+	T.orient()
+	read = ns.readTree(str(directory / tree), store.checkpoints[0][1])
+	assert len(read) == len(store)
+	for key in range(len(read)):
+		assert read.rebuild(key).T.isoSig() == read.table.sig(read.ids[key]) == store.table.sig(store.ids[key])
+	# without shapes, the root's are rebuilt of the kind the file records
+	assert open(directory / tree).read().split('\n')[1].endswith(',float')
+	read = ns.readTree(str(directory / tree))
+	assert [complex(z) for z in read.checkpoints[0][1]] == [complex(z) for z in store.checkpoints[0][1]]
+	assert all(read.rebuild(key).T.isoSig() == read.table.sig(read.ids[key]) for key in range(len(read)))
+
+class Countdown(bg.Budget):
+	"""
+	A budget whose time runs out after `calls` checks.
+	"""
+	def __init__(self, calls):
+		super().__init__()
+		self.calls = calls
+
+	def timeUp(self):
+		self.calls -= 1
+		return self.calls < 0
+
+def testTimeBudget(tmp_path):
+	budget = Countdown(40) # runs out with nodes kept only in the store queued
+	search(tmp_path, 'budget', store=ns.NodeStore(), budget=budget)
+	dropped = budget.summary()['truncated']['time budget']
+	assert sum(dropped.values()) > 1 and set(dropped) - {'2'}
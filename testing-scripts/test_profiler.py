@@ -0,0 +1,32 @@
+import json
+import pytest
+
+import profiler as prof
+
+#####################################################################################
+########################### Profiler Tests ##########################################
+#####################################################################################
+
+def testFrontier():
+	p = prof.Profiler()
+	for length, tets in [(5, 2), (7, 2), (9, 3), (4, 2), (8, 3), (6, 3)]:
+		p.queue(length, tets)
+		p.node()
+	levels = p.summary()['levels']
+	# recorded on moving to a level only: 5 and 4 at level 2, 9 and 8 at level 3
+	assert levels['2'] == {'entered': 2, 'peak frontier': 5, 'mean frontier': 4.5}
+	assert levels['3'] == {'entered': 2, 'peak frontier': 9, 'mean frontier': 8.5}
+	assert p.peak_queue == 9 and p.nodes == 6
+
+def testProfilingStops(tmp_path):
+	path = tmp_path / 'profile.json'
+	with pytest.raises(ValueError):
+		with prof.profiling(str(path)):
+			assert isinstance(prof.ACTIVE, prof.Profiler)
+			prof.ACTIVE.queue(3, 4)
+			raise ValueError
+	# stopped by the exception, with the summary written
+	assert isinstance(prof.ACTIVE, prof.NullProfiler)
+	assert json.load(open(path))['levels'] == {'4': {'entered': 1, 'peak frontier': 3, 'mean frontier': 3.0}}
+	with prof.profiling():
+		assert isinstance(prof.ACTIVE, prof.NullProfiler)
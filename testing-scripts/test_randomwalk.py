@@ -0,0 +1,70 @@
+import random
+import pytest
+
+#####################################################################################
+########################### Random Walk Tests #######################################
+#####################################################################################
+# The estimators of randomwalk.py on samples of known graphs: hand-made samples, and
+# Metropolis-Hastings walks (as `randomwalk.walk` makes) on a synthetic graph.
+
+pytest.importorskip('regina')
+pytest.importorskip('snappy')
+import randomwalk as rw
+
+def sample(sig, tets=5, oriented=1, degree=4):
+	return (sig, tets, oriented, degree)
+
+def testEstimates():
+	walkers = [[sample('a'), sample('b')], [sample('a', 6, 0, 2), sample('c')]]
+	e = rw.estimates(walkers)
+	# 4 pairs of samples from different walkers, 1 of them with the same isosig
+	assert e['nodes'] == 4
+	assert e['levels'] == {5: 0.75, 6: 0.25}
+	assert e['geometric'] == 0.75 and e['degree'] == 3.5
+	# repeats within one walker are not collisions
+	assert rw.estimates([[sample('a'), sample('a')], [sample('b')]])['nodes'] is None
+	assert rw.estimates([[sample('a'), sample('a')]])['nodes'] is None
+	assert rw.estimates([]) == {'nodes': None, 'levels': {}, 'geometric': None, 'degree': None}
+	assert rw.estimates([[], []])['nodes'] is None
+	assert rw.jackknife([[], []], lambda walkers: rw.estimates(walkers)['nodes']) == (None, None)
+
+def graph(size, seed=0):
+	"""
+	A connected graph on `size` nodes with uneven degrees: a cycle with random chords.
+	"""
+	rng = random.Random(seed)
+	neighbours = [{(x - 1) % size, (x + 1) % size} for x in range(size)]
+	for k in range(size):
+		x, y = rng.randrange(size), rng.randrange(size)
+		if x != y:
+			neighbours[x].add(y)
+			neighbours[y].add(x)
+	return [sorted(n) for n in neighbours]
+
+def walk(neighbours, steps, seed, thin=10):
+	"""
+	A walker as `randomwalk.walk`: propose a uniform neighbour y of x, move with
+	probability min(1, deg(x)/deg(y)), sample every `thin` steps.
+	"""
+	rng = random.Random(seed)
+	x = rng.randrange(len(neighbours))
+	samples = []
+	for step in range(steps):
+		if step % thin == 0:
+			samples.append(sample(f'node{x}', 5 + x % 3, x % 2, len(neighbours[x])))
+		y = rng.choice(neighbours[x])
+		if rng.random() < min(1, len(neighbours[x]) / len(neighbours[y])):
+			x = y
+	return samples
+
+def testCollisionEstimate():
+	size = 200
+	neighbours = graph(size)
+	walkers = [walk(neighbours, 20000, seed) for seed in range(8)]
+	nodes, width = rw.jackknife(walkers, lambda walkers: rw.estimates(walkers)['nodes'])
+	assert width is not None and 0 < width < nodes
+	assert abs(nodes - size) <= max(width, 0.15 * size)
+	assert nodes - 2 * width <= size <= nodes + 2 * width
+	# the uniform stationary distribution gives the true makeup too
+	fraction, width = rw.jackknife(walkers, lambda walkers: rw.estimates(walkers)['geometric'])
+	assert abs(fraction - 0.5) <= max(width, 0.05)
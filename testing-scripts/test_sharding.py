@@ -0,0 +1,82 @@
+import os
+import sharding as sh
+
+#####################################################################################
+########################### Sharding Tests ##########################################
+#####################################################################################
+# The job queue of sharding.py on a local database, with a fake search in place of
+# `searchJob` and a fake clock for the leases.
+
+class Clock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def time(self):
+		return self.now
+
+def queue(tmp_path, count):
+	path = str(tmp_path / 'census.db')
+	db = sh.openQueue(path)
+	db.executemany('INSERT INTO jobs (census, idx, name, sig, graph, max_tets) VALUES (?, ?, ?, ?, ?, ?)', [('orientable', i, f'm{i:03}', f'sig{i}', 'pseudogeometric', 6) for i in range(count)])
+	db.close()
+	return path
+
+def fakeSearch(sig, graph, max_tets, directory):
+	"""
+	Writes nodes and edges files as a search would: sig{i} has i + 1 geometric nodes and
+	one non-geometric node. sig1 fails.
+	"""
+	if sig == 'sig1':
+		raise ValueError('no shapes')
+	prefix = os.path.join(directory, f'{sig}-pseudogeometric')
+	f = open(f'{prefix}-nodes.csv', 'w')
+	f.write('sig,oriented\n')
+	for k in range(int(sig[3:]) + 1):
+		f.write(f'{sig}-{k},1\n')
+	f.write(f'{sig}-flat,0\n')
+	f.close()
+	f = open(f'{prefix}-edges.csv', 'w')
+	f.write('from,to,move\n')
+	f.close()
+	return prefix
+
+def testLeases(tmp_path, monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(sh.time, 'time', clock.time)
+	db = sh.openQueue(queue(tmp_path, 2))
+	assert sh.claimJob(db, 'a', 60, 2) == (1, 'm000', 'sig0', 'pseudogeometric', 6)
+	assert sh.claimJob(db, 'b', 60, 2)[0] == 2
+	assert sh.claimJob(db, 'c', 60, 2) is None # both leased
+
+	# a's lease runs out: the job is handed out again, and a can no longer finish it
+	clock.now += 61
+	assert sh.renewLease(db, 2, 'b', 60)
+	assert sh.claimJob(db, 'c', 60, 2)[0] == 1
+	assert not sh.renewLease(db, 1, 'a', 60)
+	sh.finishJob(db, 1, 'a', 2, 'a/sig0', 1.0, (1, 1))
+	assert db.execute('SELECT status, worker, attempts FROM jobs WHERE id = 1').fetchone() == ('running', 'c', 2)
+	sh.finishJob(db, 1, 'c', 2, 'c/sig0', 1.0, (1, 1))
+	assert db.execute('SELECT status, prefix FROM jobs WHERE id = 1').fetchone() == ('done', 'c/sig0')
+
+	# a failed attempt goes back to pending, and the job fails after max_attempts
+	sh.finishJob(db, 2, 'b', 2, error='ValueError: no shapes')
+	assert sh.claimJob(db, 'b', 60, 2)[0] == 2
+	clock.now += 61
+	assert sh.claimJob(db, 'c', 60, 2) is None # lost twice
+	assert db.execute('SELECT status, error FROM jobs WHERE id = 2').fetchone() == ('failed', 'lease ran out')
+	db.close()
+
+def testWorkerAndMerge(tmp_path, monkeypatch):
+	monkeypatch.setattr(sh, 'searchJob', fakeSearch)
+	path = queue(tmp_path, 3)
+	shards = str(tmp_path / 'shards')
+	assert sh.runWorker(path, shards, worker='w1', max_jobs=2, verbose=False) == 2
+	assert sh.runWorker(path, shards, worker='w2', verbose=False) == 3 # sig1 twice more, failing for good, then sig2
+	assert sh.jobStatus(path) == {'done': 2, 'failed': 1}
+	assert sh.resetJobs(path) == 1
+
+	output = str(tmp_path / 'merged')
+	missing = sh.mergeShards(path, output, verbose=False)
+	assert [(idx, status) for census, idx, name, status, error in missing] == [(1, 'pending')]
+	assert sorted(os.listdir(output)) == ['percent-geom-from-merged.csv', 'sig0-pseudogeometric-edges.csv', 'sig0-pseudogeometric-nodes.csv', 'sig2-pseudogeometric-edges.csv', 'sig2-pseudogeometric-nodes.csv']
+	assert open(os.path.join(output, 'percent-geom-from-merged.csv')).read() == 'manifold, geometric, nongeometric, percentage\nm000, 1, 1, 50.0\nm002, 3, 1, 75.0\n'
@@ -0,0 +1,71 @@
+import os
+import pytest
+import sigindex as si
+
+#####################################################################################
+########################### Isosig Index Tests ######################################
+#####################################################################################
+# The index of sigindex.py on a small tree of nodes files, kept up to date as files
+# change, appear and go; and its `sigs` as the `seen` argument of a search.
+
+def write(path, rows, flat=True):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	f = open(path, 'w')
+	f.write('id,oriented,tetrahedra,flat count,negative count\n' if flat else 'id,oriented,tetrahedra\n')
+	for sig, oriented in rows:
+		f.write(f'{sig},{oriented},3,0,0\n' if flat else f'{sig},{oriented},3\n')
+	f.close()
+
+def testUpdateAndLookup(tmp_path):
+	tree = tmp_path / 'examples'
+	a = str(tree / 'run1' / 'm004-(cPcbbbiht)-pseudogeometric-nodes.csv')
+	b = str(tree / 'run2' / 'cPcbbbiht-geometric-nodes.csv')
+	write(a, [('cPcbbbiht', 1), ('dLQbcccdxwb', 0)])
+	write(b, [('cPcbbbiht', 1)], flat=False)
+	index = si.SigIndex(str(tmp_path / 'sigs.db'))
+	assert index.update(str(tree), verbose=False) == (2, 0)
+	assert index.update(str(tree), verbose=False) == (0, 0) # nothing changed
+
+	entries = sorted(index.lookup('cPcbbbiht'), key=lambda e: e['run'])
+	assert [(e['run'], e['manifold'], e['graph'], e['oriented']) for e in entries] == [('run1', 'm004', 'pseudogeometric', 1), ('run2', None, 'geometric', 1)]
+	assert entries[0]['flat count'] == 0 and entries[1]['flat count'] is None
+	assert index.lookup('absent') == []
+	found = index.lookupMany(['dLQbcccdxwb', 'absent'], chunk=1)
+	assert [e['oriented'] for e in found['dLQbcccdxwb']] == [0] and found['absent'] == []
+
+	# a changed file is read again, a new one is added and a removed one dropped
+	write(a, [('cPcbbbiht', 1), ('dLQbcccdxwb', 1), ('eLAkbccddhrs', 0)])
+	os.utime(a, (1, 1))
+	write(str(tree / 'run3' / 'cPcbbbiht-essential-nodes.csv'), [('cPcbbbiht', 1)])
+	os.remove(b)
+	assert index.update(str(tree), verbose=False) == (2, 1)
+	assert [e['oriented'] for e in index.lookup('dLQbcccdxwb')] == [1]
+	assert sorted(e['run'] for e in index.lookup('cPcbbbiht')) == ['run1', 'run3']
+	assert index.count() == 4
+	assert index.sigs(run='run1', oriented=[0, 1]) == {'cPcbbbiht', 'dLQbcccdxwb', 'eLAkbccddhrs'}
+	assert index.sigs(oriented=0) == {'eLAkbccddhrs'}
+	index.close()
+
+def testSeen(tmp_path, capsys):
+	# what an earlier run found is skipped, and not counted as found again
+	pytest.importorskip('regina')
+	pytest.importorskip('snappy')
+	import geometricmoves as gm
+	import geometricsearch as gs
+	gm.setFloatOnly()
+	first = tmp_path / 'first'
+	first.mkdir()
+	gs.graphGeometricSearch('cPcbbbiht', 4, verbose=False, directory=str(first))
+	index = si.SigIndex(str(tmp_path / 'sigs.db'))
+	index.update(str(tmp_path), verbose=False)
+	seen = index.sigs(oriented=1) - {'cPcbbbiht'}
+	assert seen
+
+	second = tmp_path / 'second'
+	second.mkdir()
+	capsys.readouterr()
+	gs.graphGeometricSearch('cPcbbbiht', 4, directory=str(second), seen=seen)
+	assert 'Number of geometric triangulations: 1\n' in capsys.readouterr().out
+	rows = open(second / 'cPcbbbiht-geometric-nodes.csv').read().split('\n')[1:-1]
+	assert not any(row.split(',')[0] in seen for row in rows)
+	index.close()
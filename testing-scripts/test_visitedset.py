@@ -0,0 +1,90 @@
+import os
+import pytest
+import visitedset as vs
+
+#####################################################################################
+########################### Visited Set Tests #######################################
+#####################################################################################
+# Run with `python -m pytest testing-scripts`. Tests needing SnapPy and Regina are
+# skipped without them; searches run in float-only mode.
+
+def sigs(count):
+	return [f'sig{i}' for i in range(count)]
+
+def testGrowAndResume(tmp_path):
+	path = str(tmp_path / 'visited')
+	visited = vs.DiskVisitedSet(path, capacity=16, bloom_capacity=100, flush_every=7)
+	offsets = [visited.intern(sig) for sig in sigs(200)]
+	assert all(new for offset, new in offsets)
+	assert visited.slots >= 512 # grown past the initial 16 slots
+	assert len(visited) == 200
+	assert not any(visited.add(sig) for sig in sigs(200))
+	assert [visited.readSig(offset) for offset, new in offsets] == sigs(200)
+	assert 'sig200' not in visited and visited.index('sig200') is None
+	visited.close()
+
+	visited = vs.DiskVisitedSet(path, resume=True)
+	assert len(visited) == 200
+	assert all(sig in visited for sig in sigs(200))
+	assert [visited.index(sig) for sig in sigs(200)] == [offset for offset, new in offsets]
+	assert list(visited) == sigs(200)
+	assert visited.intern('sig200') == (offsets[-1][0] + len('sig199\n'), True)
+	visited.close()
+
+	visited = vs.DiskVisitedSet(path) # a new set replaces the old one
+	assert len(visited) == 0
+	assert 'sig0' not in visited
+	assert list(visited) == []
+	visited.close()
+
+def testSigTable(tmp_path):
+	for directory in [None, str(tmp_path)]:
+		table = vs.SigTable(directory, 'table')
+		ids = [table.add(sig)[0] for sig in sigs(50)]
+		assert len(set(ids)) == 50
+		assert [table.add(sig) for sig in sigs(50)] == [(i, False) for i in ids]
+		assert [table.sig(i) for i in ids] == list(table) == sigs(50)
+		assert table.id('sig50') is None and 'sig49' in table
+		vs.closeVisited(table)
+
+def testValues(tmp_path):
+	for directory in [None, str(tmp_path)]:
+		table = vs.SigTable(directory, 'values', values=2, capacity=16)
+		for i, sig in enumerate(sigs(100)): # grows the disk table a few times
+			table.add(sig)
+			assert table.values(sig) == (0, 0)
+			table.setValue(sig, i % 2, vs.parentValue(i if i % 3 else None))
+		assert table.values('sig100') is None
+		for i, sig in enumerate(sigs(100)):
+			value = vs.parentValue(i if i % 3 else None)
+			assert table.values(sig) == ((value, 0) if i % 2 == 0 else (0, value))
+		vs.closeVisited(table)
+	table = vs.SigTable(str(tmp_path), 'values', values=2, resume=True)
+	assert table.values('sig5') == (0, vs.parentValue(5))
+	vs.closeVisited(table)
+
+def testTreeEdge():
+	table = vs.SigTable(values=2)
+	a, b, c = [table.add(sig)[0] for sig in sigs(3)]
+	table.setValue('sig0', 0, vs.parentValue())
+	table.setValue('sig1', 0, vs.parentValue(a)) # b found from a
+	table.setValue('sig2', 1, vs.parentValue(b)) # c found from b, in the other class
+	assert vs.treeEdge(table, a, b, table.values('sig1')) and vs.treeEdge(table, b, a, table.values('sig0'))
+	assert vs.treeEdge(table, c, b, table.values('sig1'))
+	assert not vs.treeEdge(table, a, c, table.values('sig2')) and not vs.treeEdge(table, c, a, table.values('sig0'))
+
+def testSearchTwice(tmp_path):
+	pytest.importorskip('snappy')
+	pytest.importorskip('regina')
+	import geometricmoves as gm
+	import geometricsearch as gs
+	gm.setFloatOnly()
+	outputs = []
+	for run in range(2):
+		directory = tmp_path / f'run{run}'
+		directory.mkdir()
+		gs.graphPseudogeometricSearch('eLPkbcdddhggsj', 8, verbose=False, directory=str(directory), visited_dir=str(tmp_path / 'visited'))
+		outputs.append({name: open(directory / name).read() for name in sorted(os.listdir(directory))})
+	assert outputs[0] == outputs[1]
+	nodes = [text for name, text in outputs[0].items() if name.endswith('-nodes.csv')][0]
+	assert len(nodes.splitlines()) > 10
@@ -60,4 +60,5 @@ def possibleGeometricTwoThreeMoves(sig): #slow
 				print(f'On face {i}: {S.isoSig()}')
 
 
-testSearch(500, 9)
\ No newline at end of file
+if __name__ == '__main__':
+	testSearch(500, 9)
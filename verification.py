@@ -0,0 +1,150 @@
+import snappy
+import geometricmoves as gm
+import csv, os, time
+from multiprocessing import Pool
+
+#####################################################################################
+########################### Verification ############################################
+#####################################################################################
+# Verification of search output is a separate stage from the search itself: the
+# triangulations are checked with SnapPy's `verify_hyperbolicity()` across a process
+# pool, and the results are cached on disk (as `sig,hyperbolic` rows) so that no
+# triangulation is ever verified twice.
+#
+# When the search starts from exact shapes (`find_field` succeeded), SnapPy is not
+# needed at all: if the starting shapes satisfy the gluing equations exactly, then so
+# do the shapes the moves produce, and the orientation `shapeOrientation` computes
+# from them (exactly, in QQbar) is a proof. This is checked per node: nodes whose own
+# shapes are exact are marked 'exact', and only nodes with floating point shapes ('float',
+# e.g. from the floating point fallback) are passed to SnapPy.
+#
+# SnapPy's answer has three outcomes: True (verified geometric), False (could not verify,
+# which is not a proof of anything) and None (SnapPy raised an error). Only True is cached,
+# so inconclusive results are retried.
+
+def verifySig(sig):
+	"""
+	Returns (sig, True) if SnapPy verifies that sig is geometric, (sig, False) if it
+	cannot (which does not mean sig is not geometric), and (sig, None) if SnapPy raised
+	an error.
+	"""
+	try:
+		return (sig, bool(snappy.Manifold(sig).verify_hyperbolicity()[0]))
+	except Exception:
+		return (sig, None)
+
+def loadCache(cache):
+	"""
+	Read a verification cache file into a dictionary {key: value}.
+	"""
+	results = {}
+	if cache is not None and os.path.exists(cache):
+		with open(cache, 'r') as f:
+			for row in csv.reader(f):
+				if len(row) == 2:
+					results[row[0]] = row[1] == '1'
+	return results
+
+def verifySigs(sigs, processes=None, cache=None, verbose=False):
+	"""
+	Verify a list of isosigs in parallel.
+	- processes: size of the process pool (default: number of CPUs)
+	- cache: file of previously verified isosigs; new verified (True) results are appended
+		to it. Inconclusive results (False or None) are not cached, nor read from old caches.
+	Returns a dictionary {sig: True/False/None}, see `verifySig`.
+	"""
+	t0 = time.time()
+	results = {sig: True for sig, hyp in loadCache(cache).items() if hyp}
+	todo = [sig for sig in dict.fromkeys(sigs) if sig not in results]
+	if verbose:
+		print(f'Verifying {len(todo)} triangulations ({len(results)} cached)...')
+
+	if todo:
+		f = open(cache, 'a') if cache is not None else None
+		with Pool(processes) as pool:
+			for sig, hyp in pool.imap_unordered(verifySig, todo, chunksize=16):
+				results[sig] = hyp
+				if f is not None and hyp:
+					f.write(f'{sig},1\n')
+		if f is not None:
+			f.close()
+
+	if verbose:
+		print(f'Done! Verified {len(todo)} triangulations in {round(time.time() - t0, 2)} seconds.')
+	return results
+
+def exactShapes(shapes):
+	"""
+	Returns True if every shape is exact, so that the orientation computed from them is exact.
+	"""
+	return all(gm.isExact(z) for z in shapes)
+
+def certifyRoot(M, shapes):
+	"""
+	Returns True if shapes are exact and satisfy the gluing equations of the manifold M
+	(edge and cusp equations, so they give the complete structure) exactly.
+	"""
+	if not exactShapes(shapes):
+		return False
+	for A, B, c in M.gluing_equations(form='rect'):
+		lhs = 1
+		for z, a, b in zip(shapes, A, B):
+			lhs *= z ** a * (1 - z) ** b
+		if lhs != c:
+			return False
+	return True
+
+def verificationStatus(oriented, hyp):
+	"""
+	Whether SnapPy agrees with the orientation found by the search: 'verified' (SnapPy
+	proves a geometric node geometric), 'mismatch' (SnapPy proves a non-geometric node
+	geometric), 'unverified' (SnapPy could not verify the node, as expected for
+	non-geometric nodes, but this proves nothing), or 'error' if SnapPy failed.
+	"""
+	if hyp is None:
+		return 'error'
+	if hyp:
+		return 'verified' if oriented == 1 else 'mismatch'
+	return 'unverified'
+
+def verifyNodes(file, output=None, processes=None, cache=None, verbose=True):
+	"""
+	Verify every node of a nodes CSV written by a graphing function, adding a
+	`verified` column (see `verificationStatus`). Nodes whose `certified` column is
+	'exact' are already proven and are marked 'certified' without calling SnapPy.
+	- output: file to write to (default: overwrite `file`)
+	Returns a dictionary {status: count}.
+	"""
+	with open(file, 'r') as f:
+		rows = list(csv.reader(f))
+	header, rows = rows[0], rows[1:]
+	if 'verified' in header: # re-verifying: replace the old column
+		verified_col = header.index('verified')
+		rows = [row[:verified_col] + row[verified_col + 1:] for row in rows]
+		header = header[:verified_col] + header[verified_col + 1:]
+	id_col = header.index('id')
+	oriented_col = header.index('oriented')
+
+	certified_col = header.index('certified') if 'certified' in header else None
+	def certified(row):
+		return certified_col is not None and row[certified_col] == 'exact'
+
+	results = verifySigs([row[id_col] for row in rows if not certified(row)], processes, cache, verbose)
+
+	counts = {}
+	output = file if output is None else output
+	with open(output + '.tmp', 'w') as f:
+		f.write(','.join(header + ['verified']) + '\n')
+		for row in rows:
+			if certified(row):
+				status = 'certified'
+			else:
+				status = verificationStatus(int(row[oriented_col]), results[row[id_col]])
+			counts[status] = counts.get(status, 0) + 1
+			f.write(','.join(row + [status]) + '\n')
+	os.replace(output + '.tmp', output)
+
+	if verbose:
+		for status in counts:
+			print(f'{status}: {counts[status]}')
+	return counts
@@ -0,0 +1,399 @@
+import hashlib, math, mmap, os, struct
+from array import array
+
+#####################################################################################
+########################### Visited Sets ############################################
+#####################################################################################
+# The searches keep the isosigs they have already seen in a visited set. For large
+# components this set does not fit in memory, so `DiskVisitedSet` keeps it in a
+# memory-mapped open-addressing hash table on disk, with a Bloom filter in RAM in
+# front of it. Most lookups of unseen isosigs are answered by the Bloom filter alone.
+#
+# Files (for a set at `path`):
+#  - {path}.table: slots of 16 bytes, (fingerprint, offset + 1), 0 meaning empty, followed
+#                  by the isosig's values (8 bytes each), if the set keeps any
+#  - {path}.log:   the isosigs themselves, one per line, in order of insertion
+#
+# Values are unsigned integers kept with each isosig (0 until set), so that what a search
+# knows about a node (e.g. which classes it was found in, and from which node, see
+# `parentValue`) stays on disk with it rather than in sets in RAM.
+
+def slotStruct(values=0):
+	return struct.Struct('<QQ' + 'Q' * values)
+
+SLOT = slotStruct()
+VALUE = struct.Struct('<Q')
+
+def fingerprint(sig):
+	"""
+	64 bit fingerprint of an isosig, never 0 (0 marks an empty slot).
+	"""
+	h = int.from_bytes(hashlib.blake2b(sig.encode(), digest_size=8).digest(), 'little')
+	return h or 1
+
+class BloomFilter:
+	"""
+	Bloom filter on fingerprints, using double hashing on the two 32 bit halves.
+	- capacity: expected number of elements
+	- error_rate: false positive rate at capacity
+	"""
+	def __init__(self, capacity, error_rate=0.01):
+		capacity = max(capacity, 1)
+		self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+		self.hashes = max(1, round(self.size / capacity * math.log(2)))
+		self.bits = bytearray((self.size + 7) // 8)
+
+	def positions(self, fp):
+		h1 = fp & 0xffffffff
+		h2 = (fp >> 32) | 1
+		for i in range(self.hashes):
+			yield (h1 + i * h2) % self.size
+
+	def add(self, fp):
+		for p in self.positions(fp):
+			self.bits[p >> 3] |= 1 << (p & 7)
+
+	def __contains__(self, fp):
+		for p in self.positions(fp):
+			if not self.bits[p >> 3] & (1 << (p & 7)):
+				return False
+		return True
+
+class DiskVisitedSet:
+	"""
+	Set of isosigs kept on disk at `path` (see top of file), supporting `add`, `in`,
+	`len` and iteration. Membership is exact: a fingerprint match is confirmed against
+	the isosig in the log. Any old set at path is removed, unless resume is true, in
+	which case it is continued (with the same number of values).
+	- values: number of values kept with each isosig (see top of file)
+	- capacity: initial number of slots (doubled when half full)
+	- bloom_capacity: expected number of isosigs, sizes the Bloom filter
+	- flush_every: isosigs written to the log between flushes (until then they are
+		looked up in memory)
+	"""
+	def __init__(self, path, values=0, capacity=1 << 20, bloom_capacity=10 ** 7, error_rate=0.01, resume=False, flush_every=1024):
+		self.path = path
+		self.slot = slotStruct(values)
+		self.empty = (0,) * values
+		self.last = None # (isosig, slot) of the last isosig looked up, until the table grows
+		self.bloom = BloomFilter(bloom_capacity, error_rate)
+		if not resume:
+			for suffix in ['.table', '.log', '.table.tmp']:
+				if os.path.exists(f'{path}{suffix}'):
+					os.remove(f'{path}{suffix}')
+		self.log = open(f'{path}.log', 'ab')
+		self.reader = open(f'{path}.log', 'rb')
+		self.end = self.log.tell()
+		self.pending = {} # offset: isosig, for isosigs not yet flushed to the log
+		self.flush_every = flush_every
+		self.count = 0
+		if os.path.exists(f'{path}.table'):
+			self.table_file = open(f'{path}.table', 'r+b')
+			self.table = mmap.mmap(self.table_file.fileno(), 0)
+			self.slots = len(self.table) // self.slot.size
+			for i in range(self.slots):
+				fp = self.slot.unpack_from(self.table, i * self.slot.size)[0]
+				if fp:
+					self.count += 1
+					self.bloom.add(fp)
+		else:
+			self.slots = 1 << max(4, (capacity - 1).bit_length())
+			self.table_file, self.table = self.newTable(f'{path}.table', self.slots)
+
+	def newTable(self, filename, slots):
+		f = open(filename, 'w+b')
+		f.truncate(slots * self.slot.size)
+		return f, mmap.mmap(f.fileno(), 0)
+
+	def readSig(self, offset):
+		sig = self.pending.get(offset)
+		if sig is not None:
+			return sig
+		self.reader.seek(offset)
+		return self.reader.readline()[:-1].decode()
+
+	def flush(self):
+		self.log.flush()
+		self.pending.clear()
+
+	def find(self, sig, fp):
+		"""
+		Returns (found, slot): the slot holding sig, or the empty slot it would go in.
+		"""
+		mask = self.slots - 1
+		i = fp & mask
+		while True:
+			slot_fp, offset = self.slot.unpack_from(self.table, i * self.slot.size)[:2]
+			if slot_fp == 0:
+				return (False, i)
+			if slot_fp == fp and self.readSig(offset - 1) == sig:
+				self.last = (sig, i)
+				return (True, i)
+			i = (i + 1) & mask
+
+	def __contains__(self, sig):
+		fp = fingerprint(sig)
+		if fp not in self.bloom:
+			return False
+		return self.find(sig, fp)[0]
+
+	def add(self, sig):
+		"""
+		Adds sig to the set. Returns True if it was not already there.
+		"""
+		return self.intern(sig)[1]
+
+	def index(self, sig):
+		"""
+		Offset of sig in the log, or None if sig is not in the set.
+		"""
+		fp = fingerprint(sig)
+		if fp not in self.bloom:
+			return None
+		found, i = self.find(sig, fp)
+		return self.slot.unpack_from(self.table, i * self.slot.size)[1] - 1 if found else None
+
+	def intern(self, sig):
+		"""
+		Adds sig to the set if it is not already there. Returns (offset of sig in the log,
+		whether sig is new).
+		"""
+		fp = fingerprint(sig)
+		if fp in self.bloom:
+			found, i = self.find(sig, fp)
+			if found:
+				return (self.slot.unpack_from(self.table, i * self.slot.size)[1] - 1, False)
+		if 2 * (self.count + 1) > self.slots:
+			self.grow()
+		offset = self.end
+		line = sig.encode() + b'\n'
+		self.log.write(line)
+		self.end += len(line)
+		self.pending[offset] = sig
+		if len(self.pending) >= self.flush_every:
+			self.flush()
+		i = self.find(sig, fp)[1]
+		self.slot.pack_into(self.table, i * self.slot.size, fp, offset + 1, *self.empty)
+		self.last = (sig, i)
+		self.bloom.add(fp)
+		self.count += 1
+		return (offset, True)
+
+	def locate(self, sig):
+		"""
+		Slot holding sig, or None if sig is not in the set.
+		"""
+		if self.last is not None and self.last[0] == sig:
+			return self.last[1]
+		fp = fingerprint(sig)
+		if fp not in self.bloom:
+			return None
+		found, i = self.find(sig, fp)
+		return i if found else None
+
+	def values(self, sig):
+		"""
+		Tuple of the values kept with sig, or None if sig is not in the set.
+		"""
+		i = self.locate(sig)
+		return None if i is None else self.slot.unpack_from(self.table, i * self.slot.size)[2:]
+
+	def setValue(self, sig, k, value):
+		"""
+		Sets the k-th value kept with sig (which must be in the set).
+		"""
+		i = self.locate(sig)
+		VALUE.pack_into(self.table, i * self.slot.size + SLOT.size + VALUE.size * k, value)
+
+	def grow(self):
+		"""
+		Doubles the number of slots, rehashing from the fingerprints alone.
+		"""
+		old_table, old_file, old_slots = self.table, self.table_file, self.slots
+		self.slots *= 2
+		self.last = None
+		self.table_file, self.table = self.newTable(f'{self.path}.table.tmp', self.slots)
+		mask = self.slots - 1
+		for j in range(old_slots):
+			slot = self.slot.unpack_from(old_table, j * self.slot.size)
+			if slot[0]:
+				i = slot[0] & mask
+				while self.slot.unpack_from(self.table, i * self.slot.size)[0]:
+					i = (i + 1) & mask
+				self.slot.pack_into(self.table, i * self.slot.size, *slot)
+		old_table.close()
+		old_file.close()
+		self.table.flush()
+		os.replace(f'{self.path}.table.tmp', f'{self.path}.table')
+
+	def __len__(self):
+		return self.count
+
+	def __iter__(self):
+		self.flush()
+		with open(f'{self.path}.log', 'rb') as f:
+			for line in f:
+				yield line[:-1].decode()
+
+	def close(self):
+		self.table.flush()
+		self.table.close()
+		self.table_file.close()
+		self.log.close()
+		self.reader.close()
+
+class SigTable:
+	"""
+	Interns isosigs: each isosig is given an integer id once, the first time it is added,
+	so that the searches can keep ids instead of strings in their edge sets and queues,
+	and only turn ids back into isosigs when writing output. In memory the ids are dense
+	(0, 1, 2, ...), and the isosigs are kept once, one after another in a byte array,
+	indexed by an open-addressing hash table of ids (as `DiskVisitedSet` does on disk),
+	rather than as string objects in a dict. If directory is given the table is a
+	DiskVisitedSet at {directory}/{name} (see `visitedSet`), and an isosig's id is its
+	offset in the log.
+	- values: number of values kept with each isosig (see top of file), on disk if the
+		table is
+	"""
+	def __init__(self, directory=None, name='visited', values=0, **kwargs):
+		self.disk = None if directory is None else visitedSet(directory, name, values=values, **kwargs)
+		self.blob = bytearray() # the isosigs, one after another
+		self.offsets = array('Q', [0]) # isosig i is blob[offsets[i]:offsets[i + 1]]
+		self.hashes = array('q') # hash of isosig i
+		self.slots = array('Q', [0]) * 16 # id + 1 of the isosig in each slot, 0 meaning empty
+		self.data = [array('Q') for k in range(values)] # values by id, in memory
+
+	def find(self, sig, h):
+		"""
+		Returns (id of sig, or None if it has not been added, slot it is in or would go in).
+		"""
+		mask = len(self.slots) - 1
+		k = h & mask
+		while True:
+			i = self.slots[k]
+			if i == 0:
+				return (None, k)
+			i -= 1
+			if self.hashes[i] == h and self.sig(i) == sig:
+				return (i, k)
+			k = (k + 1) & mask
+
+	def grow(self):
+		"""
+		Doubles the number of slots, rehashing from the kept hashes.
+		"""
+		self.slots = array('Q', [0]) * (2 * len(self.slots))
+		mask = len(self.slots) - 1
+		for i, h in enumerate(self.hashes):
+			k = h & mask
+			while self.slots[k]:
+				k = (k + 1) & mask
+			self.slots[k] = i + 1
+
+	def add(self, sig):
+		"""
+		Returns (id of sig, whether sig is new), adding sig if it is new.
+		"""
+		if self.disk is not None:
+			return self.disk.intern(sig)
+		h = hash(sig)
+		i, k = self.find(sig, h)
+		if i is not None:
+			return (i, False)
+		i = len(self.hashes)
+		if 2 * (i + 1) > len(self.slots):
+			self.grow()
+			k = self.find(sig, h)[1]
+		self.slots[k] = i + 1
+		self.hashes.append(h)
+		self.blob += sig.encode()
+		self.offsets.append(len(self.blob))
+		for values in self.data:
+			values.append(0)
+		return (i, True)
+
+	def values(self, sig):
+		"""
+		Tuple of the values kept with sig, or None if it has not been added.
+		"""
+		if self.disk is not None:
+			return self.disk.values(sig)
+		i = self.id(sig)
+		return None if i is None else tuple(values[i] for values in self.data)
+
+	def setValue(self, sig, k, value):
+		"""
+		Sets the k-th value kept with sig (which must have been added).
+		"""
+		if self.disk is not None:
+			self.disk.setValue(sig, k, value)
+		else:
+			self.data[k][self.id(sig)] = value
+
+	def id(self, sig):
+		"""
+		Id of sig, or None if it has not been added.
+		"""
+		if self.disk is not None:
+			return self.disk.index(sig)
+		return self.find(sig, hash(sig))[0]
+
+	def sig(self, i):
+		if self.disk is not None:
+			return self.disk.readSig(i)
+		return self.blob[self.offsets[i]:self.offsets[i + 1]].decode()
+
+	def __contains__(self, sig):
+		return self.id(sig) is not None
+
+	def __len__(self):
+		return len(self.disk) if self.disk is not None else len(self.hashes)
+
+	def __iter__(self):
+		if self.disk is not None:
+			return iter(self.disk)
+		return (self.sig(i) for i in range(len(self.hashes)))
+
+	def close(self):
+		if self.disk is not None:
+			self.disk.close()
+
+def parentValue(parent=None):
+	"""
+	Value recording that a node is in a class of nodes (see top of file), found from the
+	node with id parent (None for nodes found otherwise, e.g. the root). 0 means not in it.
+	"""
+	return 1 if parent is None else parent + 2
+
+def treeEdge(table, a, b, values):
+	"""
+	Whether the edge between the nodes with ids a and b (b's values given) is one either
+	was found by in some class, with parents recorded by `parentValue`.
+	"""
+	return parentValue(a) in values or parentValue(b) in table.values(table.sig(a))
+
+def edgeKey(a, b):
+	"""
+	A single integer for the (unordered) edge between the nodes with ids a and b.
+	"""
+	if a > b:
+		a, b = b, a
+	return (a << 40) | b
+
+def visitedSet(directory=None, name='visited', **kwargs):
+	"""
+	Returns an empty visited set: a python set if directory is None, otherwise a
+	DiskVisitedSet stored at {directory}/{name}, replacing any old one there (pass
+	resume=True to continue it instead). Keyword arguments go to DiskVisitedSet.
+	"""
+	if directory is None:
+		return set()
+	os.makedirs(directory, exist_ok=True)
+	return DiskVisitedSet(f'{directory}/{name}', **kwargs)
+
+def closeVisited(visited):
+	"""
+	Closes the files behind a visited set, if any.
+	"""
+	if isinstance(visited, (DiskVisitedSet, SigTable)):
+		visited.close()